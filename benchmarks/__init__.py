@@ -0,0 +1,5 @@
+# benchmarks/__init__.py
+"""
+本地 benchmark 腳本，用 `python -m benchmarks.<name>` 執行。
+預設使用暫存 SQLite 當作 Postgres 的替身，可用 --db-url 指向本地 Postgres。
+"""
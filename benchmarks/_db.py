@@ -0,0 +1,57 @@
+# benchmarks/_db.py
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from scraper.config import async_database_url
+from scraper.db.model import Base, Product
+from scraper.db.product_repo import ProductRepository
+
+
+def temp_sqlite_url(name: str) -> str:
+    """在暫存資料夾建立一個全新的 SQLite 檔案"""
+    path = os.path.join(tempfile.mkdtemp(prefix="dropit-bench-"), f"{name}.sqlite")
+    return f"sqlite:///{path}"
+
+
+def make_repo(db_url: str, reset: bool = True, async_driver: bool = False):
+    """
+    建立指向 db_url 的 ProductRepository。
+    reset=True 時會先 drop 再建立所有資料表（請勿指向正式 DB）。
+    async_driver=True 時另外建立 async session factory（*_async 方法走 aiosqlite / asyncpg，否則退回 thread pool）。
+    回傳 (repo, engine)。
+    """
+    engine = create_engine(db_url)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    ProductRepository.init_db(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=True, autocommit=False)
+    async_factory = None
+    if async_driver:
+        async_engine = create_async_engine(async_database_url(db_url))
+        async_factory = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    return ProductRepository(sync_session_factory=session_factory, async_session_factory=async_factory), engine
+
+
+def seed_products(engine, count: int, category: str = "bench") -> None:
+    """塞入 count 筆假 products"""
+    rows = [
+        {
+            "name": f"Product {i}",
+            "price": Decimal("1.00") + i % 100,
+            "unit": "ea",
+            "url": f"https://www.dropit.bm/shop/product/{i}",
+            "category": category,
+            "created_at": date.today(),
+            "updated_at": date.today(),
+        }
+        for i in range(count)
+    ]
+    with sessionmaker(bind=engine)() as session:
+        session.execute(insert(Product), rows)
+        session.commit()
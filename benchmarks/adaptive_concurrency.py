@@ -0,0 +1,88 @@
+# benchmarks/adaptive_concurrency.py
+"""
+AIMD 並行上限的模擬：stub server 延遲隨同時處理的 request 數增加，超過 capacity 回 503；
+跑到一半把 capacity 調低，模擬對方變慢。比較固定並行數與 AdaptiveLimiter 的 throughput 與被拒絕數。
+明細頁走 fetch_product_detail 的純 HTTP 路徑（與正式流程相同的 limiter 位置）。
+
+    python -m benchmarks.adaptive_concurrency --products 600 --capacity 6 --degraded-capacity 3
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from benchmarks.stub_server import StubServer
+from scraper.adaptive_limiter import AdaptiveLimiter
+from scraper.fetch_product_price import fetch_product_detail
+from scraper.http_fetcher import HttpDetailFetcher
+
+ROUTES = {"/shop/product/": "product_detail.html"}
+
+
+def latency_model(base: float, per_request: float):
+    """每多一個同時處理中的 request 多 per_request 秒"""
+    return lambda in_flight: base + per_request * in_flight
+
+
+async def _simulate(server: StubServer, limiter: AdaptiveLimiter, products: int, degraded_capacity: int):
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(products):
+        queue.put_nowait(SimpleNamespace(id=i, url=server.url(f"/shop/product/{i}")))
+    outcome = {"ok": 0, "failed": 0}
+    halfway = products // 2
+
+    async with HttpDetailFetcher(max_connections=limiter.max_limit) as fetcher:
+        async def worker():
+            while not queue.empty():
+                prod = queue.get_nowait()
+                try:
+                    await fetch_product_detail(prod, limiter, browser=None, http_fetcher=fetcher)
+                    outcome["ok"] += 1
+                except Exception:
+                    outcome["failed"] += 1
+                if outcome["ok"] + outcome["failed"] == halfway:
+                    server.capacity = degraded_capacity
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(limiter.max_limit)))
+        return outcome, time.perf_counter() - start
+
+
+def _trajectory(limiter: AdaptiveLimiter, points: int = 12) -> str:
+    history = limiter.history
+    step = max(1, len(history) // points)
+    return " → ".join(f"{limit}@{t:.1f}s" for t, limit in history[::step] + history[-1:])
+
+
+def run(products: int, capacity: int, degraded_capacity: int, base_latency: float, per_request: float,
+        max_limit: int) -> None:
+    # (label, min, max, initial)；min == max 等同固定的 semaphore
+    scenarios = [
+        ("fixed 2", 2, 2, 2),
+        (f"fixed {max_limit}", max_limit, max_limit, max_limit),
+        (f"aimd 1-{max_limit}", 1, max_limit, 2),
+    ]
+    print(f"server capacity {capacity} → {degraded_capacity} after {products // 2} products, "
+          f"latency {base_latency * 1000:.0f}ms + {per_request * 1000:.0f}ms per in-flight request")
+    for label, min_limit, limit, initial in scenarios:
+        with StubServer(ROUTES, latency=latency_model(base_latency, per_request), capacity=capacity) as server:
+            limiter = AdaptiveLimiter(min_limit=min_limit, max_limit=limit, initial=initial)
+            outcome, elapsed = asyncio.run(_simulate(server, limiter, products, degraded_capacity))
+        print(f"{label:<10} {outcome['ok'] / elapsed:7.1f} ok/s  {outcome['ok']:>5} ok  "
+              f"{outcome['failed']:>5} failed  503s={server.rejected_count:<5} "
+              f"peak in-flight={server.peak_in_flight:<3} {elapsed:6.2f}s")
+        if limiter.max_limit > limiter.min_limit:
+            print(f"           {limiter.summary()}")
+            print(f"           limit: {_trajectory(limiter)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=600)
+    parser.add_argument("--capacity", type=int, default=6, help="前半段 server 同時可處理的 request 數")
+    parser.add_argument("--degraded-capacity", type=int, default=3, help="後半段 server 同時可處理的 request 數")
+    parser.add_argument("--latency", type=float, default=0.03, help="stub server 基本延遲（秒）")
+    parser.add_argument("--per-request", type=float, default=0.005, help="每個同時處理中的 request 增加的延遲（秒）")
+    parser.add_argument("--max-limit", type=int, default=12)
+    args = parser.parse_args()
+    run(args.products, args.capacity, args.degraded_capacity, args.latency, args.per_request, args.max_limit)
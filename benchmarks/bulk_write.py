@@ -0,0 +1,63 @@
+# benchmarks/bulk_write.py
+"""
+比較 price history / product 更新的寫入速度：
+每筆各自 commit（insert_price_history / update_product） vs 批次 API
+（insert_price_histories / update_products_bulk）。
+
+    python -m benchmarks.bulk_write --rows 2000
+    python -m benchmarks.bulk_write --db-url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import time
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper.config import Config
+
+
+def _rate(rows: int, seconds: float) -> str:
+    return f"{rows / seconds:,.0f} rows/s ({seconds:.2f}s)"
+
+
+def run(db_url: str, rows: int, flush_size: int) -> None:
+    repo, engine = make_repo(db_url)
+    # 每條路徑用不同的 products，避免同一天重複寫入同一個 product
+    seed_products(engine, rows * 2)
+    products = sorted(repo.fetch_all_products(), key=lambda p: p.id)
+    per_row_products, bulk_products = products[:rows], products[rows:]
+
+    start = time.perf_counter()
+    for prod in per_row_products:
+        repo.insert_price_history(prod.id, 9.99)
+    per_row_insert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    repo.insert_price_histories(
+        [{"product_id": prod.id, "price": 9.99} for prod in bulk_products], flush_size
+    )
+    bulk_insert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for prod in per_row_products:
+        repo.update_product(prod, sku="12345678", location="Aisle 1")
+    per_row_update = time.perf_counter() - start
+
+    start = time.perf_counter()
+    repo.update_products_bulk(
+        [{"id": prod.id, "sku": "12345678", "location": "Aisle 1"} for prod in bulk_products], flush_size
+    )
+    bulk_update = time.perf_counter() - start
+
+    print(f"DB: {engine.url.render_as_string(hide_password=True)}  rows={rows}  flush_size={flush_size}")
+    print(f"  insert  per-row: {_rate(rows, per_row_insert)}")
+    print(f"  insert  bulk   : {_rate(rows, bulk_insert)}  x{per_row_insert / bulk_insert:.1f}")
+    print(f"  update  per-row: {_rate(rows, per_row_update)}")
+    print(f"  update  bulk   : {_rate(rows, bulk_update)}  x{per_row_update / bulk_update:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=None, help="預設為暫存 SQLite（資料表會被重建）")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--flush-size", type=int, default=Config.DB_FLUSH_SIZE)
+    args = parser.parse_args()
+    run(args.db_url or temp_sqlite_url("bulk_write"), args.rows, args.flush_size)
@@ -0,0 +1,81 @@
+# benchmarks/context_pool.py
+"""
+每個 product 開新 context vs BrowserContextPool 重複使用暖好的分頁：
+對本地 stub server 的明細頁 fixture 各抓一輪，輸出每個 product 的平均耗時與兩者差距（= 每個 product 省下的開銷）。
+跑到一半關掉 pool 裡一個閒置的 page，確認健康檢查會重建它。需要先 `playwright install chromium`。
+
+    python -m benchmarks.context_pool --products 200 --tabs 4 --max-uses 50
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from playwright.async_api import async_playwright
+
+from benchmarks.stub_server import StubServer
+from scraper.context_pool import BrowserContextPool
+from scraper.fetch_product_price import fetch_product_detail_with_browser, read_product_detail
+
+EXPECTED = {"price": 6.49, "sku": "0072250011297", "location": "Aisle 7"}
+
+
+async def _run_all(prods, tabs: int, fetch_one) -> float:
+    semaphore = asyncio.Semaphore(tabs)
+
+    async def bounded(prod):
+        async with semaphore:
+            result = await fetch_one(prod)
+            assert {key: result[key] for key in EXPECTED} == EXPECTED, result
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(p) for p in prods))
+    return time.perf_counter() - start
+
+
+async def _bench(server: StubServer, products: int, tabs: int, max_uses: int) -> None:
+    prods = [SimpleNamespace(id=i, url=server.url(f"/shop/product/{i}")) for i in range(products)]
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        try:
+            fresh = await _run_all(prods, tabs, lambda prod: fetch_product_detail_with_browser(prod, browser))
+
+            async with BrowserContextPool(browser, size=tabs, max_uses=max_uses) as pool:
+                await pool.warm(tabs)
+
+                async def pooled(prod):
+                    if prod.id == products // 2 and pool._idle:
+                        await pool._idle[0].page.close()  # 模擬分頁被關掉 / 掛掉
+                    async with pool.page() as page:
+                        return await read_product_detail(prod, page)
+
+                reused = await _run_all(prods, tabs, pooled)
+                summary = pool.summary()
+                assert pool.recycled["closed"] <= 1
+        finally:
+            await browser.close()
+
+    per_fresh = fresh / products * tabs * 1000
+    per_pooled = reused / products * tabs * 1000
+    print(f"new context per product: {fresh:6.2f}s  {products / fresh:6.1f} products/s  "
+          f"{per_fresh:6.1f} ms/product per tab")
+    print(f"context pool:            {reused:6.2f}s  {products / reused:6.1f} products/s  "
+          f"{per_pooled:6.1f} ms/product per tab")
+    print(f"overhead saved: {per_fresh - per_pooled:.1f} ms/product per tab (x{fresh / reused:.2f})")
+    print(summary)
+
+
+def run(products: int, tabs: int, max_uses: int, latency: float) -> None:
+    with StubServer({"/shop/product/": "product_detail.html"}, latency=latency) as server:
+        asyncio.run(_bench(server, products, tabs, max_uses))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--tabs", type=int, default=4)
+    parser.add_argument("--max-uses", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub server 每個 request 的延遲（秒）")
+    args = parser.parse_args()
+    run(args.products, args.tabs, args.max_uses, args.latency)
@@ -0,0 +1,71 @@
+# benchmarks/detail_cache.py
+"""
+明細頁 cache 的效果：同一批 product 連續抓三次
+1. cold         - cache 是空的，每頁都要下載 + 解析
+2. etag         - server 支援 ETag，應該全部 304（不下載 body、不解析）
+3. hash         - server 不給 validator，重新下載但內容 hash 相同（不解析）
+最後用 cold pass 存下的總大小的一半當容量上限，確認 LRU 淘汰後總大小不超過上限。
+
+    python -m benchmarks.detail_cache --products 500 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.stub_server import StubServer
+from scraper.detail_cache import DetailPageCache
+from scraper.http_fetcher import HttpDetailFetcher
+
+ROUTES = {"/shop/product/": "product_detail.html"}
+
+
+async def _fetch_all(server: StubServer, cache: DetailPageCache, products: int, connections: int):
+    prods = [SimpleNamespace(id=i, url=server.url(f"/shop/product/{i}")) for i in range(products)]
+    async with HttpDetailFetcher(max_connections=connections, cache=cache) as fetcher:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(fetcher.fetch(p) for p in prods))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def _pass(label: str, server: StubServer, cache_path: str, products: int, connections: int, etag: bool,
+          max_bytes: int = None) -> DetailPageCache:
+    # cache 以 url 為 key，所有 pass 共用同一個 server（同一個 port）
+    cache = DetailPageCache(cache_path, max_bytes=max_bytes)
+    server.etag = etag
+    server.not_modified_count = 0
+    results, elapsed = asyncio.run(_fetch_all(server, cache, products, connections))
+    unchanged = sum(1 for r in results if r["unchanged"])
+    assert all(r["price"] == 6.49 for r in results), "cached fields differ from parsed fields"
+    print(f"{label:<6} {elapsed:6.2f}s  {products / elapsed:8.1f} products/s  "
+          f"unchanged={unchanged:<5} 304s={server.not_modified_count:<5} {cache.summary()}")
+    return cache
+
+
+def run(products: int, connections: int, latency: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp, StubServer(ROUTES, latency=latency) as server:
+        path = os.path.join(tmp, "detail_pages.sqlite3")
+        cold = _pass("cold", server, path, products, connections, etag=True)
+        assert cold.hits == 0
+        warm = _pass("etag", server, path, products, connections, etag=True)
+        assert warm.not_modified == products, "every page should revalidate with 304"
+        same = _pass("hash", server, path, products, connections, etag=False)
+        assert same.same_content == products, "every page should match its cached hash"
+
+        # 依這次產生的頁面總大小決定上限：不管 --products 多少、頁面多大都一定會淘汰
+        small_limit = cold.total_bytes // 2
+        evicting = _pass("lru", server, os.path.join(tmp, "small.sqlite3"), products, connections,
+                         etag=True, max_bytes=small_limit)
+        assert evicting.total_bytes <= small_limit and evicting.evictions > 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub server 每個 request 的延遲（秒）")
+    args = parser.parse_args()
+    run(args.products, args.connections, args.latency)
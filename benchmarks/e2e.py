@@ -0,0 +1,293 @@
+# benchmarks/e2e.py
+"""
+端到端吞吐量：啟動 benchmarks.fake_dropit，用子 process 執行真正的 scraper.main（列表）與
+scraper.fetch_product_price（明細），資料寫到 SQLite（預設）或本地 Postgres，量
+- products/s（寫進 DB 的 product 數 / 價格數 ÷ wall time）
+- 每頁 / 每個 product 的 p50 / p95 延遲（讀子 process 寫出的 metrics textfile）
+- 子 process（含 Chromium 等下層 process）的 RSS 峰值
+可以存成 JSON，之後用 --baseline 比較：products/s 下降或 p95 上升超過 --tolerance 時以 exit code 1 結束，
+部署前就能看到效能退步。列表 crawl 與 Playwright 明細需要 playwright install chromium。
+
+    python -m benchmarks.e2e --pages 3 --latency 0.05
+    python -m benchmarks.e2e --stages detail --detail-engine http --pages 10 --error-rate 0.01
+    python -m benchmarks.e2e --save bench.json
+    python -m benchmarks.e2e --baseline bench.json --tolerance 0.15
+    python -m benchmarks.e2e --db-url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import make_repo, temp_sqlite_url
+from benchmarks.fake_dropit import FakeDropit
+from scraper.db.model import Product
+from scraper.main import CATEGORY_MAP
+from scraper.metrics import MetricsRegistry
+
+ROOT = Path(__file__).resolve().parent.parent
+CATEGORY_PATH = re.compile(r"/shop/([\w-]+)/d/(\d+)")
+
+# 每個 stage：執行的 module、參數、metrics job 名稱，以及代表「一個單位」延遲的 stage
+STAGES = {
+    "listing": {"module": "scraper.main", "job": "listing", "latency_stage": "page_goto"},
+    "detail": {"module": "scraper.fetch_product_price", "job": "detail", "latency_stage": "detail_fetch_ok"},
+}
+
+
+class PeakRss:
+    """背景 thread 每 interval 秒加總 pid 與所有子孫 process 的 RSS（Linux /proc），記下最大值"""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _children(pid: int) -> List[int]:
+        children = []
+        for task in Path(f"/proc/{pid}/task").glob("*"):
+            try:
+                children.extend(int(c) for c in (task / "children").read_text().split())
+            except OSError:
+                pass
+        return children
+
+    @staticmethod
+    def _rss(pid: int) -> int:
+        try:
+            for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def _tree_rss(self) -> int:
+        total, stack = 0, [self.pid]
+        while stack:
+            pid = stack.pop()
+            total += self._rss(pid)
+            stack.extend(self._children(pid))
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if Path("/proc").exists():
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if not self.peak:
+            # 沒有 /proc（macOS）：退回最大子 process 的 ru_maxrss（macOS 單位是 bytes，Linux 是 KB）
+            maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            self.peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def seed_catalog(engine, site: FakeDropit) -> int:
+    """只跑明細時：直接把假網站的 products 寫進 DB（網址指向 site）"""
+    rows = []
+    for category, url in CATEGORY_MAP.items():
+        slug, department = CATEGORY_PATH.search(url).groups()
+        rows.extend({**row, "created_at": date.today(), "updated_at": date.today()}
+                    for row in site.product_rows(category, slug, int(department)))
+    with sessionmaker(bind=engine)() as session:
+        session.execute(insert(Product), rows)
+        session.commit()
+    return len(rows)
+
+
+def stage_env(site: FakeDropit, db_url: str, workdir: str, args) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        "BASE_URL": site.url().rstrip("/"),
+        "ALLOWED_HOST_SUFFIXES": "127.0.0.1",
+        "DATABASE_URL": db_url,
+        "METRICS": "true",
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "METRICS_PORT": "0",
+        "HOST_MIN_INTERVAL": str(args.host_min_interval),
+        "DETAIL_FETCH_ENGINE": args.detail_engine,
+        "DETAIL_CACHE_PATH": os.path.join(workdir, "cache", "detail_pages.sqlite3"),
+        "STORE_STATE_PATH": os.path.join(workdir, "state", "store_state.json"),
+        # 注入的錯誤不要讓這次執行等重試（正式環境是幾十秒起跳的 backoff）
+        "FETCH_RETRY_MAX_WAIT": "0",
+    })
+    return env
+
+
+def run_stage(name: str, site: FakeDropit, db_url: str, engine, workdir: str, args) -> dict:
+    spec = STAGES[name]
+    command = [sys.executable, "-m", spec["module"]]
+    if name == "listing":
+        command.append("--incremental")
+        if args.parallel:
+            command.append("--parallel")
+    requests_before, errors_before = site.request_count, site.error_count + site.rejected_count
+    log_path = os.path.join(workdir, f"{name}.out")
+
+    start = time.perf_counter()
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=workdir, env=stage_env(site, db_url, workdir, args),
+                                   stdout=log, stderr=subprocess.STDOUT)
+        with PeakRss(process.pid) as rss:
+            try:
+                returncode = process.wait(timeout=args.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                returncode = process.wait()
+    wall = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        if name == "listing":
+            units = conn.execute(select(func.count()).select_from(Product)).scalar_one()
+        else:
+            units = conn.execute(
+                select(func.count()).select_from(Product).where(Product.sku.is_not(None))
+            ).scalar_one()
+
+    result = {
+        "stage": name,
+        "returncode": returncode,
+        "wall": wall,
+        "units": units,
+        "per_second": units / wall if wall else 0.0,
+        "requests": site.request_count - requests_before,
+        "server_errors": site.error_count + site.rejected_count - errors_before,
+        "peak_rss_mb": rss.peak / 1024 / 1024,
+        "p50_ms": None,
+        "p95_ms": None,
+    }
+    prom = os.path.join(workdir, "metrics", f"{spec['job']}.prom")
+    if os.path.exists(prom):
+        h = MetricsRegistry.from_textfile(prom).histogram("stage_seconds", stage=spec["latency_stage"])
+        if h.count:
+            result["p50_ms"] = h.quantile(0.5) * 1000
+            result["p95_ms"] = h.quantile(0.95) * 1000
+    if returncode != 0:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            result["error"] = "".join(f.readlines()[-15:])
+    return result
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_results(results: List[dict]) -> None:
+    print(f"{'stage':<8} {'status':>6} {'wall s':>7} {'units':>7} {'units/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'requests':>8} {'5xx':>5} {'peak MB':>8}")
+    for r in results:
+        status = "ok" if r["returncode"] == 0 else f"rc={r['returncode']}"
+        print(f"{r['stage']:<8} {status:>6} {r['wall']:7.1f} {r['units']:7d} {r['per_second']:8.1f} "
+              f"{_ms(r['p50_ms'])} {_ms(r['p95_ms'])} {r['requests']:8d} {r['server_errors']:5d} "
+              f"{r['peak_rss_mb']:8.0f}")
+    print("units: listing = products in DB, detail = products with SKU filled in")
+    for r in results:
+        if r.get("error"):
+            print(f"\n--- {r['stage']} exited with {r['returncode']}, last lines of output:\n{r['error']}")
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+    """與 baseline 比較，回傳退步的項目"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["stage"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["stage"])
+        if base is None or r["returncode"] != 0:
+            continue
+        if base["per_second"] and r["per_second"] < base["per_second"] * (1 - tolerance):
+            regressions.append(f"{r['stage']}: {r['per_second']:.1f} units/s vs baseline {base['per_second']:.1f}")
+        if base.get("p95_ms") and r["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['stage']}: p95 {r['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        if base["peak_rss_mb"] and r["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{r['stage']}: peak {r['peak_rss_mb']:.0f} MB vs baseline {base['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def run(args) -> int:
+    workdir = tempfile.mkdtemp(prefix="dropit-e2e-")
+    db_url = args.db_url or temp_sqlite_url("e2e")
+    _, engine = make_repo(db_url)
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    results = []
+    try:
+        with FakeDropit(pages=args.pages, per_page=args.per_page, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, js_only_rate=args.js_only_rate,
+                        capacity=args.capacity) as site:
+            if "listing" not in stages:
+                seeded = seed_catalog(engine, site)
+                print(f"Seeded {seeded} products from the fake catalog")
+            print(f"{len(CATEGORY_MAP)} categories x {args.pages} pages x {args.per_page} per page, "
+                  f"latency {args.latency * 1000:.0f}+{args.jitter * 1000:.0f}ms, error rate {args.error_rate:.1%}, "
+                  f"detail engine {args.detail_engine}, DB {engine.url.get_backend_name()}")
+            for stage in stages:
+                results.append(run_stage(stage, site, db_url, engine, workdir, args))
+    finally:
+        engine.dispose()
+        if args.keep:
+            print(f"Kept logs / metrics in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2, default=str)
+        print(f"Saved results to {args.save}")
+    failed = any(r["returncode"] != 0 for r in results)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=None, help="預設為暫存 SQLite；指向 Postgres 時資料表會被重建")
+    parser.add_argument("--stages", default="listing,detail", help="依序執行：listing、detail")
+    parser.add_argument("--pages", type=int, default=3, help="每個類別幾頁")
+    parser.add_argument("--per-page", type=int, default=96)
+    parser.add_argument("--latency", type=float, default=0.05, help="假網站每個 request 的延遲（秒）")
+    parser.add_argument("--jitter", type=float, default=0.05, help="額外的隨機延遲上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="隨機回 503 的比例")
+    parser.add_argument("--capacity", type=int, default=0, help="假網站同時處理上限（0 = 不限制）")
+    parser.add_argument("--js-only-rate", type=float, default=0.0, help="明細頁需要 JS 的比例（http engine 會 fallback）")
+    parser.add_argument("--detail-engine", default="playwright", choices=["playwright", "http"])
+    parser.add_argument("--parallel", action="store_true", help="列表 crawl 用 scraper.main --parallel")
+    parser.add_argument("--host-min-interval", type=float, default=0.0,
+                        help="HOST_MIN_INTERVAL（正式預設 0.5 秒；benchmark 預設不限速）")
+    parser.add_argument("--timeout", type=float, default=1800, help="每個 stage 最多跑幾秒")
+    parser.add_argument("--save", default=None, help="結果存成 JSON")
+    parser.add_argument("--baseline", default=None, help="與之前 --save 的 JSON 比較")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="容許的退步比例")
+    parser.add_argument("--keep", action="store_true", help="保留子 process 的 log 與 metrics")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,107 @@
+# benchmarks/event_loop_lag.py
+"""
+明細 fetch 的 DB 寫入會不會卡住 event loop：workers 用 asyncio.sleep 模擬載入頁面，
+結果經 PriceWriteBuffer 寫入 DB、向 product_fetch_queue 領 lease，同時有一個 task 每 5ms 醒來一次量 event loop lag。
+- sync  ：在 event loop 裡直接呼叫 sync repository（舊的 add_result / flush 行為）
+- thread：*_async 方法，沒有 async driver 時退回 thread pool
+- async ：*_async 方法走 async driver（SQLite → aiosqlite、Postgres → asyncpg）
+sync 模式的 lag 約等於每次 flush / claim 的 DB 時間。SQLite 在同一個 process 裡執行，剩下的 lag 主要是
+ORM / SQL 編譯的 CPU 時間；Postgres 的網路等待才是 async driver 真正省下的部分。
+
+    python -m benchmarks.event_loop_lag --products 6000 --flush-size 1000
+    python -m benchmarks.event_loop_lag --db-url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper.db.write_buffer import PriceWriteBuffer
+from scraper.run_stats import percentile
+
+TICK = 0.005
+
+
+async def _monitor(lags: list, stop: asyncio.Event) -> None:
+    """每 TICK 秒醒來一次，記錄比預期晚了多久"""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _pipeline(repo, mode: str, workers: int, batch: int, page_latency: float, flush_size: int) -> dict:
+    buffer = PriceWriteBuffer(repo, flush_size=flush_size, complete_tasks=True)
+    lags, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(_monitor(lags, stop))
+    queue: asyncio.Queue = asyncio.Queue()
+    done = 0
+
+    async def claim():
+        if mode == "sync":
+            return repo.claim_products("bench", batch)
+        return await repo.claim_products_async("bench", batch)
+
+    async def worker():
+        nonlocal done
+        while True:
+            prod = await queue.get()
+            if prod is None:
+                return
+            await asyncio.sleep(page_latency)  # 模擬 page.goto + wait_for_selector
+            result = {"prod": prod, "price": 1.23, "sku": f"sku-{prod.id}", "location": "Aisle 1"}
+            if mode == "sync":
+                buffer.add_result(result)
+            else:
+                await buffer.add_result_async(result)
+            done += 1
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    while True:
+        products = await claim()
+        if not products:
+            break
+        for prod in products:
+            await queue.put(prod)
+        while queue.qsize() > workers:
+            await asyncio.sleep(TICK)
+    for _ in tasks:
+        await queue.put(None)
+    await asyncio.gather(*tasks)
+    if mode == "sync":
+        buffer.flush()
+    else:
+        await buffer.flush_async()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    lags.sort()
+    return {"elapsed": elapsed, "done": done, "prices": buffer.total_prices,
+            "p50": percentile(lags, 50), "p99": percentile(lags, 99), "max": lags[-1] if lags else 0.0}
+
+
+def run(db_url: str, products: int, workers: int, batch: int, page_latency: float, flush_size: int) -> None:
+    print(f"{products} products, {workers} workers, page latency {page_latency * 1000:.0f}ms, "
+          f"flush every {flush_size}, claim {batch} at a time")
+    for mode in ("sync", "thread", "async"):
+        url = db_url or temp_sqlite_url(f"loop_lag_{mode}")
+        repo, engine = make_repo(url, async_driver=mode == "async")
+        seed_products(engine, products)
+        repo.seed_fetch_queue()
+        r = asyncio.run(_pipeline(repo, mode, workers, batch, page_latency, flush_size))
+        assert r["prices"] == products, r
+        print(f"{mode:<7} {r['done'] / r['elapsed']:7.1f} products/s  loop lag p50={r['p50'] * 1000:6.1f}ms "
+              f"p99={r['p99'] * 1000:6.1f}ms max={r['max'] * 1000:6.1f}ms  ({r['elapsed']:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=None, help="預設為暫存 SQLite；指向 Postgres 時資料表會被重建")
+    parser.add_argument("--products", type=int, default=6000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=200, help="每次 claim_products 領幾個")
+    parser.add_argument("--page-latency", type=float, default=0.01, help="模擬每個明細頁的載入時間（秒）")
+    parser.add_argument("--flush-size", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.db_url, args.products, args.workers, args.batch, args.page_latency, args.flush_size)
@@ -0,0 +1,268 @@
+# benchmarks/fake_dropit.py
+"""
+本地的假 dropit：產生符合 Selector / ProductDetailSelector 的類別列表與產品明細頁，不必連到正式網站。
+- /shop/<類別>/d/<部門 id>#!/?limit=96&page=N：跟正式網站一樣是前端 render，頁面載入後由 script 依網址的
+  page 取得列表片段（/_fake/listing/...）塞進頁面；網址的 query string 帶 page=N 時直接回傳完整 HTML
+- /shop/product/<slug>/p/<產品 id>：靜態的明細頁（js_only_rate 比例回傳需要 JS 的空殼，測 HTTP → Playwright fallback）
+每個類別 pages 頁、每頁 per_page 個 product（最後一頁半滿），內容由 seed 決定，重複執行結果相同。
+延遲、隨機錯誤、同時處理上限沿用 StubServer。scraper.main 的 CATEGORY_MAP 跟著 BASE_URL，
+所以任何類別網址都能直接對應。
+
+    python -m benchmarks.fake_dropit --port 8800 --pages 5 --latency 0.05 --error-rate 0.01
+    BASE_URL=http://127.0.0.1:8800 ALLOWED_HOST_SUFFIXES=127.0.0.1 python -m scraper.main --parallel
+"""
+import argparse
+import html
+import random
+import re
+import time
+import zlib
+from typing import Iterator, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.stub_server import StubServer
+
+LISTING_PATH = re.compile(r"^/shop/([\w-]+)/d/(\d+)/?$")
+FRAGMENT_PATH = re.compile(r"^/_fake/listing/([\w-]+)/(\d+)/?$")
+DETAIL_PATH = re.compile(r"^/shop/product/[\w-]+/p/(\d+)/?$")
+# 產品 id = 部門 id x ITEM_SPACE + 類別內序號，明細頁可以從 id 反推出是哪個 product
+ITEM_SPACE = 100000
+NAME_WORDS = ["Bread", "Milk", "Cheese", "Butter", "Coffee", "Tea", "Rice", "Pasta", "Apple", "Salmon",
+              "Chicken", "Yogurt", "Cereal", "Juice", "Soup", "Beans", "Cookies", "Honey", "Olive Oil", "Flour"]
+
+SHELL_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>{title} | Dropit</title>
+</head>
+<body>
+  <div id="fp-root"></div>
+  <script>
+  (function () {{
+    var root = document.getElementById('fp-root');
+    function currentPage() {{
+      var match = /[?&]page=(\\d+)/.exec(location.hash) || /[?&]page=(\\d+)/.exec(location.search);
+      return match ? parseInt(match[1], 10) : 1;
+    }}
+    function render() {{
+      root.innerHTML = '';
+      fetch('/_fake/listing/{slug}/{department}?page=' + currentPage())
+        .then(function (response) {{ if (!response.ok) throw new Error(response.status); return response.text(); }})
+        .then(function (body) {{ root.innerHTML = body; }});
+    }}
+    // 點分頁按鈕時先清空，等待 selector 時不會讀到上一頁的列表
+    document.addEventListener('click', function (event) {{
+      var link = event.target.closest('a[href^="#"]');
+      if (link) root.innerHTML = '';
+    }}, true);
+    window.addEventListener('hashchange', render);
+    render();
+  }})();
+  </script>
+</body>
+</html>
+"""
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>{title} | Dropit</title>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+ITEM_TEMPLATE = """    <li class="fp-item">
+      <div class="fp-item-content">
+        <div class="fp-item-image"><img src="/img/{product_id}.jpg" alt=""></div>
+        <div class="fp-item-name"><span><a href="{url}">{name}</a></span></div>
+        <div class="fp-item-price">
+          <span class="fp-item-base-price">${price}</span>
+          <span class="fp-item-size">{unit}</span>
+        </div>
+      </div>
+    </li>"""
+
+DETAIL_TEMPLATE = """  <div class="fp-page-content">
+    <h1 class="fp-page-header fp-page-title">{name}</h1>
+    <div class="fp-item-detail fp-item-detail-lg">
+      <div class="fp-item-image"><img src="/img/{product_id}.jpg" alt=""></div>
+      <div class="fp-item-price">
+        <span class="fp-item-base-price">${price}</span>
+        <span class="fp-item-size">{unit}</span>
+      </div>
+      <div class="fp-item-upc">
+        <span class="fp-label">UPC</span>
+        <span class="fp-value">{sku}</span>
+      </div>
+      <div class="fp-item-location">
+        <span class="fp-label">Location:</span>
+        <span class="fp-value">Aisle {aisle}</span>
+      </div>
+    </div>
+  </div>"""
+
+JS_ONLY_BODY = """  <div id="fp-app"></div>
+  <script src="/js/app.js"></script>"""
+
+
+class FakeCatalog:
+    """依 (seed, 部門 id, 序號) 決定每個 product 的內容；不存任何狀態"""
+
+    def __init__(self, pages: int = 5, per_page: int = 96, seed: int = 0):
+        self.pages = pages
+        self.per_page = per_page
+        self.seed = seed
+
+    @property
+    def items_per_category(self) -> int:
+        return self.pages * self.per_page - self.per_page // 2
+
+    def product(self, department: int, index: int, slug: str = "item") -> dict:
+        """slug 只影響網址；明細頁只知道 id，內容一樣"""
+        rng = random.Random(f"{self.seed}:{department}:{index}")
+        product_id = department * ITEM_SPACE + index
+        return {
+            "product_id": product_id,
+            "name": f"{rng.choice(NAME_WORDS)} & {rng.choice(NAME_WORDS)} {index}",
+            "price": f"{rng.randint(99, 4999) / 100:.2f}",
+            "unit": f"{rng.choice([1, 4, 8, 12, 16, 20, 32])} oz",
+            "sku": f"{rng.randint(10 ** 11, 10 ** 12 - 1):013d}",
+            "aisle": rng.randint(1, 24),
+            "path": f"/shop/product/{slug}-item-{index}/p/{product_id}",
+        }
+
+    def products(self, slug: str, department: int) -> Iterator[dict]:
+        for index in range(self.items_per_category):
+            yield self.product(department, index, slug)
+
+    def listing_fragment(self, slug: str, department: int, page: int) -> str:
+        total = self.items_per_category
+        start = (page - 1) * self.per_page
+        end = min(start + self.per_page, total)
+        items = [
+            ITEM_TEMPLATE.format(url=p["path"], name=html.escape(p["name"]), price=p["price"],
+                                 unit=p["unit"], product_id=p["product_id"])
+            for p in (self.product(department, i, slug) for i in range(start, end))
+        ]
+        pager = ['    <li class="fp-pager-item fp-pager-item-prev"><a class="fp-btn-prev">Prev</a></li>']
+        for number in range(1, self.pages + 1):
+            link = "<a>{0}</a>" if number == page else '<a href="#!/?limit={1}&amp;page={0}">{0}</a>'
+            pager.append(f'    <li class="fp-pager-item">{link.format(number, self.per_page)}</li>')
+        if page < self.pages:
+            pager.append(f'    <li class="fp-pager-item fp-pager-item-next"><a class="fp-btn-next" '
+                         f'href="#!/?limit={self.per_page}&amp;page={page + 1}">Next</a></li>')
+        else:
+            pager.append('    <li class="fp-pager-item fp-pager-item-next">'
+                         '<a class="fp-btn-next fp-disabled">Next</a></li>')
+        return (
+            f'  <div class="fp-result-count">Showing {start + 1} - {end} of {total}</div>\n'
+            f'  <ul class="fp-product-list">\n' + "\n".join(items) + "\n  </ul>\n"
+            f'  <ul class="fp-pager">\n' + "\n".join(pager) + "\n  </ul>"
+        )
+
+    def detail_page(self, product_id: int, js_only: bool = False) -> Optional[str]:
+        department, index = divmod(product_id, ITEM_SPACE)
+        if index >= self.items_per_category:
+            return None
+        p = self.product(department, index)
+        if js_only:
+            return PAGE_TEMPLATE.format(title="Dropit", body=JS_ONLY_BODY)
+        body = DETAIL_TEMPLATE.format(name=html.escape(p["name"]), **{k: v for k, v in p.items() if k != "name"})
+        return PAGE_TEMPLATE.format(title=html.escape(p["name"]), body=body)
+
+
+class FakeDropit(StubServer):
+    """
+    用法：
+        with FakeDropit(pages=3, latency=0.05, error_rate=0.01) as site:
+            base_url = site.url()
+    jitter：每個 request 額外隨機延遲 0~jitter 秒。其他參數見 StubServer。
+    """
+
+    def __init__(self, pages: int = 5, per_page: int = 96, seed: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, js_only_rate: float = 0.0, **kwargs):
+        delay = (lambda _: latency + random.uniform(0, jitter)) if jitter else latency
+        super().__init__({}, latency=delay, **kwargs)
+        self.catalog = FakeCatalog(pages, per_page, seed)
+        self.js_only_rate = js_only_rate
+        self.listing_requests = 0
+        self.detail_requests = 0
+
+    def match(self, path: str):
+        parts = urlsplit(path)
+        query = parse_qs(parts.query)
+        page = int(query.get("page", ["1"])[0])
+
+        match = LISTING_PATH.match(parts.path)
+        if match:
+            slug, department = match.group(1), int(match.group(2))
+            title = html.escape(slug.replace("_", " ").title())
+            if "page" not in query:
+                return SHELL_TEMPLATE.format(title=title, slug=slug, department=department).encode()
+            self.listing_requests += 1
+            return self._listing_page(title, slug, department, page)
+
+        match = FRAGMENT_PATH.match(parts.path)
+        if match:
+            self.listing_requests += 1
+            if not 1 <= page <= self.catalog.pages:
+                return None
+            return self.catalog.listing_fragment(match.group(1), int(match.group(2)), page).encode()
+
+        match = DETAIL_PATH.match(parts.path)
+        if match:
+            self.detail_requests += 1
+            product_id = int(match.group(1))
+            # 同一個 product 每次都一樣：用 id 決定是不是 JS 空殼
+            js_only = self.js_only_rate and (zlib.crc32(str(product_id).encode()) % 1000) < self.js_only_rate * 1000
+            body = self.catalog.detail_page(product_id, js_only=bool(js_only))
+            return body.encode() if body else None
+
+        if parts.path == "/":
+            return PAGE_TEMPLATE.format(title="Home", body="  <h1>Dropit (fake)</h1>").encode()
+        return None
+
+    def _listing_page(self, title: str, slug: str, department: int, page: int):
+        if not 1 <= page <= self.catalog.pages:
+            return None
+        fragment = self.catalog.listing_fragment(slug, department, page)
+        return PAGE_TEMPLATE.format(title=title, body=fragment).encode()
+
+    def product_rows(self, category: str, slug: str, department: int) -> Iterator[dict]:
+        """直接寫進 products 的資料（只跑明細 benchmark、不先跑列表 crawl 時用）"""
+        for p in self.catalog.products(slug, department):
+            yield {
+                "name": p["name"],
+                "price": p["price"],
+                "unit": p["unit"],
+                "url": self.url(p["path"]),
+                "category": category,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--pages", type=int, default=5, help="每個類別幾頁")
+    parser.add_argument("--per-page", type=int, default=96)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個 request 的延遲（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="額外的隨機延遲上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="隨機回 503 的比例")
+    parser.add_argument("--capacity", type=int, default=0, help="同時處理超過這個數量回 503（0 = 不限制）")
+    parser.add_argument("--js-only-rate", type=float, default=0.0, help="明細頁需要 JS 的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with FakeDropit(pages=args.pages, per_page=args.per_page, seed=args.seed, latency=args.latency,
+                    jitter=args.jitter, js_only_rate=args.js_only_rate, port=args.port,
+                    error_rate=args.error_rate, capacity=args.capacity) as site:
+        print(f"Fake dropit at {site.url()}  (BASE_URL={site.url().rstrip('/')} ALLOWED_HOST_SUFFIXES=127.0.0.1)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
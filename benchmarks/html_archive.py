@@ -0,0 +1,101 @@
+# benchmarks/html_archive.py
+"""
+原始 HTML archive（scraper.html_archive）與離線重新解析（scraper.reparse）：
+1. 把 fixtures 的列表頁 / 明細頁（價格每頁不同）寫進暫存 archive，比較各 codec / 壓縮等級的
+   壓縮率、每頁寫入時間（crawl 時多花的時間）與資料檔大小
+2. 用預設 codec 的 archive 跑 reparse（dry run，不寫 DB）：1 個 process vs --processes 個 process 的 pages/s，
+   並確認解析出的 products 數量與直接解析 fixture 相同
+
+    python -m benchmarks.html_archive --pages 2000
+    python -m benchmarks.html_archive --pages 5000 --processes 8 --level 1 --level 3 --level 9
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.stub_server import FIXTURE_DIR
+from scraper import html_archive, reparse
+from scraper.listing_parser import extract_product_info
+
+LISTING = (FIXTURE_DIR / "listing_page.html").read_text(encoding="utf-8")
+DETAIL = (FIXTURE_DIR / "product_detail.html").read_text(encoding="utf-8")
+PRICE = re.compile(r"\$\d+\.\d{2}")
+
+
+def pages(count: int, seed: int = 0):
+    """(kind, url, html, meta)：每 10 頁裡 1 頁列表、9 頁明細（接近每天的比例），價格隨機替換"""
+    rng = random.Random(seed)
+
+    def reprice(html: str) -> str:
+        return PRICE.sub(lambda _: f"${rng.randint(100, 9999) / 100:.2f}", html)
+
+    for i in range(count):
+        if i % 10 == 0:
+            yield (html_archive.KIND_LISTING, f"https://example.test/listing/{i}", reprice(LISTING),
+                   {"category": "bench", "page": i})
+        else:
+            yield html_archive.KIND_DETAIL, f"https://example.test/p/{i}", reprice(DETAIL), {"product_id": i}
+
+
+def write_archive(root: str, count: int, codec: str, level: int) -> dict:
+    archive = html_archive.HtmlArchive(root=root, level=level, codec=codec)
+    start = time.perf_counter()
+    for kind, url, html, meta in pages(count):
+        archive.append(kind, url, html, **meta)
+    seconds = time.perf_counter() - start
+    archive.close()
+    return {"codec": f"{codec} {level}", "pages": archive.pages, "raw_mb": archive.raw_bytes / 1e6,
+            "stored_mb": archive.stored_bytes / 1e6, "ms_per_page": seconds * 1000 / archive.pages,
+            "index_mb": os.path.getsize(os.path.splitext(archive.path)[0] + ".idx") / 1e6}
+
+
+def run(args) -> None:
+    codecs = [("zlib", 6)]
+    if html_archive.zstandard is not None:
+        codecs = [("zstd", level) for level in args.level or [1, 3, 9]] + codecs
+    else:
+        print("zstandard is not installed; only zlib is measured")
+
+    print(f"{args.pages} pages ({args.pages // 10} listing + {args.pages - args.pages // 10} detail)")
+    print(f"{'codec':<10}{'raw MB':>9}{'stored MB':>11}{'ratio':>8}{'index MB':>10}{'ms/page':>9}")
+    root = tempfile.mkdtemp(prefix="dropit-archive-")
+    try:
+        for codec, level in codecs:
+            directory = os.path.join(root, f"{codec}-{level}")
+            r = write_archive(directory, args.pages, codec, level)
+            print(f"{r['codec']:<10}{r['raw_mb']:>9.1f}{r['stored_mb']:>11.2f}{r['raw_mb'] / r['stored_mb']:>8.1f}"
+                  f"{r['index_mb']:>10.2f}{r['ms_per_page']:>9.3f}")
+
+        codec, level = codecs[0] if html_archive.zstandard is None else ("zstd", 3)
+        directory = os.path.join(root, f"{codec}-{level}")
+        if not os.path.isdir(directory):
+            write_archive(directory, args.pages, codec, level)
+        expected = len(extract_product_info(LISTING)) * len(range(0, args.pages, 10))
+        day = date.today().isoformat()
+        print(f"reparse ({codec} {level}, dry run, {args.chunk_pages} pages per chunk):")
+        for processes in sorted({1, args.processes}):
+            ingest = reparse.reparse(None, day, processes=processes, chunk_pages=args.chunk_pages,
+                                     dry_run=True, root=directory)
+            stats = ingest.stats
+            total = stats["listing_pages"] + stats["detail_pages"]
+            ok = "✅" if stats["listing_products"] == expected and stats["detail_priced"] == stats["detail_pages"] else "❌"
+            print(f"  {processes:>2} processes: {total / stats['seconds']:>8,.0f} pages/s, "
+                  f"{stats['listing_products']:,} listing products (expected {expected:,}), "
+                  f"{stats['detail_priced']:,}/{stats['detail_pages']:,} detail prices {ok}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--level", type=int, action="append", help="zstd 壓縮等級，可指定多次（預設 1、3、9）")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-pages", type=int, default=200)
+    args = parser.parse_args()
+    run(args)
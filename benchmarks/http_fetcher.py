@@ -0,0 +1,54 @@
+# benchmarks/http_fetcher.py
+"""
+用 stub server 回放錄好的明細頁，量測純 HTTP 明細抓取的速度並檢查解析結果：
+- /shop/product/...  → 有 server-side render 的頁面，應該直接解析成功
+- /js-only/...       → 只有 JS 殼的頁面，應該 raise HttpFetchError（正式流程會 fallback 到 Playwright）
+
+    python -m benchmarks.http_fetcher --products 500 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from benchmarks.stub_server import StubServer
+from scraper.http_fetcher import HttpDetailFetcher, HttpFetchError
+
+EXPECTED = {"price": 6.49, "sku": "0072250011297", "location": "Aisle 7"}
+
+
+async def _run(server: StubServer, products: int, connections: int) -> None:
+    async with HttpDetailFetcher(max_connections=connections) as fetcher:
+        prod = SimpleNamespace(id=0, url=server.url("/shop/product/0"))
+        result = await fetcher.fetch(prod)
+        parsed = {key: result[key] for key in EXPECTED}
+        assert parsed == EXPECTED, f"parse mismatch: {parsed} != {EXPECTED}"
+
+        try:
+            await fetcher.fetch(SimpleNamespace(id=0, url=server.url("/js-only/0")))
+            raise AssertionError("JS-only page should not parse via HTTP")
+        except HttpFetchError as e:
+            print(f"JS-only page correctly rejected: {e}")
+
+        prods = [SimpleNamespace(id=i, url=server.url(f"/shop/product/{i}")) for i in range(products)]
+        start = time.perf_counter()
+        await asyncio.gather(*(fetcher.fetch(p) for p in prods))
+        elapsed = time.perf_counter() - start
+
+    print(f"Fetched {products} products in {elapsed:.2f}s → {products / elapsed:,.1f} products/s "
+          f"(connections={connections}, latency={server.latency * 1000:.0f}ms)")
+
+
+def run(products: int, connections: int, latency: float) -> None:
+    routes = {"/shop/product/": "product_detail.html", "/js-only/": "product_detail_js_only.html"}
+    with StubServer(routes, latency=latency) as server:
+        asyncio.run(_run(server, products, connections))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server 每個 request 的延遲（秒）")
+    args = parser.parse_args()
+    run(args.products, args.connections, args.latency)
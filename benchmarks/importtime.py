@@ -0,0 +1,172 @@
+# benchmarks/importtime.py
+"""
+cron 的短命指令（init_db、backfill、匯出、orchestrator 主 process）啟動時間：
+每個 entry module 在乾淨的子 process 裡 `python -X importtime -c "import <module>"`，量
+- import 的 wall time（不含直譯器本身的啟動），取 --repeat 次的中位數
+- 自身耗時最多的幾個模組（-X importtime 的 self 欄）
+- 不該被載入的模組（DB driver、Playwright、bs4、pandas……）
+超過 budget 或載入了禁止的模組時以 exit code 1 結束；--save / --baseline 與 benchmarks.e2e 相同。
+子 process 的工作目錄是暫存資料夾（不讀專案的 .env，logs/ 也寫在那裡）。
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --repeat 10 --top 8
+    python -m benchmarks.importtime --save imports.json
+    python -m benchmarks.importtime --baseline imports.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DRIVERS = ("psycopg", "psycopg2", "asyncpg", "aiosqlite", "sqlalchemy.ext.asyncio")
+BROWSER = ("playwright",)
+ANALYTICS = ("pandas", "pyarrow")
+
+
+class Target(NamedTuple):
+    module: str
+    budget_ms: float
+    forbidden: Tuple[str, ...]
+
+
+# budget 約為開發機實測的兩倍；module 本身需要的相依（例如 main 需要 Playwright）不列入 forbidden
+TARGETS = [
+    Target("scraper.config", 60, ("sqlalchemy", *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.metrics", 150, ("sqlalchemy", *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.db", 60, ("sqlalchemy", *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.orchestrator", 200, ("sqlalchemy", *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.reparse", 200, ("sqlalchemy", *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.db.repository_factory", 900, (*DRIVERS, *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.db.price_spans", 900, (*DRIVERS, *BROWSER, "bs4", *ANALYTICS)),
+    Target("scraper.export_parquet", 400, ("sqlalchemy", *BROWSER, "bs4", "pandas")),
+    Target("scraper.main", 1200, (*DRIVERS, "bs4", *ANALYTICS)),
+    Target("scraper.fetch_product_price", 1300, (*DRIVERS, "bs4", *ANALYTICS)),
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """-X importtime 的輸出 → {module: self µs}"""
+    self_us = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us[fields[2].strip()] = int(fields[0])
+    return self_us
+
+
+def probe(module: str, workdir: str) -> Tuple[float, List[str], Dict[str, int]]:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])),
+           "LISTING_PARSER": "lxml", "METRICS_PORT": "0"}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+                          cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["seconds"], result["modules"], parse_importtime(proc.stderr)
+
+
+def _loaded(modules: List[str], names: Tuple[str, ...]) -> List[str]:
+    return [name for name in names if any(m == name or m.startswith(name + ".") for m in modules)]
+
+
+def measure(target: Target, repeat: int, top: int, workdir: str) -> dict:
+    times, modules, self_us = [], [], {}
+    for _ in range(repeat):
+        seconds, modules, self_us = probe(target.module, workdir)
+        times.append(seconds * 1000)
+    slowest = sorted(self_us.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": target.module,
+        "import_ms": round(statistics.median(times), 1),
+        "budget_ms": target.budget_ms,
+        "modules_loaded": len(modules),
+        "forbidden_loaded": _loaded(modules, target.forbidden),
+        "slowest": [[name, round(us / 1000, 1)] for name, us in slowest],
+    }
+
+
+def print_results(results: List[dict]) -> None:
+    print(f"{'module':<32}{'import':>10}{'budget':>10}{'modules':>9}  forbidden loaded / slowest (self ms)")
+    for r in results:
+        flag = "" if r["import_ms"] <= r["budget_ms"] else "  ⚠️"
+        forbidden = ", ".join(r["forbidden_loaded"]) or "-"
+        slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in r["slowest"])
+        print(f"{r['module']:<32}{r['import_ms']:>8.0f}ms{r['budget_ms']:>8.0f}ms{r['modules_loaded']:>9}  "
+              f"{forbidden}{flag}")
+        print(f"{'':<61}{slowest}")
+
+
+def check(results: List[dict], budget_scale: float) -> List[str]:
+    problems = []
+    for r in results:
+        if r["forbidden_loaded"]:
+            problems.append(f"{r['module']} loads {', '.join(r['forbidden_loaded'])}")
+        if r["import_ms"] > r["budget_ms"] * budget_scale:
+            problems.append(f"{r['module']}: {r['import_ms']:.0f} ms > budget {r['budget_ms'] * budget_scale:.0f} ms")
+    return problems
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+    """與 baseline 比較，回傳變慢的 module"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["module"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["module"])
+        if base and r["import_ms"] > base["import_ms"] * (1 + tolerance):
+            regressions.append(f"{r['module']}: {r['import_ms']:.0f} ms vs baseline {base['import_ms']:.0f} ms")
+    return regressions
+
+
+def run(args) -> int:
+    targets = [t for t in TARGETS if not args.modules or t.module in args.modules]
+    with tempfile.TemporaryDirectory(prefix="importtime_") as workdir:
+        # 第一次 import 會寫 .pyc，先暖一次再量
+        for target in targets:
+            probe(target.module, workdir)
+        results = [measure(target, args.repeat, args.top, workdir) for target in targets]
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    problems = check(results, args.budget_scale)
+    if args.baseline:
+        problems += compare(results, args.baseline, args.tolerance)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ All imports within budget")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help="只量這些 module（預設全部）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="列出自身耗時最多的幾個模組")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="較慢的機器（CI）放寬 budget")
+    parser.add_argument("--save", default=None, help="結果存成 JSON")
+    parser.add_argument("--baseline", default=None, help="與之前 --save 的 JSON 比較")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="容許的變慢比例")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,99 @@
+# benchmarks/lease_contention.py
+"""
+多個本地 process 同時向 product_fetch_queue 領 lease，檢查：
+- 沒有任何 product 被兩個 worker 同時領取
+- 每個 product 剛好一筆今天的 price history
+- 模擬 crash 的 worker（領了不做、不釋放）在 lease 過期後會被其他 worker 接手
+
+    python -m benchmarks.lease_contention --workers 4 --products 2000
+    python -m benchmarks.lease_contention --db-url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import multiprocessing
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper.db.model import ProductPriceHistory
+from scraper.db.product_repo import ProductRepository
+
+
+def _repo(db_url: str) -> ProductRepository:
+    # SQLite 只允許單一 writer，其他 process 等鎖最多 30 秒
+    connect_args = {"timeout": 30} if db_url.startswith("sqlite") else {}
+    engine = create_engine(db_url, connect_args=connect_args)
+    return ProductRepository(sessionmaker(bind=engine), None)
+
+
+def worker(db_url: str, worker_id: str, batch: int, lease_seconds: int, result_queue) -> None:
+    repo = _repo(db_url)
+    claimed = []
+    while True:
+        products = repo.claim_products(worker_id, batch, lease_seconds=lease_seconds)
+        if not products:
+            # 可能還有別人持有、快過期的 lease，等一下再確認一次
+            time.sleep(lease_seconds)
+            products = repo.claim_products(worker_id, batch, lease_seconds=lease_seconds)
+            if not products:
+                break
+        ids = [p.id for p in products]
+        claimed.extend(ids)
+        time.sleep(0.001 * len(ids))  # 模擬抓頁面
+        repo.insert_price_histories([{"product_id": pid, "price": 1.23} for pid in ids])
+        repo.complete_fetch_tasks(ids)
+    result_queue.put((worker_id, claimed))
+
+
+def run(db_url: str, workers: int, products: int, batch: int, lease_seconds: int) -> None:
+    repo, engine = make_repo(db_url)
+    seed_products(engine, products)
+    repo.seed_fetch_queue()
+
+    # 模擬一個 crash 的 worker：領走一批就消失，不 complete 也不 release
+    crashed = repo.claim_products("crashed-worker", batch, lease_seconds=lease_seconds)
+
+    result_queue = multiprocessing.Queue()
+    start = time.perf_counter()
+    procs = [
+        multiprocessing.Process(target=worker, args=(db_url, f"worker-{i}", batch, lease_seconds, result_queue))
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    results = [result_queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    claims = Counter()
+    for worker_id, claimed in results:
+        claims.update(claimed)
+        print(f"  {worker_id}: {len(claimed)} products")
+    duplicates = [pid for pid, n in claims.items() if n > 1]
+
+    with sessionmaker(bind=engine)() as session:
+        history_rows = session.execute(select(func.count()).select_from(ProductPriceHistory)).scalar_one()
+
+    recovered = len({p.id for p in crashed} & set(claims))
+    print(f"{workers} workers claimed {sum(claims.values())} products in {elapsed:.2f}s")
+    print(f"  duplicate claims   : {len(duplicates)}")
+    print(f"  price history rows : {history_rows} (expected {products})")
+    print(f"  expired leases taken over: {recovered}/{len(crashed)}")
+    assert not duplicates, f"products claimed twice: {duplicates[:10]}"
+    assert history_rows == products
+    assert recovered == len(crashed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=None, help="預設為暫存 SQLite（資料表會被重建）")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--lease-seconds", type=int, default=2)
+    args = parser.parse_args()
+    run(args.db_url or temp_sqlite_url("lease_contention"), args.workers, args.products, args.batch,
+        args.lease_seconds)
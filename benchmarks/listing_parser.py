@@ -0,0 +1,62 @@
+# benchmarks/listing_parser.py
+"""
+列表頁 parser backend 的 golden fixture 一致性檢查 + micro-benchmark（pages/s）。
+fixtures/listing_page.html 的預期結果存在 fixtures/listing_page.golden.json；
+每個已安裝的 backend 都必須與 golden 完全一致（含 Decimal 價格）才會開始計時。
+
+    python -m benchmarks.listing_parser --pages 200
+    python -m benchmarks.listing_parser --update-golden   # 以 bs4（原始實作）重新產生 golden
+"""
+import argparse
+import json
+import time
+
+from benchmarks.stub_server import FIXTURE_DIR
+from scraper.listing_parser import PARSER_BACKENDS
+
+FIXTURE = FIXTURE_DIR / "listing_page.html"
+GOLDEN = FIXTURE_DIR / "listing_page.golden.json"
+
+
+def _as_rows(products) -> list:
+    return [
+        {"name": p.name, "price": None if p.price is None else str(p.price), "unit": p.unit, "url": p.url}
+        for p in products
+    ]
+
+
+def check_parity(html: str) -> None:
+    golden = json.loads(GOLDEN.read_text(encoding="utf-8"))
+    for backend, parse in PARSER_BACKENDS.items():
+        rows = _as_rows(parse(html))
+        mismatches = [(i, got, want) for i, (got, want) in enumerate(zip(rows, golden)) if got != want]
+        assert len(rows) == len(golden), f"{backend}: {len(rows)} products, golden has {len(golden)}"
+        assert not mismatches, f"{backend}: first mismatch {mismatches[0]}"
+        print(f"  {backend:<11} parity OK ({len(rows)} products)")
+
+
+def run(pages: int) -> None:
+    html = FIXTURE.read_text(encoding="utf-8")
+    check_parity(html)
+
+    baseline = None
+    for backend, parse in PARSER_BACKENDS.items():
+        start = time.perf_counter()
+        for _ in range(pages):
+            parse(html)
+        rate = pages / (time.perf_counter() - start)
+        baseline = baseline or rate
+        print(f"  {backend:<11} {rate:8.1f} pages/s  x{rate / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+    if args.update_golden:
+        rows = _as_rows(PARSER_BACKENDS["bs4"](FIXTURE.read_text(encoding="utf-8")))
+        GOLDEN.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {len(rows)} rows to {GOLDEN}")
+    else:
+        run(args.pages)
@@ -0,0 +1,118 @@
+# benchmarks/price_storage.py
+"""
+每天每個 product 一筆（PRICE_STORAGE_MODE=daily）vs 只記價格變動（changes）：
+模擬 days 天、每天每個 product 都抓一次價格（每天有 change_rate 比例的 product 價格變動），
+都經過 ProductRepository.insert_price_histories 寫入，比較
+- 資料表筆數與寫入時間
+- 「今天還沒價格的 product」查詢（get_product_random）
+- 重建任一天的價格（get_prices_on / get_price_series），並與模擬的真實價格比對
+最後在 daily DB 上執行 backfill_price_spans，確認轉換後的 span 與 changes 模式寫出來的一致。
+
+    python -m benchmarks.price_storage --products 2000 --days 180 --change-rate 0.02
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper.config import Config
+from scraper.db.model import ProductPriceHistory, ProductPriceSpan
+from scraper.db.price_spans import reset_price_indexes
+
+
+def simulate(products: int, days: int, change_rate: float, seed: int = 42):
+    """{日期: {product_id: 價格}}：每天 change_rate 比例的 product 換價格"""
+    rng = random.Random(seed)
+    today = date.today()
+    prices = {pid: Decimal(rng.randint(100, 5000)) / 100 for pid in range(1, products + 1)}
+    history = {}
+    for offset in range(days - 1, -1, -1):
+        for pid in rng.sample(range(1, products + 1), int(products * change_rate)):
+            prices[pid] = Decimal(rng.randint(100, 5000)) / 100
+        # 今天只抓了一半，讓「今天還沒價格」的查詢有結果
+        day_prices = dict(prices) if offset else {pid: p for pid, p in prices.items() if pid % 2}
+        history[today - timedelta(days=offset)] = day_prices
+    return history
+
+
+def _count(engine, model) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def expected_price(history: dict, day: date, product_id: int):
+    """模擬中 day 當天的價格；當天沒抓到（今天那一半）沿用前一天的"""
+    while day in history:
+        if product_id in history[day]:
+            return history[day][product_id]
+        day -= timedelta(days=1)
+    return None
+
+
+def check(repo, history: dict, sample_days, product_id: int) -> int:
+    """抽樣日期的 get_prices_on 與一段 get_price_series 和模擬結果比對，回傳不一致的數量"""
+    errors = 0
+    for day in sample_days:
+        actual = repo.get_prices_on(day)
+        errors += sum(1 for pid in history[min(history)] if actual.get(pid) != expected_price(history, day, pid))
+    days = sorted(history)
+    series = repo.get_price_series(product_id, days[0], days[-1])
+    expected_series = [(day, expected_price(history, day, product_id)) for day in days]
+    errors += sum(1 for got, want in zip(series, expected_series) if got != want)
+    errors += abs(len(series) - len(expected_series))
+    return errors
+
+
+def run(products: int, days: int, change_rate: float, limit: int, repeat: int) -> None:
+    history = simulate(products, days, change_rate)
+    sample_days = random.Random(1).sample(sorted(history), min(10, days))
+    print(f"{products} products x {days} days, {change_rate:.0%} change per day")
+    dbs = {}
+    for mode in ("daily", "changes"):
+        Config.PRICE_STORAGE_MODE = mode
+        reset_price_indexes()
+        repo, engine = make_repo(temp_sqlite_url(f"price_storage_{mode}"))
+        seed_products(engine, products)
+        start = time.perf_counter()
+        for day, prices in sorted(history.items()):
+            repo.insert_price_histories(
+                {"product_id": pid, "price": price, "created_at": day} for pid, price in prices.items())
+        write = time.perf_counter() - start
+        rows = _count(engine, ProductPriceHistory if mode == "daily" else ProductPriceSpan)
+        lookup = _time(lambda: repo.get_product_random(limit), repeat)
+        day_lookup = _time(lambda: repo.get_prices_on(sample_days[0]), repeat)
+        errors = check(repo, history, sample_days, product_id=7)
+        print(f"  {mode:<8} rows={rows:>9,}  write {write:6.1f}s  today lookup {lookup:7.2f} ms  "
+              f"price on a day {day_lookup:7.2f} ms  reconstruction errors={errors}")
+        dbs[mode] = (repo, engine)
+
+    Config.PRICE_STORAGE_MODE = "changes"
+    repo, engine = dbs["daily"]
+    start = time.perf_counter()
+    stats = repo.backfill_price_spans()
+    errors = check(repo, history, sample_days, product_id=7)
+    spans_written = _count(dbs["changes"][1], ProductPriceSpan)
+    print(f"  backfill {stats['history_rows']:,} daily rows → {stats['spans']:,} spans in "
+          f"{time.perf_counter() - start:.1f}s (changes mode wrote {spans_written:,}); reconstruction errors={errors}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--change-rate", type=float, default=0.02, help="每天價格變動的 product 比例")
+    parser.add_argument("--limit", type=int, default=20, help="get_product_random 每次取幾個")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.products, args.days, args.change_rate, args.limit, args.repeat)
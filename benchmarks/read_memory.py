@@ -0,0 +1,101 @@
+# benchmarks/read_memory.py
+"""
+整個 catalogue 的讀取：回傳 ORM Product list 的方法（.all()）vs iter_* 串流 ProductRow（yield_per），
+比較 RSS 峰值與 rows/s。每個方法在各自的子 process 執行（RSS 峰值不受前一個方法影響），
+峰值以「呼叫前」的 RSS 為基準（扣掉 import 與連線）。消費端對每一筆讀幾個欄位，不另外保留。
+
+    python -m benchmarks.read_memory --products 100000
+    python -m benchmarks.read_memory --products 200000 --chunk-size 2000
+    python -m benchmarks.read_memory --db-url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import update
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper.db.model import Product
+
+# (說明, 舊方法, 串流方法)
+PAIRS = [
+    ("all products", "fetch_all_products", "iter_products"),
+    ("missing sku / location", "get_products_missing_sku_or_location", "iter_products_missing_sku_or_location"),
+    ("no price today", "get_product_without_today_price_record", "iter_products_without_price_on"),
+]
+
+
+def _maxrss_mb() -> float:
+    """目前 process 的 RSS 峰值。Linux 讀 VmHWM：ru_maxrss 在 exec 之後會沿用父 process（seed 時）的峰值"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def seed(db_url: str, products: int) -> None:
+    """products 筆 product：一半已有 sku / location，三分之一今天已有價格"""
+    repo, engine = make_repo(db_url)
+    seed_products(engine, products)
+    with engine.begin() as conn:
+        conn.execute(update(Product).where(Product.id % 2 == 0).values(sku="12345678", location="Aisle 1"))
+    repo.insert_price_histories(
+        {"product_id": pid, "price": 1, "created_at": date.today()} for pid in range(3, products + 1, 3))
+
+
+def child(db_url: str, method: str, chunk_size: int) -> dict:
+    """子 process：呼叫 method，逐筆讀欄位，回傳 RSS 增量與時間"""
+    repo, _ = make_repo(db_url, reset=False)
+    repo.get_product_random(1)  # 先建好連線、載入 mapper，不算進增量
+    before = _maxrss_mb()
+    start = time.perf_counter()
+    kwargs = {"chunk_size": chunk_size} if method.startswith("iter_") else {}
+    rows = chars = 0
+    for prod in getattr(repo, method)(**kwargs):
+        rows += 1
+        chars += len(prod.name) + len(prod.url) + (prod.sku is None)
+    elapsed = time.perf_counter() - start
+    return {"method": method, "rows": rows, "seconds": elapsed, "peak_mb": _maxrss_mb() - before}
+
+
+def run_child(db_url: str, method: str, chunk_size: int) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.read_memory", "--child", method, "--db-url", db_url,
+         "--chunk-size", str(chunk_size)],
+        capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(args) -> None:
+    db_url = args.db_url or temp_sqlite_url("read_memory")
+    seed(db_url, args.products)
+    print(f"{args.products:,} products, chunk size {args.chunk_size}")
+    print(f"{'query':<24}{'method':<42}{'rows':>9}{'rows/s':>11}{'peak +MB':>10}")
+    for label, *methods in PAIRS:
+        results = [run_child(db_url, method, args.chunk_size) for method in methods]
+        for r in results:
+            print(f"{label:<24}{r['method']:<42}{r['rows']:>9,}{r['rows'] / r['seconds']:>11,.0f}{r['peak_mb']:>10.1f}")
+        if results[0]["rows"] != results[1]["rows"]:
+            print(f"  ❌ row counts differ: {results[0]['rows']} vs {results[1]['rows']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="iter_* 每次從 DB 串流幾筆")
+    parser.add_argument("--db-url", default=None, help="預設為暫存 SQLite（會 drop 所有資料表，請勿指向正式 DB）")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(args.db_url, args.child, args.chunk_size)))
+    else:
+        run(args)
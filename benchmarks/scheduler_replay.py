@@ -0,0 +1,102 @@
+# benchmarks/scheduler_replay.py
+"""
+明細抓取的優先順序（scraper.scheduler）：合成 days 天的每日價格歷史（各類別變動頻率不同，
+少數 product 每幾天就換價格、大多數幾個月才變一次），寫進暫存 SQLite 後
+1. 用 scheduler.replay 回放：每天只能抓 budget 個 product 時，random（原本的 get_product_random）、
+   oldest（round robin）、priority 三種策略的 freshness 與每 1,000 次 page load 抓到的價格變動
+2. 實際 seed_fetch_queue + claim_products（FETCH_DAILY_BUDGET=budget）：確認依 priority 領取、用完 budget 就停
+
+    python -m benchmarks.scheduler_replay --products 2000 --days 90 --warmup 30
+    python -m benchmarks.scheduler_replay --budget 100 --budget 200 --budget 400
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper import scheduler
+from scraper.config import Config
+from scraper.db.model import Product
+from sqlalchemy import update
+
+# 類別：每天價格變動的機率（hot 的 product 另外乘上 HOT_FACTOR）
+CATEGORY_RATES = {"produce": 1 / 10, "meat": 1 / 20, "dairy": 1 / 45, "pantry": 1 / 120}
+HOT_SHARE = 0.1
+HOT_FACTOR = 4
+
+
+def simulate(products: int, days: int, seed: int = 42):
+    """({product_id: 類別}, {日期: {product_id: 價格}})，最後一天是昨天"""
+    rng = random.Random(seed)
+    names = list(CATEGORY_RATES)
+    categories = {pid: names[pid % len(names)] for pid in range(1, products + 1)}
+    rates = {pid: min(1.0, CATEGORY_RATES[cat] * (HOT_FACTOR if rng.random() < HOT_SHARE else 1))
+             for pid, cat in categories.items()}
+    prices = {pid: Decimal(rng.randint(100, 5000)) / 100 for pid in categories}
+    history = {}
+    end = date.today() - timedelta(days=1)
+    for offset in range(days - 1, -1, -1):
+        for pid, rate in rates.items():
+            if rng.random() < rate:
+                prices[pid] = Decimal(rng.randint(100, 5000)) / 100
+        history[end - timedelta(days=offset)] = dict(prices)
+    return categories, history
+
+
+def check_queue(repo, history: dict, budget: int) -> None:
+    """今天的 queue：依 priority 領到 budget 個就停；比較領到的 product 與全部 product 最近 7 天的變動比例"""
+    Config.FETCH_DAILY_BUDGET = budget
+    start = time.perf_counter()
+    repo.seed_fetch_queue()
+    seed_seconds = time.perf_counter() - start
+    claimed = []
+    while True:
+        batch = repo.claim_products("bench", limit=50)
+        if not batch:
+            break
+        claimed.extend(p.id for p in batch)
+    days = sorted(history)
+    week_ago, last = history[days[-8]], history[days[-1]]
+    changed = {pid for pid in last if last[pid] != week_ago[pid]}
+    share = sum(1 for pid in claimed if pid in changed) / len(claimed) if claimed else 0
+    print(f"  queue: seed + prioritize {seed_seconds:.2f}s, claimed {len(claimed)} (budget {budget}, "
+          f"left {repo.get_fetch_budget_left()}); {share:.0%} of claims changed price in the last 7 days "
+          f"vs {len(changed) / len(last):.0%} of the catalogue")
+    Config.FETCH_DAILY_BUDGET = 0
+
+
+def run(products: int, days: int, warmup: int, budgets) -> None:
+    categories, history = simulate(products, days)
+    repo, engine = make_repo(temp_sqlite_url("scheduler_replay"))
+    seed_products(engine, products)
+    with engine.begin() as conn:
+        for pid, category in categories.items():
+            conn.execute(update(Product).where(Product.id == pid).values(category=category))
+    start = time.perf_counter()
+    for day, prices in sorted(history.items()):
+        repo.insert_price_histories(
+            {"product_id": pid, "price": price, "created_at": day} for pid, price in prices.items())
+    print(f"{products} products x {days} days written in {time.perf_counter() - start:.1f}s; "
+          f"replaying the last {days - warmup} days")
+
+    truth = scheduler.load_truth(repo, days)
+    budgets = budgets or [products // 20, products // 10, products // 5]
+    start = time.perf_counter()
+    results = scheduler.replay_table(truth, categories, budgets, warmup_days=warmup)
+    scheduler.print_replay(results)
+    print(f"  replay: {time.perf_counter() - start:.1f}s")
+    check_queue(repo, history, budgets[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--warmup", type=int, default=30, help="前幾天當作每天全抓")
+    parser.add_argument("--budget", type=int, action="append", help="每天的 page load 數，可指定多次")
+    args = parser.parse_args()
+    if args.days <= args.warmup:
+        parser.error(f"--days ({args.days}) must be greater than --warmup ({args.warmup})")
+    run(args.products, args.days, args.warmup, args.budget)
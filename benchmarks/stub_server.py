@@ -0,0 +1,125 @@
+# benchmarks/stub_server.py
+"""
+本地 stub HTTP server：把 fixtures/ 底下錄好的頁面依路徑回傳，可注入延遲。
+
+    with StubServer({"/shop/product/": "product_detail.html"}) as server:
+        url = server.url("/shop/product/1")
+"""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Union
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+LatencySpec = Union[float, Callable[[int], float]]
+
+
+def load_fixture(name: str) -> bytes:
+    return (FIXTURE_DIR / name).read_bytes()
+
+
+class StubServer:
+    """
+    routes: path prefix → fixture 檔名（最長 prefix 優先），找不到回 404。
+    latency: 每個 request 回應前 sleep 的秒數；也可以是 callable(in_flight) → 秒數，模擬負載越高越慢。
+    etag: 回傳內容 hash 當 ETag，request 帶相同的 If-None-Match 時回 304。
+    capacity: 同時處理中的 request 超過這個數量時直接回 503（0 = 不限制），可在執行中修改。
+    error_rate: 隨機這個比例的 request（延遲之後）回 error_status，模擬偶發的伺服器錯誤。
+    """
+
+    def __init__(self, routes: Dict[str, str], latency: LatencySpec = 0.0, host: str = "127.0.0.1",
+                 port: int = 0, etag: bool = False, capacity: int = 0, error_rate: float = 0.0,
+                 error_status: int = 503):
+        self.routes = {prefix: load_fixture(name) for prefix, name in routes.items()}
+        self.latency = latency
+        self.etag = etag
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.rejected_count = 0
+        self.error_count = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_count += 1
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                    in_flight = stub.in_flight
+                try:
+                    if stub.capacity and in_flight > stub.capacity:
+                        with stub._lock:
+                            stub.rejected_count += 1
+                        self.send_error(503)
+                        return
+                    delay = stub.latency(in_flight) if callable(stub.latency) else stub.latency
+                    if delay:
+                        time.sleep(delay)
+                    if stub.error_rate and random.random() < stub.error_rate:
+                        with stub._lock:
+                            stub.error_count += 1
+                        self.send_error(stub.error_status)
+                        return
+                    self._respond()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client 已經 timeout 斷線
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _respond(self):
+                body = stub.match(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{hashlib.md5(body).hexdigest()}"' if stub.etag else None
+                if etag and self.headers.get("If-None-Match") == etag:
+                    stub.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def match(self, path: str):
+        for prefix in sorted(self.routes, key=len, reverse=True):
+            if path.startswith(prefix):
+                return self.routes[prefix]
+        return None
+
+    def url(self, path: str = "/") -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,80 @@
+# benchmarks/today_lookup.py
+"""
+在一年份的合成 price history 上，比較「今天還沒價格的 product」查詢：
+- 舊：NOT EXISTS + func.date(created_at) == today + ORDER BY random()
+- 新：ProductRepository.get_product_random（sargable 日期比較 + keyset，從隨機 id 起點取）
+
+    python -m benchmarks.today_lookup --products 2000 --days 365
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import make_repo, seed_products, temp_sqlite_url
+from scraper.db.model import Product, ProductPriceHistory
+
+
+def seed_history(engine, products: int, days: int, priced_today_ratio: float) -> int:
+    """每個 product 過去 days 天每天一筆；今天只有 priced_today_ratio 比例的 product 有紀錄"""
+    today = date.today()
+    Session = sessionmaker(bind=engine)
+    total = 0
+    with Session() as session:
+        for offset in range(days, 0, -1):
+            day = today - timedelta(days=offset)
+            rows = [{"product_id": pid, "price": 1 + pid % 50, "created_at": day} for pid in range(1, products + 1)]
+            session.execute(insert(ProductPriceHistory), rows)
+            total += len(rows)
+        priced_today = int(products * priced_today_ratio)
+        rows = [{"product_id": pid, "price": 1, "created_at": today} for pid in range(1, priced_today + 1)]
+        if rows:
+            session.execute(insert(ProductPriceHistory), rows)
+        session.commit()
+    return total + len(rows)
+
+
+def legacy_random_query(repo, limit: int):
+    """改版前 get_product_random 的查詢"""
+    today = date.today()
+    with repo.get_session() as db:
+        subq = db.query(ProductPriceHistory).filter(
+            ProductPriceHistory.product_id == Product.id,
+            func.date(ProductPriceHistory.created_at) == today
+        )
+        return db.query(Product).filter(~subq.exists()).order_by(func.random()).limit(limit).all()
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(db_url: str, products: int, days: int, limit: int, repeat: int, priced_today_ratio: float) -> None:
+    repo, engine = make_repo(db_url)
+    seed_products(engine, products)
+    start = time.perf_counter()
+    rows = seed_history(engine, products, days, priced_today_ratio)
+    print(f"Seeded {products} products, {rows:,} history rows in {time.perf_counter() - start:.1f}s")
+
+    legacy = _time(lambda: legacy_random_query(repo, limit), repeat)
+    keyset = _time(lambda: repo.get_product_random(limit), repeat)
+    print(f"  legacy  NOT EXISTS date() + ORDER BY random(): {legacy:8.2f} ms/query")
+    print(f"  keyset  sargable date + id range             : {keyset:8.2f} ms/query  x{legacy / keyset:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=None, help="預設為暫存 SQLite（資料表會被重建）")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--limit", type=int, default=20, help="每次取幾個 product")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--priced-today", type=float, default=0.5, help="今天已經有價格的 product 比例")
+    args = parser.parse_args()
+    run(args.db_url or temp_sqlite_url("today_lookup"), args.products, args.days, args.limit,
+        args.repeat, args.priced_today)
@@ -0,0 +1,29 @@
+-- 001: product_price_history 加上 FK、每日唯一、以及日期索引
+-- 新建的 DB（python -m scraper.db.product_repo）已經包含這些，只有舊 DB 需要執行一次。
+
+BEGIN;
+
+-- 同一個 product 同一天重複的紀錄只留最早那筆
+DELETE FROM product_price_history h
+USING product_price_history dup
+WHERE h.product_id = dup.product_id
+  AND h.created_at = dup.created_at
+  AND h.id > dup.id;
+
+-- 已經不存在的 product 的孤兒紀錄
+DELETE FROM product_price_history h
+WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.id = h.product_id);
+
+ALTER TABLE product_price_history
+    ADD CONSTRAINT product_price_history_product_id_fkey
+    FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE;
+
+ALTER TABLE product_price_history
+    ADD CONSTRAINT uq_price_history_product_day UNIQUE (product_id, created_at);
+
+CREATE INDEX IF NOT EXISTS ix_price_history_created_at_product
+    ON product_price_history (created_at, product_id);
+
+COMMIT;
+
+ANALYZE product_price_history;
@@ -0,0 +1,14 @@
+-- 002: product_fetch_queue 加上重試時間與最後一次錯誤（exponential backoff + dead 狀態）
+-- 新建的 DB（python -m scraper.db.product_repo）已經包含這些，只有舊 DB 需要執行一次。
+
+BEGIN;
+
+ALTER TABLE product_fetch_queue ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP;
+ALTER TABLE product_fetch_queue ADD COLUMN IF NOT EXISTS last_error VARCHAR(255);
+
+-- 舊版的 failed 沒有重試時間：設成現在，讓它們馬上可以被領取
+UPDATE product_fetch_queue
+SET next_attempt_at = (now() AT TIME ZONE 'utc')
+WHERE status = 'failed' AND next_attempt_at IS NULL;
+
+COMMIT;
@@ -0,0 +1,11 @@
+-- 003: product_fetch_queue 加上領取順序（scraper.scheduler 的分數）
+-- 新建的 DB（python -m scraper.db.product_repo）已經包含這些，只有舊 DB 需要執行一次。
+
+BEGIN;
+
+ALTER TABLE product_fetch_queue ADD COLUMN IF NOT EXISTS priority DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS ix_fetch_queue_day_priority
+    ON product_fetch_queue (work_date, priority);
+
+COMMIT;
@@ -0,0 +1,19 @@
+-- 004: FETCH_DAILY_BUDGET 改用每天一筆的計數（claim_products 在同一個 transaction 裡鎖住並更新）
+-- 新建的 DB（python -m scraper.db.product_repo）已經包含這些，只有舊 DB 需要執行一次。
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS fetch_budget (
+    work_date DATE PRIMARY KEY,
+    used INTEGER NOT NULL DEFAULT 0
+);
+
+COMMENT ON COLUMN fetch_budget.work_date IS '工作日期';
+COMMENT ON COLUMN fetch_budget.used IS '已領取的 page load 數';
+
+-- 今天已經領過的數量（之前是 product_fetch_queue.attempts 的合計）
+INSERT INTO fetch_budget (work_date, used)
+SELECT work_date, SUM(attempts) FROM product_fetch_queue WHERE work_date = CURRENT_DATE GROUP BY work_date
+ON CONFLICT (work_date) DO NOTHING;
+
+COMMIT;
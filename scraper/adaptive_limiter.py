@@ -0,0 +1,130 @@
+# adaptive_limiter.py
+# 明細頁 fetch 的 AIMD 並行上限：一切正常時每個「視窗」（= 目前上限數量的成功 request）加 1，
+# 遇到 timeout / HTTP 429 / 5xx 時上限減半，並維持在 [min_limit, max_limit] 之間
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import time
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from scraper.config import Config
+from scraper.metrics import timed
+
+# 代表對方已經過載、應該放慢的狀態碼
+OVERLOAD_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_overload(exc: BaseException) -> bool:
+    """timeout（含 HttpFetchError.timeout）或帶 429/5xx status_code 的錯誤 → True；解析失敗之類的錯誤不算"""
+    if isinstance(exc, (PlaywrightTimeoutError, asyncio.TimeoutError, TimeoutError)) or getattr(exc, "timeout", None) is True:
+        return True
+    return getattr(exc, "status_code", None) in OVERLOAD_STATUS_CODES
+
+
+class AdaptiveLimiter:
+    """
+    取代固定大小的 asyncio.Semaphore：
+        limiter = AdaptiveLimiter()
+        async with limiter.slot():
+            await fetch(...)
+    slot 結束時依耗時與例外調整上限：
+    - 成功且延遲健康（EWMA 不超過觀察到的最低 EWMA x latency_tolerance）→ 累積滿一個視窗後 +1
+    - is_overload 的例外 → 上限 x backoff_factor；同一批（上次減少前就開始的）request 的錯誤只減一次
+    - 其他例外 → 不加也不減
+    min_limit == max_limit 時等同固定的 semaphore。
+    """
+
+    def __init__(self, min_limit: int = None, max_limit: int = None, initial: int = None,
+                 latency_tolerance: float = None, backoff_factor: float = 0.5, ewma_alpha: float = 0.2):
+        self.min_limit = max(1, min_limit or Config.DETAIL_MIN_CONCURRENCY)
+        self.max_limit = max(self.min_limit, max_limit or Config.DETAIL_MAX_CONCURRENCY)
+        initial = initial or Config.MAX_TAB_FOR_PRODUCT_DETAIL
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.latency_tolerance = latency_tolerance or Config.DETAIL_LATENCY_TOLERANCE
+        self.backoff_factor = backoff_factor
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.ewma_latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+        self.peak_limit = self.limit
+        self.history = [(0.0, self.limit)]  # (距離建立的秒數, 上限)
+        self._started_at = time.perf_counter()
+        self._epoch = 0          # 每次減少 +1，用來忽略同一批 request 的後續錯誤
+        self._window_successes = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        with timed("limiter_wait"):
+            async with self._condition:
+                await self._condition.wait_for(lambda: self.in_flight < self.limit)
+                self.in_flight += 1
+        epoch = self._epoch
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            if isinstance(exc, Exception):
+                self._on_error(exc, epoch)
+            raise
+        else:
+            self._on_success(time.perf_counter() - start)
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def _latency_healthy(self, latency: float) -> bool:
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.ewma_alpha * (latency - self.ewma_latency)
+        if self.baseline_latency is None or self.ewma_latency < self.baseline_latency:
+            self.baseline_latency = self.ewma_latency
+        return self.ewma_latency <= self.baseline_latency * self.latency_tolerance
+
+    def _on_success(self, latency: float) -> None:
+        if not self._latency_healthy(latency):
+            self._window_successes = 0
+            return
+        self._window_successes += 1
+        if self._window_successes >= self.limit and self.limit < self.max_limit:
+            self._set_limit(self.limit + 1)
+            self.increases += 1
+
+    def _on_error(self, exc: Exception, epoch: int) -> None:
+        self._window_successes = 0
+        if not is_overload(exc):
+            return
+        self.overloads += 1
+        if epoch != self._epoch:
+            return
+        new_limit = max(self.min_limit, int(self.limit * self.backoff_factor))
+        self._epoch += 1
+        if new_limit < self.limit:
+            self._set_limit(new_limit)
+            self.decreases += 1
+
+    def _set_limit(self, limit: int) -> None:
+        self.limit = limit
+        self.peak_limit = max(self.peak_limit, limit)
+        self._window_successes = 0
+        self.history.append((time.perf_counter() - self._started_at, limit))
+        # 上限變大時讓排隊中的 slot 重新檢查（這裡是同步 callback，交給 event loop 處理）
+        asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._condition:
+            self._condition.notify_all()
+
+    def summary(self) -> str:
+        latency = f"{self.ewma_latency:.2f}s" if self.ewma_latency is not None else "n/a"
+        return (
+            f"concurrency limit {self.limit} (range {self.min_limit}-{self.max_limit}, peak {self.peak_limit}), "
+            f"{self.increases} increases / {self.decreases} decreases, "
+            f"{self.overloads} overload errors, latency ewma {latency}"
+        )
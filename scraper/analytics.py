@@ -0,0 +1,167 @@
+# analytics.py
+# 從 scraper.export_parquet 匯出的 Parquet 回答價格趨勢 / 價格變動的問題，完全不碰 Postgres。
+# 日期與類別是 hive partition：指定期間 / 類別時只會讀到對應的目錄。
+#
+#     python -m scraper.analytics trend --category dairy --days 30
+#     python -m scraper.analytics trend --product 123 --days 90
+#     python -m scraper.analytics changes --days 7 --min-pct 10
+#     python -m scraper.analytics movers --days 30 --top 20
+from datetime import date, timedelta
+from typing import Iterable, Optional
+import argparse
+import os
+
+import pandas as pd
+
+from scraper.config import Config
+from scraper.export_parquet import DATASET, require_pyarrow
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # optional：只有匯出 / 分析需要
+    pa = None
+
+
+class PriceAnalytics:
+    """
+    用法：
+        analytics = PriceAnalytics()
+        analytics.price_trend(category="dairy", start=date(2025, 1, 1))
+        analytics.price_changes(start=date.today() - timedelta(days=7), min_pct=10)
+    回傳 pandas DataFrame。
+    """
+
+    def __init__(self, root: str = None):
+        require_pyarrow()
+        self.root = root or Config.EXPORT_DIR
+        path = os.path.join(self.root, DATASET)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No export found at {path}; run python -m scraper.export_parquet first")
+        partitioning = ds.partitioning(pa.schema([("date", pa.date32()), ("category", pa.string())]),
+                                       flavor="hive")
+        self.dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+
+    def load(self, start: date = None, end: date = None, categories: Iterable[str] = None,
+             product_ids: Iterable[int] = None, columns: Iterable[str] = None) -> pd.DataFrame:
+        """讀取 [start, end] 期間的價格紀錄；條件會下推到 partition / row group，只讀需要的檔案"""
+        conditions = []
+        if start is not None:
+            conditions.append(ds.field("date") >= pa.scalar(start, pa.date32()))
+        if end is not None:
+            conditions.append(ds.field("date") <= pa.scalar(end, pa.date32()))
+        if categories is not None:
+            conditions.append(ds.field("category").isin(list(categories)))
+        if product_ids is not None:
+            conditions.append(ds.field("product_id").isin(list(product_ids)))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        table = self.dataset.to_table(columns=list(columns) if columns else None, filter=expression)
+        df = table.to_pandas()
+        if "price" in df:
+            df["price"] = df["price"].astype(float)
+        if "date" in df:
+            df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def price_trend(self, product_id: int = None, category: str = None, start: date = None,
+                    end: date = None, freq: str = "D") -> pd.DataFrame:
+        """
+        product_id：該 product 每個期間的價格（freq 內取最後一筆）。
+        category（或都不給）：每個期間、每個類別的平均 / 中位數價格與有價格的 product 數。
+        freq 為 pandas 的 offset alias：D / W / MS ...
+        """
+        if product_id is not None:
+            df = self.load(start, end, product_ids=[product_id], columns=["product_id", "name", "price", "date"])
+            return (
+                df.sort_values("date").set_index("date")["price"]
+                .resample(freq).last().dropna().rename("price").reset_index()
+            )
+
+        df = self.load(start, end, categories=[category] if category else None,
+                       columns=["product_id", "price", "date", "category"])
+        if df.empty:
+            return pd.DataFrame(columns=["date", "category", "avg_price", "median_price", "products"])
+        return (
+            df.groupby([pd.Grouper(key="date", freq=freq), "category"])
+            .agg(avg_price=("price", "mean"), median_price=("price", "median"), products=("product_id", "nunique"))
+            .round({"avg_price": 2, "median_price": 2})
+            .reset_index()
+        )
+
+    def price_changes(self, start: date = None, end: date = None, category: str = None,
+                      min_pct: float = 0.0) -> pd.DataFrame:
+        """
+        期間內每個 product 相鄰兩筆紀錄之間的價格變動（漲跌幅絕對值 >= min_pct %）。
+        期間開始前最後一筆價格也會讀進來當比較基準，第一天的變動不會漏掉。
+        """
+        columns = ["product_id", "name", "category", "price", "date"]
+        categories = [category] if category else None
+        df = self.load(start, end, categories=categories, columns=columns)
+        if start is not None and not df.empty:
+            before = self.load(end=start - timedelta(days=1), categories=categories,
+                               product_ids=df["product_id"].unique().tolist(), columns=columns)
+            before = before.sort_values("date").groupby("product_id").tail(1)
+            df = pd.concat([before, df], ignore_index=True)
+        if df.empty:
+            return pd.DataFrame(columns=["date", "product_id", "name", "category", "old_price", "new_price",
+                                         "change", "change_pct"])
+
+        df = df.sort_values(["product_id", "date"])
+        df["old_price"] = df.groupby("product_id")["price"].shift()
+        changes = df[df["old_price"].notna() & (df["old_price"] != df["price"])].copy()
+        changes = changes.rename(columns={"price": "new_price"})
+        changes["change"] = (changes["new_price"] - changes["old_price"]).round(2)
+        changes["change_pct"] = (changes["change"] / changes["old_price"] * 100).round(1)
+        changes = changes[changes["change_pct"].abs() >= min_pct]
+        return changes[["date", "product_id", "name", "category", "old_price", "new_price",
+                        "change", "change_pct"]].sort_values(["date", "product_id"]).reset_index(drop=True)
+
+    def biggest_movers(self, start: date = None, end: date = None, category: str = None,
+                       top: int = 20) -> pd.DataFrame:
+        """期間內第一筆與最後一筆價格相比，漲跌幅最大的 product"""
+        df = self.load(start, end, categories=[category] if category else None,
+                       columns=["product_id", "name", "category", "price", "date"])
+        if df.empty:
+            return pd.DataFrame(columns=["product_id", "name", "category", "first_price", "last_price", "change_pct"])
+        df = df.sort_values("date")
+        movers = df.groupby("product_id").agg(
+            name=("name", "last"), category=("category", "last"),
+            first_price=("price", "first"), last_price=("price", "last"),
+        )
+        movers["change_pct"] = ((movers["last_price"] - movers["first_price"]) / movers["first_price"] * 100).round(1)
+        movers = movers[movers["change_pct"] != 0]
+        return movers.reindex(movers["change_pct"].abs().sort_values(ascending=False).index).head(top).reset_index()
+
+
+def _period(days: Optional[int]):
+    return (date.today() - timedelta(days=days), None) if days else (None, None)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Price analytics over the Parquet export (no DB access)")
+    parser.add_argument("question", choices=["trend", "changes", "movers"])
+    parser.add_argument("--dir", default=None, help=f"匯出資料夾（預設 {Config.EXPORT_DIR}）")
+    parser.add_argument("--days", type=int, default=30, help="最近幾天（0 = 全部）")
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--product", type=int, default=None, help="trend：單一 product 的價格")
+    parser.add_argument("--freq", default="D", help="trend：D / W / MS")
+    parser.add_argument("--min-pct", type=float, default=0.0, help="changes：最小漲跌幅（%%）")
+    parser.add_argument("--top", type=int, default=20, help="movers：列出幾個")
+    args = parser.parse_args(argv)
+
+    analytics = PriceAnalytics(args.dir)
+    start, end = _period(args.days)
+    if args.question == "trend":
+        result = analytics.price_trend(args.product, args.category, start, end, args.freq)
+    elif args.question == "changes":
+        result = analytics.price_changes(start, end, args.category, args.min_pct)
+    else:
+        result = analytics.biggest_movers(start, end, args.category, args.top)
+    with pd.option_context("display.max_rows", 200, "display.width", 160):
+        print(result.to_string(index=False) if not result.empty else "No data for this period.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# category_crawler.py
+# async 版的類別列表 crawl：一個 headless browser，每個類別一個 context，多個類別同時進行
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from playwright.async_api import async_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeout
+
+from scraper.config import Config
+from scraper.db.model import Product
+from scraper.logger_setup import get_logger
+from scraper.main import extract_product_info, log_upsert_totals, repo
+from scraper.context_pool import context_options
+from scraper.crawl_checkpoint import CategoryCheckpoint, default_run_id, resume_plan, write_listing_page
+from scraper.html_archive import KIND_LISTING, archive_page
+from scraper.metrics import count, timed
+from scraper.page_profile import ResourceBlocker
+from scraper.pagination import max_page_number, page_url
+from scraper.rate_limiter import HostRateLimiter
+from scraper.selector import Selector
+
+logger = get_logger(__name__, log_file="logs/dropit.log", level=logging.DEBUG)
+
+# 每頁收集完呼叫一次，參數為頁數與該頁新出現的 products（逐頁寫入 DB + checkpoint）
+PageCallback = Callable[[int, List[Product]], Awaitable[None]]
+
+
+@dataclass
+class CategoryCrawlResult:
+    category: str
+    products: List[Product] = field(default_factory=list)
+    pages: int = 0
+    seconds: float = 0.0
+    error: str = None
+    blocker: ResourceBlocker = None
+    skipped: bool = False
+
+
+async def _collect(result: CategoryCrawlResult, seen_urls: set, products: List[Product],
+                   page_number: int, on_page: PageCallback = None) -> int:
+    """依 url 去重後加入結果，有 on_page 時把該頁新增的 products 交給它；回傳新增數量"""
+    added = []
+    for p in products:
+        if p.url not in seen_urls:
+            seen_urls.add(p.url)
+            added.append(p)
+    result.products.extend(added)
+    if on_page:
+        await on_page(page_number, added)
+    return len(added)
+
+
+def _page_loaded(result: CategoryCrawlResult) -> None:
+    if result.blocker:
+        result.blocker.page_loaded()
+
+
+async def _save_screenshot(page, category_name: str, page_number: int) -> None:
+    """LISTING_SCREENSHOTS 開啟時存最後一頁的 full-page screenshot"""
+    if not Config.LISTING_SCREENSHOTS:
+        return
+    screenshot_path = f"screenshots/{category_name}_page_{page_number}.png"
+    with timed("screenshot"):
+        await page.screenshot(path=screenshot_path, full_page=True)
+    logger.info(f"Saved screenshot to {screenshot_path}")
+
+
+async def _extract_products(page, category_name: str, page_number: int) -> List[Product]:
+    with timed("page_content"):
+        html = await page.content()
+    archive_page(KIND_LISTING, page.url, html, category=category_name, page=page_number)
+    with timed("extract_product_info"):
+        return extract_product_info(html)
+
+
+async def _close_quietly(tab) -> None:
+    """分頁可能已經隨 context / browser 關閉，這時 close 的錯誤不影響結果"""
+    try:
+        await tab.close()
+    except PlaywrightError:
+        pass
+
+
+async def detect_page_count(page) -> Optional[int]:
+    """從分頁列讀出總頁數；沒有分頁列時回傳 None"""
+    texts = await page.eval_on_selector_all(Selector.PAGER_ITEM, "els => els.map(e => e.innerText)")
+    return max_page_number(texts)
+
+
+async def paginate_by_click(page, category_name: str, limiter: HostRateLimiter,
+                            result: CategoryCrawlResult, seen_urls: set, current_page: int = 1,
+                            on_page: PageCallback = None) -> int:
+    """點「下一頁」直到按鈕 disabled，回傳最後一頁的頁數"""
+    while True:
+        try:
+            next_btn = await page.query_selector(Selector.NEXT_PAGE_BTN)
+            if not next_btn or 'fp-disabled' in (await next_btn.get_attribute('class') or ''):
+                logger.debug(f"[{category_name}] Next button is disabled; end of pagination.")
+                break
+
+            with timed("rate_limit_wait"):
+                await limiter.wait(page.url)
+            with timed("next_page_navigation"):
+                async with page.expect_navigation(wait_until=Config.PAGE_WAIT_UNTIL, timeout=10000):
+                    await next_btn.click()
+
+            with timed("wait_for_selector"):
+                await page.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
+            current_page += 1
+
+        except PlaywrightTimeout:
+            logger.debug(f"[{category_name}] No next button or timeout waiting; end of pagination.")
+            break
+
+        products = await _extract_products(page, category_name, current_page)
+        _page_loaded(result)
+        await _collect(result, seen_urls, products, current_page, on_page)
+        logger.debug(f"[{category_name}] Scraped {len(products)} products from page {current_page}.")
+
+    await _save_screenshot(page, category_name, current_page)
+    return current_page
+
+
+async def paginate_by_url(context, base_url: str, category_name: str, limiter: HostRateLimiter,
+                          result: CategoryCrawlResult, seen_urls: set, total_pages: int,
+                          page_concurrency: int, on_page: PageCallback = None, first_page: int = 1) -> int:
+    """
+    first_page + 1..total_pages 頁直接用網址開，最多 page_concurrency 個分頁同時載入。
+    有 on_page 時每頁一載完就交出去；否則依頁數順序合併，結果順序與 click 模式相同。
+    timeout 與其他 Playwright 錯誤（net::ERR_*、分頁被關閉…）都只影響該頁：重試一次，
+    仍失敗的頁不會交給 on_page（checkpoint 停在它前一頁），其他頁照常完成。
+    """
+    semaphore = asyncio.Semaphore(page_concurrency)
+
+    async def fetch_page(page_number: int) -> Tuple[int, Optional[List[Product]]]:
+        url = page_url(base_url, page_number)
+        async with semaphore:
+            for attempt in (1, 2):
+                tab = None
+                try:
+                    with timed("new_page"):
+                        tab = await context.new_page()
+                    with timed("rate_limit_wait"):
+                        await limiter.wait(url)
+                    with timed("page_goto"):
+                        await tab.goto(url, wait_until=Config.PAGE_WAIT_UNTIL)
+                    with timed("wait_for_selector"):
+                        await tab.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
+                    products = await _extract_products(tab, category_name, page_number)
+                    _page_loaded(result)
+                    if page_number == total_pages:
+                        await _save_screenshot(tab, category_name, page_number)
+                    logger.debug(f"[{category_name}] Scraped {len(products)} products from page {page_number}.")
+                    return page_number, products
+                except PlaywrightTimeout:
+                    count("listing_page_timeouts")
+                    logger.warning(f"⏱️ [{category_name}] Timeout loading page {page_number} (attempt {attempt})")
+                except PlaywrightError as e:
+                    count("listing_page_errors")
+                    logger.warning(f"⚠️ [{category_name}] Error loading page {page_number} (attempt {attempt}): {e}")
+                finally:
+                    if tab is not None:
+                        await _close_quietly(tab)
+        return page_number, None
+
+    page_numbers = range(first_page + 1, total_pages + 1)
+    if on_page:
+        for next_page in asyncio.as_completed([fetch_page(n) for n in page_numbers]):
+            page_number, products = await next_page
+            if products is not None:
+                await _collect(result, seen_urls, products, page_number, on_page)
+        return total_pages
+
+    pages = await asyncio.gather(*(fetch_page(n) for n in page_numbers))
+    for page_number, products in pages:
+        await _collect(result, seen_urls, products or [], page_number)
+    return total_pages
+
+
+async def scrape_all_pages_with_pagination(context, page, base_url: str, category_name: str,
+                                           limiter: HostRateLimiter, mode: str = None,
+                                           page_concurrency: int = None,
+                                           blocker: ResourceBlocker = None,
+                                           on_page: PageCallback = None,
+                                           start_page: int = 1) -> CategoryCrawlResult:
+    """
+    async 版 main.scrape_all_pages_with_pagination。
+    mode='url'：先讀總頁數，其餘頁面直接用網址平行抓；讀不到頁數時退回 'click'（逐頁點下一頁）。
+    start_page > 1 時直接用網址從該頁開始（resume）。
+    """
+    mode = mode or Config.PAGINATION_MODE
+    page_concurrency = page_concurrency or Config.PAGE_CONCURRENCY
+    result = CategoryCrawlResult(category=category_name, blocker=blocker)
+    seen_urls = set()
+
+    first_url = page_url(base_url, start_page) if start_page > 1 else base_url
+    with timed("rate_limit_wait"):
+        await limiter.wait(first_url)
+    with timed("page_goto"):
+        await page.goto(first_url, wait_until=Config.PAGE_WAIT_UNTIL)
+    with timed("wait_for_selector"):
+        await page.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
+    products = await _extract_products(page, category_name, start_page)
+    _page_loaded(result)
+    await _collect(result, seen_urls, products, start_page, on_page)
+    logger.debug(f"[{category_name}] Scraped {len(products)} products from page {start_page}.")
+
+    total_pages = await detect_page_count(page) if mode == 'url' else None
+    if total_pages:
+        logger.debug(f"[{category_name}] {total_pages} pages; fetching by URL.")
+        if total_pages <= start_page:
+            await _save_screenshot(page, category_name, start_page)
+        last_page = await paginate_by_url(context, base_url, category_name, limiter, result, seen_urls,
+                                          total_pages, page_concurrency, on_page, first_page=start_page)
+    else:
+        if mode == 'url':
+            logger.info(f"[{category_name}] Page count not found; falling back to click pagination.")
+        last_page = await paginate_by_click(page, category_name, limiter, result, seen_urls,
+                                            current_page=start_page, on_page=on_page)
+
+    logger.info(f"Last page number for category '{category_name}': {last_page}")
+    result.pages = last_page
+    return result
+
+
+async def crawl_category(browser, category_name: str, url: str, limiter: HostRateLimiter,
+                         incremental: bool = False, run_id: str = None, start_page: int = 1) -> CategoryCrawlResult:
+    """
+    單一類別：獨立的 context（cookie / cache 不互相干擾），每頁抓完就寫入 DB 並更新 checkpoint。
+    incremental=True：每頁 upsert 並記錄列表價格變動；否則只 insert 新的 products。
+    """
+    started = time.perf_counter()
+    upsert_totals = Counter()
+    checkpoint = await asyncio.to_thread(CategoryCheckpoint, repo, run_id or default_run_id(),
+                                         category_name, start_page)
+
+    async def flush_page(page_number: int, page_products: List[Product]) -> None:
+        with timed("listing_page_write"):
+            stats = await asyncio.to_thread(write_listing_page, repo, page_products, category_name, incremental)
+        if stats:
+            upsert_totals.update(stats)
+        with timed("checkpoint_write"):
+            await asyncio.to_thread(checkpoint.page_done, page_number, len(page_products))
+        count("listing_pages")
+        count("listing_products", len(page_products))
+
+    context = await browser.new_context(**context_options())
+    blocker = ResourceBlocker() if Config.BLOCK_RESOURCES else None
+    if blocker:
+        await blocker.attach(context)
+    page = await context.new_page()
+    try:
+        result = await scrape_all_pages_with_pagination(context, page, url, category_name, limiter,
+                                                        blocker=blocker, on_page=flush_page,
+                                                        start_page=start_page)
+        if not await asyncio.to_thread(checkpoint.finish, result.pages):
+            # 有頁面重試後仍失敗：checkpoint 停在缺的頁之前，回報為失敗讓這次執行以非 0 結束、之後 --resume
+            result.error = f"incomplete: pages 1-{checkpoint.last_page}/{result.pages}"
+        logger.info(f"[{category_name}] Scraped {len(result.products)} raw products.")
+        if incremental:
+            log_upsert_totals(category_name, upsert_totals)
+    except Exception as e:
+        logger.exception(f"❌ [{category_name}] listing crawl failed: {e}")
+        result = CategoryCrawlResult(category=category_name, error=str(e))
+    finally:
+        await page.close()
+        await context.close()
+
+    result.seconds = time.perf_counter() - started
+    logger.info(f"⏱️ [{category_name}] listing crawl took {result.seconds:.1f}s")
+    if blocker:
+        logger.info(f"🚫 [{category_name}] {blocker.summary()}")
+    return result
+
+
+def log_crawl_report(results: List[CategoryCrawlResult], wall_seconds: float) -> None:
+    """每個類別的 crawl 時間；加總 / 實際時間 = 並行帶來的 speedup"""
+    lines = [f"{'category':<14}{'pages':>6}{'products':>10}{'seconds':>10}"]
+    for r in sorted(results, key=lambda r: r.seconds, reverse=True):
+        status = f"  ❌ {r.error}" if r.error else "  ⏭️ skipped" if r.skipped else ""
+        lines.append(f"{r.category:<14}{r.pages:>6}{len(r.products):>10}{r.seconds:>10.1f}{status}")
+    serial_seconds = sum(r.seconds for r in results)
+    lines.append(
+        f"wall time {wall_seconds:.1f}s vs {serial_seconds:.1f}s summed per category "
+        f"(x{serial_seconds / wall_seconds if wall_seconds else 0:.1f})"
+    )
+    logger.info("📊 Listing crawl report\n" + "\n".join(lines))
+
+
+async def crawl_categories(category_map: Dict[str, str], concurrency: int = None,
+                           min_interval: float = None, incremental: bool = False,
+                           should_stop: Callable[[], bool] = None,
+                           on_result: Callable[[CategoryCrawlResult], None] = None,
+                           run_id: str = None, resume: bool = False) -> List[CategoryCrawlResult]:
+    """
+    should_stop：每個類別開始前檢查，回傳 True 時剩下的類別不再開始（結果標記 skipped）。
+    on_result：每個類別結束（或略過）時呼叫，用來回報進度。
+    resume=True：依 run_id 的 checkpoint 略過已完成的類別，未完成的從中斷的頁繼續。
+    """
+    run_id = run_id or default_run_id()
+    plan = await asyncio.to_thread(resume_plan, repo, run_id, category_map, resume)
+    concurrency = concurrency or Config.CATEGORY_CONCURRENCY
+    limiter = HostRateLimiter(Config.HOST_MIN_INTERVAL if min_interval is None else min_interval)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=not Config.SHOW_UI)
+
+        async def bounded(category_name: str, url: str) -> CategoryCrawlResult:
+            async with semaphore:
+                if plan[category_name] is None:
+                    logger.info(f"⏭️ [{category_name}] already done in run {run_id}")
+                    result = CategoryCrawlResult(category=category_name, skipped=True)
+                elif should_stop and should_stop():
+                    result = CategoryCrawlResult(category=category_name, skipped=True)
+                else:
+                    result = await crawl_category(browser, category_name, url, limiter, incremental,
+                                                  run_id, plan[category_name])
+            if on_result:
+                on_result(result)
+            return result
+
+        try:
+            results = await asyncio.gather(*(bounded(cat, url) for cat, url in category_map.items()))
+        finally:
+            await browser.close()
+
+    log_crawl_report(results, time.perf_counter() - started)
+    return results
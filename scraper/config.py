@@ -7,6 +7,16 @@ from dotenv import load_dotenv
 env_path =  '.env'
 load_dotenv(dotenv_path=env_path)
 
+def async_database_url(url: str) -> str:
+    """sync 連線字串換成對應的 async driver（SQLite → aiosqlite、Postgres → asyncpg）"""
+    scheme, rest = url.split(':', 1)
+    if scheme.startswith('sqlite'):
+        return 'sqlite+aiosqlite:' + rest
+    if scheme.startswith('postgresql'):
+        return 'postgresql+asyncpg:' + rest
+    raise ValueError(f"no async driver for {scheme}")
+
+
 class Config:
     """
     Postgres Database Configuration
@@ -18,13 +28,14 @@ class Config:
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_PORT = os.getenv('DB_PORT', '5432')
 
-    # SQLAlchemy 的連線字串
-    SQLALCHEMY_DATABASE_URI = (
+    # SQLAlchemy 的連線字串；DATABASE_URL 可直接指定（例如 benchmarks 用的 SQLite），async 版自動換成對應的 driver
+    DATABASE_URL = os.getenv('DATABASE_URL', '')
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or (
         f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}"
         f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
     
-    SQLALCHEMY_DATABASE_URI_ASYNC = (
+    SQLALCHEMY_DATABASE_URI_ASYNC = async_database_url(DATABASE_URL) if DATABASE_URL else (
         f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}"
         f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
@@ -38,4 +49,96 @@ class Config:
     FETCH_PRODUCT_DETAIL_TIMEOUT = int(os.getenv('FETCH_PRODUCT_DETAIL_TIMEOUT', 30))  # 預設 30 秒
 
     SHOW_UI = os.getenv('SHOW_UI', 'false').lower() in ('true', '1', 'yes')  # 預設為 True
-    MAX_TAB_FOR_PRODUCT_DETAIL = 2
\ No newline at end of file
+
+    BASE_URL = os.getenv('BASE_URL', 'https://www.dropit.bm')
+    # Playwright 精簡設定：擋掉的 resource type、允許的第一方網域（含子網域），以及 goto 等到哪個事件
+    BLOCK_RESOURCES = os.getenv('BLOCK_RESOURCES', 'true').lower() in ('true', '1', 'yes')
+    BLOCKED_RESOURCE_TYPES = [t.strip() for t in os.getenv(
+        'BLOCKED_RESOURCE_TYPES', 'image,media,font,stylesheet').split(',') if t.strip()]
+    BLOCK_THIRD_PARTY = os.getenv('BLOCK_THIRD_PARTY', 'true').lower() in ('true', '1', 'yes')
+    ALLOWED_HOST_SUFFIXES = [h.strip() for h in os.getenv(
+        'ALLOWED_HOST_SUFFIXES', 'dropit.bm,freshop.com').split(',') if h.strip()]
+    PAGE_WAIT_UNTIL = os.getenv('PAGE_WAIT_UNTIL', 'domcontentloaded')
+
+    # 列表頁 parser：lxml（預設）/ selectolax / bs4，沒安裝時退回 bs4
+    LISTING_PARSER = os.getenv('LISTING_PARSER', 'lxml').lower()
+
+    # 類別列表 crawl：同時 crawl 幾個類別，以及同一個 host 兩個 request 之間最少間隔幾秒
+    CATEGORY_CONCURRENCY = int(os.getenv('CATEGORY_CONCURRENCY', 3))
+    HOST_MIN_INTERVAL = float(os.getenv('HOST_MIN_INTERVAL', 0.5))
+    # 分頁方式：url（先讀總頁數再平行開各頁）或 click（逐頁點下一頁）；url 模式每個類別同時開幾個分頁
+    PAGINATION_MODE = os.getenv('PAGINATION_MODE', 'url').lower()
+    PAGE_CONCURRENCY = int(os.getenv('PAGE_CONCURRENCY', 4))
+    # 每個類別最後一頁的 full-page PNG screenshot（慢又大，預設關閉；要留原始頁面請用 HTML_ARCHIVE）
+    LISTING_SCREENSHOTS = os.getenv('LISTING_SCREENSHOTS', 'false').lower() in ('true', '1', 'yes')
+    MAX_TAB_FOR_PRODUCT_DETAIL = int(os.getenv('MAX_TAB_FOR_PRODUCT_DETAIL', 2))
+    # 明細 fetch 的自適應並行上限（AIMD）：從 MAX_TAB_FOR_PRODUCT_DETAIL 開始，在 min~max 之間調整；
+    # 延遲超過觀察到的最低延遲 x DETAIL_LATENCY_TOLERANCE 時不再增加。min = max 即固定並行數
+    DETAIL_MIN_CONCURRENCY = int(os.getenv('DETAIL_MIN_CONCURRENCY', 1))
+    DETAIL_MAX_CONCURRENCY = int(os.getenv('DETAIL_MAX_CONCURRENCY', 8))
+    DETAIL_LATENCY_TOLERANCE = float(os.getenv('DETAIL_LATENCY_TOLERANCE', 2.0))
+    # 明細頁重複使用暖好的 context / page（0 = DETAIL_MAX_CONCURRENCY 個），每個 context 用幾次後重建
+    CONTEXT_POOL = os.getenv('CONTEXT_POOL', 'true').lower() in ('true', '1', 'yes')
+    CONTEXT_POOL_SIZE = int(os.getenv('CONTEXT_POOL_SIZE', 0))
+    CONTEXT_MAX_USES = int(os.getenv('CONTEXT_MAX_USES', 50))
+    # 選好店家後存下的 cookie / localStorage（python -m scraper.context_pool --save-state）
+    STORE_STATE_PATH = os.getenv('STORE_STATE_PATH', 'state/store_state.json')
+    # 明細 work queue 上限（0 = 分頁數 x 2）與每次執行最多處理幾個 product（0 = 做完今天的工作為止）
+    DETAIL_QUEUE_SIZE = int(os.getenv('DETAIL_QUEUE_SIZE', 0))
+    DETAIL_DAILY_LIMIT = int(os.getenv('DETAIL_DAILY_LIMIT', 0))
+    # 多 process 共用 work queue 時每個 lease 的秒數（過期後其他 worker 可接手）
+    FETCH_LEASE_SECONDS = int(os.getenv('FETCH_LEASE_SECONDS', 600))
+    # 抓取失敗的重試：第 n 次失敗後等 min(BASE x 2^(n-1), MAX) 秒；失敗 FETCH_MAX_ATTEMPTS 次變成 dead。
+    # 手上沒有工作、但最近一個重試時間在 FETCH_RETRY_MAX_WAIT 秒內時，這次執行會等它
+    FETCH_MAX_ATTEMPTS = int(os.getenv('FETCH_MAX_ATTEMPTS', 5))
+    FETCH_RETRY_BASE_SECONDS = int(os.getenv('FETCH_RETRY_BASE_SECONDS', 30))
+    FETCH_RETRY_MAX_SECONDS = int(os.getenv('FETCH_RETRY_MAX_SECONDS', 1800))
+    FETCH_RETRY_MAX_WAIT = int(os.getenv('FETCH_RETRY_MAX_WAIT', 120))
+    # 明細抓取的優先順序（scraper.scheduler）：priority 依價格變動率、距上次抓取天數、類別、失敗紀錄排序，off 依 product id。
+    # FETCH_DAILY_BUDGET：每天最多幾次 page load（所有 process 的 claim 合計，0 = 不限制）
+    FETCH_SCHEDULER = os.getenv('FETCH_SCHEDULER', 'priority').lower()
+    FETCH_DAILY_BUDGET = int(os.getenv('FETCH_DAILY_BUDGET', 0))
+    SCHEDULER_LOOKBACK_DAYS = int(os.getenv('SCHEDULER_LOOKBACK_DAYS', 90))
+    SCHEDULER_PRIOR_DAYS = float(os.getenv('SCHEDULER_PRIOR_DAYS', 30))
+    SCHEDULER_MAX_AGE_DAYS = int(os.getenv('SCHEDULER_MAX_AGE_DAYS', 30))
+    SCHEDULER_FAILURE_DECAY = float(os.getenv('SCHEDULER_FAILURE_DECAY', 0.5))
+    # 類別權重，例如 "produce=2,meat=1.5"（沒列出的為 1）
+    SCHEDULER_CATEGORY_WEIGHTS = os.getenv('SCHEDULER_CATEGORY_WEIGHTS', '')
+
+    # 明細頁 fetch 方式：playwright（預設）或 http（純 HTTP，失敗才 fallback 到 Playwright）
+    DETAIL_FETCH_ENGINE = os.getenv('DETAIL_FETCH_ENGINE', 'playwright').lower()
+    HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 10))
+    # http engine 的明細頁 cache：ETag / Last-Modified 條件式請求 + 內容 hash，未變動的頁面不重新解析、不更新 product
+    DETAIL_CACHE = os.getenv('DETAIL_CACHE', 'true').lower() in ('true', '1', 'yes')
+    DETAIL_CACHE_PATH = os.getenv('DETAIL_CACHE_PATH', 'cache/detail_pages.sqlite3')
+    DETAIL_CACHE_MAX_MB = int(os.getenv('DETAIL_CACHE_MAX_MB', 200))
+
+    # scraper.html_archive：把抓到的列表 / 明細頁原始 HTML 壓縮存到 HTML_ARCHIVE_DIR/<日期>/（zstd，沒安裝時 zlib），
+    # selector 或 parser 修正後用 python -m scraper.reparse 離線重跑，不必重新 crawl。HTML_ARCHIVE_LEVEL 為 zstd 壓縮等級（zlib 取 min(level, 9)）
+    HTML_ARCHIVE = os.getenv('HTML_ARCHIVE', 'false').lower() in ('true', '1', 'yes')
+    HTML_ARCHIVE_DIR = os.getenv('HTML_ARCHIVE_DIR', 'archive')
+    HTML_ARCHIVE_LEVEL = int(os.getenv('HTML_ARCHIVE_LEVEL', 3))
+
+    # scraper.orchestrator：同時幾個 shard process（0 = CPU 核心數）
+    ORCHESTRATOR_PROCESSES = int(os.getenv('ORCHESTRATOR_PROCESSES', 0))
+
+    # scraper.metrics：各 stage 耗時 / 計數；METRICS_DIR 寫 Prometheus textfile（<job>.prom），METRICS_PORT 開 /metrics
+    METRICS = os.getenv('METRICS', 'true').lower() in ('true', '1', 'yes')
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+    # scraper.export_parquet：價格歷史匯出成 Parquet 的資料夾（scraper.analytics 從這裡讀），每次從 DB 串流幾筆
+    EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+    EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 50000))
+    # 增量匯出往回檢查多少個 history id：Postgres 上並行的 transaction 可能晚 commit 比較小的 id，
+    # 這個範圍內上次沒看到的 id 每次都再查一次（之外的視為 rollback / ON CONFLICT 用掉的 id）
+    EXPORT_ID_LOOKBACK = int(os.getenv('EXPORT_ID_LOOKBACK', 100000))
+
+    # 價格歷史儲存方式：daily（product_price_history 每天每個 product 一筆）
+    # 或 changes（product_price_span 價格有變才新增一筆；舊資料用 python -m scraper.db.price_spans backfill 轉換）
+    PRICE_STORAGE_MODE = os.getenv('PRICE_STORAGE_MODE', 'daily').lower()
+
+    # DB 批次寫入：每累積多少筆 commit 一次
+    DB_FLUSH_SIZE = int(os.getenv('DB_FLUSH_SIZE', 500))
+    # repository 的 iter_* 方法：每次從 DB 串流幾筆（yield_per）
+    DB_READ_CHUNK_ROWS = int(os.getenv('DB_READ_CHUNK_ROWS', 1000))
@@ -0,0 +1,250 @@
+# context_pool.py
+# 明細頁用的 Playwright context / page pool：重複使用暖好的分頁，取代每個 product 各開一個 context。
+# 每個 context 都帶著選好店家後存下的 storage state（cookie），見 doc/system_assumption.md。
+#
+# 先存一次店家 cookie（會開有畫面的瀏覽器，選好店家後回到 terminal 按 Enter）：
+#     python -m scraper.context_pool --save-state
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+import argparse
+import asyncio
+import logging
+import os
+
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+from scraper.config import Config
+from scraper.logger_setup import get_logger
+from scraper.metrics import timed
+from scraper.page_profile import ResourceBlocker
+
+logger = get_logger(__name__, log_file="logs/fetch_product_detail.log", level=logging.DEBUG)
+
+
+def context_options(storage_state: str = None) -> dict:
+    """browser.new_context() 的參數：有存好的店家 storage state 就帶上"""
+    path = storage_state or Config.STORE_STATE_PATH
+    return {"storage_state": path} if path and os.path.exists(path) else {}
+
+
+class LazyBrowser:
+    """
+    DETAIL_FETCH_ENGINE=http 時用：第一次真的需要 Playwright（HTTP 失敗 fallback）才啟動 Chromium。
+    全部走 HTTP 的執行不必付出 browser 啟動時間與記憶體。提供 pool / fetch 用到的 new_context / is_connected / close。
+    """
+
+    def __init__(self, playwright):
+        self._playwright = playwright
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def launched(self) -> bool:
+        return self._browser is not None
+
+    async def get(self):
+        async with self._lock:
+            if self._browser is None:
+                logger.info("🧭 Launching Chromium for Playwright fallback")
+                with timed("browser_launch"):
+                    self._browser = await self._playwright.chromium.launch(headless=not Config.SHOW_UI)
+            return self._browser
+
+    async def new_context(self, **kwargs):
+        return await (await self.get()).new_context(**kwargs)
+
+    def is_connected(self) -> bool:
+        return self._browser is None or self._browser.is_connected()
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+
+
+@dataclass
+class _Slot:
+    context: object
+    page: object
+    uses: int = 0
+    crashed: bool = False
+
+
+class BrowserContextPool:
+    """
+    用法：
+        async with BrowserContextPool(browser, size=4) as pool:
+            async with pool.page() as page:
+                await page.goto(url)
+    - 最多 size 個 context（各一個 page），用完放回 idle，需要時才建立新的
+    - 借出前檢查：page 已關閉、page crash、browser 斷線 → 丟掉重建
+    - 使用中 raise 非 timeout 的 Playwright 錯誤時，歸還前用一次 evaluate 探測，沒回應就重建
+    - 每個 context 用了 max_uses 次後重建，避免記憶體 / cookie / cache 無限累積
+    """
+
+    def __init__(self, browser, size: int = None, max_uses: int = None, storage_state: str = None,
+                 blocker: ResourceBlocker = None):
+        self.browser = browser
+        self.size = size or Config.CONTEXT_POOL_SIZE or Config.DETAIL_MAX_CONCURRENCY
+        self.max_uses = max_uses or Config.CONTEXT_MAX_USES
+        self.context_options = context_options(storage_state)
+        self.blocker = blocker
+        self._idle: List[_Slot] = []
+        self._open = 0
+        self._condition = asyncio.Condition()
+        self.created = 0
+        self.acquired = 0
+        self.recycled = Counter()  # 原因 → 次數
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def warm(self, count: int) -> None:
+        """事先建立 count 個 context，第一批 product 就不用等"""
+        count = min(count, self.size)
+        slots = await asyncio.gather(*(self._create() for _ in range(count - self._open)))
+        async with self._condition:
+            self._open += len(slots)
+            self._idle.extend(slots)
+            self._condition.notify_all()
+
+    async def _create(self) -> _Slot:
+        context = await self.browser.new_context(**self.context_options)
+        if self.blocker:
+            await self.blocker.attach(context)
+        page = await context.new_page()
+        slot = _Slot(context=context, page=page)
+        page.on("crash", lambda _: setattr(slot, "crashed", True))
+        self.created += 1
+        return slot
+
+    async def _discard(self, slot: _Slot, reason: str) -> None:
+        self.recycled[reason] += 1
+        try:
+            await slot.context.close()
+        except PlaywrightError:
+            pass  # browser / context 已經掛掉
+
+    def _unhealthy_reason(self, slot: _Slot) -> Optional[str]:
+        if slot.crashed:
+            return "crashed"
+        if slot.page.is_closed():
+            return "closed"
+        if not self.browser.is_connected():
+            return "disconnected"
+        if slot.uses >= self.max_uses:
+            return "max_uses"
+        return None
+
+    async def _probe(self, slot: _Slot) -> bool:
+        """page 還能執行 JS 嗎"""
+        try:
+            await asyncio.wait_for(slot.page.evaluate("1"), timeout=5)
+            return True
+        except (PlaywrightError, asyncio.TimeoutError):
+            return False
+
+    async def _acquire(self) -> _Slot:
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: self._idle or self._open < self.size)
+                if self._idle:
+                    slot = self._idle.pop()
+                else:
+                    self._open += 1
+                    slot = None
+            if slot is None:
+                try:
+                    return await self._create()
+                except BaseException:
+                    await self._release_capacity()
+                    raise
+            reason = self._unhealthy_reason(slot)
+            if reason is None:
+                return slot
+            await self._discard(slot, reason)
+            await self._release_capacity()
+
+    async def _release_capacity(self) -> None:
+        async with self._condition:
+            self._open -= 1
+            self._condition.notify_all()
+
+    async def _return(self, slot: _Slot) -> None:
+        reason = self._unhealthy_reason(slot)
+        if reason:
+            await self._discard(slot, reason)
+            await self._release_capacity()
+            return
+        async with self._condition:
+            self._idle.append(slot)
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def page(self):
+        with timed("context_pool_acquire"):
+            slot = await self._acquire()
+        slot.uses += 1
+        self.acquired += 1
+        try:
+            yield slot.page
+        except PlaywrightTimeoutError:
+            raise  # 頁面慢而已，page 本身沒問題
+        except PlaywrightError:
+            if not await self._probe(slot):
+                slot.crashed = True
+            raise
+        finally:
+            await self._return(slot)
+
+    async def close(self) -> None:
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for slot in idle:
+            try:
+                await slot.context.close()
+            except PlaywrightError:
+                pass
+
+    def summary(self) -> str:
+        recycled = ", ".join(f"{reason}={count}" for reason, count in self.recycled.most_common()) or "none"
+        return (
+            f"context pool: {self.acquired} pages served by {self.created} contexts "
+            f"(size {self.size}, recycle after {self.max_uses} uses; recycled: {recycled}), "
+            f"store state {'loaded' if self.context_options else 'not found'}"
+        )
+
+
+def save_store_state(path: str = None) -> None:
+    """開有畫面的瀏覽器讓使用者選店家，按 Enter 後把 cookie / localStorage 存到 path"""
+    from playwright.sync_api import sync_playwright
+
+    path = path or Config.STORE_STATE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(headless=False)
+        context = browser.new_context()
+        page = context.new_page()
+        page.goto(Config.BASE_URL)
+        input("Select the store in the browser window, then press Enter here to save it... ")
+        context.storage_state(path=path)
+        browser.close()
+    logger.info(f"💾 Saved store state to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Browser context pool utilities")
+    parser.add_argument("--save-state", action="store_true", help="選好店家後存下 storage state")
+    parser.add_argument("--path", default=None, help=f"storage state 檔案（預設 {Config.STORE_STATE_PATH}）")
+    args = parser.parse_args()
+    if args.save_state:
+        save_store_state(args.path)
+    else:
+        parser.print_help()
@@ -0,0 +1,99 @@
+# crawl_checkpoint.py
+# 列表 crawl 的逐頁寫入與 checkpoint：每頁的 products 一抓完就寫進 DB，再把「連續完成的最後一頁」記到
+# crawl_checkpoint。crash 之後 --resume 從 last_page + 1 繼續；頁面寫入是 idempotent 的
+# （insert_new_products 只插新的、upsert_listing_products 同一天的價格只記一筆），checkpoint 前 crash 重做也安全。
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from scraper.db.model import CrawlCheckpoint, Product
+from scraper.logger_setup import get_logger
+
+logger = get_logger(__name__, log_file="logs/dropit.log", level=logging.DEBUG)
+
+
+def default_run_id() -> str:
+    """預設一天一個 run：同一天 --resume 接續當天的進度"""
+    return date.today().isoformat()
+
+
+def resume_plan(repo, run_id: str, categories: Iterable[str], resume: bool) -> Dict[str, Optional[int]]:
+    """
+    每個類別要從第幾頁開始：{category: start_page}，已完成的類別為 None。
+    resume=False 時清掉這些類別的舊 checkpoint，全部從第 1 頁開始。
+    """
+    categories = list(categories)
+    if not resume:
+        repo.reset_crawl_checkpoints(run_id, categories)
+        return {category: 1 for category in categories}
+
+    checkpoints = repo.get_crawl_checkpoints(run_id)
+    plan = {}
+    for category in categories:
+        cp = checkpoints.get(category)
+        if cp is None:
+            plan[category] = 1
+        elif cp.status == CrawlCheckpoint.STATUS_DONE or (cp.total_pages and cp.last_page >= cp.total_pages):
+            plan[category] = None
+        else:
+            plan[category] = cp.last_page + 1
+            logger.info(f"↩️ [{category}] resuming run {run_id} from page {cp.last_page + 1}")
+    return plan
+
+
+def write_listing_page(repo, products: List[Product], category: str, incremental: bool,
+                       day: date = None) -> Optional[dict]:
+    """一頁的 products 寫進 DB；incremental 時回傳 upsert 統計（價格歷史記在 day，預設今天）"""
+    for p in products:
+        p.category = category
+    if not products:
+        return None
+    if incremental:
+        return repo.upsert_listing_products(products, category, day)
+    repo.insert_new_products(products)
+    return None
+
+
+class CategoryCheckpoint:
+    """
+    一個類別在一次 run 裡的進度。頁面可能不依序完成（URL 平行分頁），
+    checkpoint 只記到「從 start_page 起連續完成」的最後一頁，確保 resume 不會跳過沒寫入的頁。
+    """
+
+    def __init__(self, repo, run_id: str, category: str, start_page: int = 1):
+        self.repo = repo
+        self.run_id = run_id
+        self.category = category
+        self.last_page = start_page - 1
+        self.total_pages: Optional[int] = None
+        self.products = 0
+        if start_page > 1:
+            # resume：接續之前已寫入的數量
+            previous = repo.get_crawl_checkpoints(run_id).get(category)
+            self.products = previous.products if previous else 0
+        self._completed: Dict[int, int] = {}  # 已完成但還不連續的頁 → products 數量
+
+    def page_done(self, page_number: int, product_count: int) -> None:
+        """該頁已寫入 DB"""
+        self._completed[page_number] = product_count
+        advanced = False
+        while self.last_page + 1 in self._completed:
+            self.products += self._completed.pop(self.last_page + 1)
+            self.last_page += 1
+            advanced = True
+        if advanced:
+            self._save(CrawlCheckpoint.STATUS_RUNNING)
+
+    def finish(self, total_pages: int) -> bool:
+        """所有頁都連續完成才標記 done；回傳是否完成（否則下次 --resume 從缺的頁繼續）"""
+        self.total_pages = total_pages
+        done = self.last_page >= total_pages
+        self._save(CrawlCheckpoint.STATUS_DONE if done else CrawlCheckpoint.STATUS_RUNNING)
+        if not done:
+            logger.warning(f"⚠️ [{self.category}] only pages 1-{self.last_page} of {total_pages} completed; "
+                           f"rerun with --resume to continue")
+        return done
+
+    def _save(self, status: str) -> None:
+        self.repo.save_crawl_checkpoint(self.run_id, self.category, self.last_page, self.products,
+                                        total_pages=self.total_pages, status=status)
@@ -2,13 +2,37 @@
 """
 初始化 repository 與 session factory 出口。
 你可以直接 from my_package import ProductRepository 使用。
+
+名稱在第一次存取時才 import（PEP 562）：`import scraper.db.model` 之類只需要部分模組的地方，
+不會連帶載入 repository 與 DB driver；取用 SessionLocal / AsyncSessionLocal 時才建立 engine。
 """
+import importlib
 
-from .product_repo import ProductRepository
-from .async_engine import AsyncSessionLocal
-from .sync_engine import SessionLocal
-from .model import Base, Product, ProductPriceHistory
-from .db_safe import db_safe
-from .repository_factory import get_product_repo
+_EXPORTS = {
+    "ProductRepository": ".product_repo",
+    "ProductRow": ".product_repo",
+    "AsyncSessionLocal": ".async_engine",
+    "SessionLocal": ".sync_engine",
+    "Base": ".model",
+    "Product": ".model",
+    "ProductPriceHistory": ".model",
+    "ProductPriceSpan": ".model",
+    "ProductFetchTask": ".model",
+    "FetchBudget": ".model",
+    "CrawlCheckpoint": ".model",
+    "db_safe": ".db_safe",
+    "get_product_repo": ".repository_factory",
+}
 
 __all__ = ["ProductRepository", "SessionLocal", "AsyncSessionLocal"]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,7 +1,50 @@
 # db/async_engine.py
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+# 與 sync_engine 相同：async engine（asyncpg / aiosqlite）在第一次開 session 時才建立，
+# `from scraper.db.async_engine import async_engine, AsyncSessionLocal` 仍可用（模組層 __getattr__）。
+import threading
+
 from sqlalchemy.orm import sessionmaker
+
 from scraper.config import Config
+from scraper.metrics import instrument_engine
+
+_engine = None
+_session_factory = None
+_lock = threading.Lock()
+
+
+def get_async_engine():
+    global _engine, _session_factory
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+                engine = create_async_engine(Config.SQLALCHEMY_DATABASE_URI_ASYNC, pool_size=5)
+                instrument_engine(engine.sync_engine)
+                _session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+                _engine = engine
+    return _engine
+
+
+def get_async_sessionmaker() -> sessionmaker:
+    get_async_engine()
+    return _session_factory
+
+
+def new_async_session():
+    """repository 的 async_session_factory：第一次呼叫時才建立 async engine"""
+    return get_async_sessionmaker()()
+
+
+async def dispose_async_engine() -> None:
+    """關掉連線池（asyncpg 連線綁在建立它的 event loop 上）；沒建立過 engine 就什麼都不做"""
+    if _engine is not None:
+        await _engine.dispose()
+
 
-async_engine = create_async_engine(Config.SQLALCHEMY_DATABASE_URI_ASYNC, pool_size=5)
-AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
\ No newline at end of file
+def __getattr__(name):
+    if name == 'async_engine':
+        return get_async_engine()
+    if name == 'AsyncSessionLocal':
+        return get_async_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,8 @@
 from sqlalchemy import create_engine, Integer, String
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
 from sqlalchemy import (
-    Column, Integer, String, Numeric, DateTime,Date, func
+    Column, Integer, String, Numeric, DateTime,Date, Float, func,
+    ForeignKey, Index, UniqueConstraint
 )
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -42,9 +43,20 @@ class Product(Base):
         )
 class ProductPriceHistory(Base):
     __tablename__ = 'product_price_history'
+    __table_args__ = (
+        # 每個 product 每天只會有一筆；這個 unique index 同時就是 (product_id, created_at) 的複合索引
+        UniqueConstraint('product_id', 'created_at', name='uq_price_history_product_day'),
+        # 「今天有哪些 product 已經有價格」這類以日期為主的查詢
+        Index('ix_price_history_created_at_product', 'created_at', 'product_id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    product_id = Column(Integer, nullable=False, comment="產品ID")
+    product_id = Column(
+        Integer,
+        ForeignKey('products.id', ondelete='CASCADE'),
+        nullable=False,
+        comment="產品ID"
+    )
     price = Column(Numeric(10, 2), nullable=False, comment="價格")
     created_at = Column(
         Date,
@@ -58,3 +70,116 @@ class ProductPriceHistory(Base):
             f"<ProductPriceHistory(id={self.id}, product_id={self.product_id}, "
             f"price={self.price}, created_at={self.created_at})>"
         )
+
+class ProductPriceSpan(Base):
+    """
+    PRICE_STORAGE_MODE=changes 的價格儲存：價格有變才新增一筆，一筆代表一段價格不變的期間。
+    valid_from <= 日期 < valid_to 時的價格就是 price；valid_to 為 NULL 表示目前的價格。
+    checked_at 是最後一次確認還是這個價格的日期（價格沒變只更新它，不新增紀錄）。
+    """
+    __tablename__ = 'product_price_span'
+    __table_args__ = (
+        UniqueConstraint('product_id', 'valid_from', name='uq_price_span_product_from'),
+        # 「今天有哪些 product 已經確認過價格」
+        Index('ix_price_span_checked_at_product', 'checked_at', 'product_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(
+        Integer,
+        ForeignKey('products.id', ondelete='CASCADE'),
+        nullable=False,
+        comment="產品ID"
+    )
+    price = Column(Numeric(10, 2), nullable=False, comment="價格")
+    valid_from = Column(Date, nullable=False, comment="這個價格的第一天")
+    valid_to = Column(Date, nullable=True, comment="下一個價格的第一天（不含）；NULL = 目前價格")
+    checked_at = Column(Date, nullable=False, comment="最後一次確認為這個價格的日期")
+
+    def __repr__(self):
+        return (
+            f"<ProductPriceSpan(product_id={self.product_id}, price={self.price}, "
+            f"valid_from={self.valid_from}, valid_to={self.valid_to}, checked_at={self.checked_at})>"
+        )
+
+class ProductFetchTask(Base):
+    """
+    每日明細抓取的 work queue：一個 product 一天一筆。
+    多個 fetcher process 用 lease（SELECT ... FOR UPDATE SKIP LOCKED）分配工作，lease 過期可被別人接手。
+    抓取失敗的 task 變成 failed，等到 next_attempt_at（exponential backoff）後可再被領取；
+    失敗達 FETCH_MAX_ATTEMPTS 次變成 dead（當天不再重試）。
+    claim 依 priority 由高到低（FETCH_SCHEDULER=priority 時由 seed 寫入，否則都是 0、依 product_id）。
+    """
+    __tablename__ = 'product_fetch_queue'
+    __table_args__ = (
+        Index('ix_fetch_queue_day_status', 'work_date', 'status'),
+        Index('ix_fetch_queue_day_priority', 'work_date', 'priority'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_LEASED = 'leased'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_DEAD = 'dead'
+
+    work_date = Column(Date, primary_key=True, comment="工作日期")
+    product_id = Column(
+        Integer,
+        ForeignKey('products.id', ondelete='CASCADE'),
+        primary_key=True,
+        comment="產品ID"
+    )
+    status = Column(String(10), nullable=False, default=STATUS_PENDING, comment="pending / leased / done / failed / dead")
+    lease_owner = Column(String(64), nullable=True, comment="持有 lease 的 worker")
+    lease_expires_at = Column(DateTime, nullable=True, comment="lease 到期時間（UTC）")
+    attempts = Column(Integer, nullable=False, default=0, comment="被領取次數")
+    next_attempt_at = Column(DateTime, nullable=True, comment="failed task 最早可重試的時間（UTC）")
+    last_error = Column(String(255), nullable=True, comment="最後一次失敗的原因")
+    priority = Column(Float, nullable=False, default=0, server_default='0',
+                      comment="領取順序（scraper.scheduler 的分數，高的先領）")
+
+    def __repr__(self):
+        return (
+            f"<ProductFetchTask(work_date={self.work_date}, product_id={self.product_id}, "
+            f"status={self.status!r}, lease_owner={self.lease_owner!r})>"
+        )
+
+
+class FetchBudget(Base):
+    """
+    FETCH_DAILY_BUDGET 的計數：每天一筆，used 是當天所有 process 已領取（= 會載入）的頁數。
+    claim_products 在同一個 transaction 裡先鎖住這一筆、依剩餘額度領取、再加上領到的數量，
+    多個 process 同時領取也不會超過 budget。
+    """
+    __tablename__ = 'fetch_budget'
+
+    work_date = Column(Date, primary_key=True, comment="工作日期")
+    used = Column(Integer, nullable=False, default=0, server_default='0', comment="已領取的 page load 數")
+
+    def __repr__(self):
+        return f"<FetchBudget(work_date={self.work_date}, used={self.used})>"
+
+
+class CrawlCheckpoint(Base):
+    """
+    列表 crawl 的進度：每個 run_id（預設為日期）每個類別一筆，記錄已寫入 DB 的最後一頁（連續完成的頁數）。
+    crawl 中斷後用 --resume 從 last_page + 1 繼續，status = done 的類別直接略過。
+    """
+    __tablename__ = 'crawl_checkpoint'
+
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+
+    run_id = Column(String(64), primary_key=True, comment="執行代號（預設為日期）")
+    category = Column(String(100), primary_key=True, comment="類別名稱")
+    last_page = Column(Integer, nullable=False, default=0, comment="已寫入 DB 的最後一頁（其之前的頁都已完成）")
+    total_pages = Column(Integer, nullable=True, comment="類別總頁數（已知時）")
+    products = Column(Integer, nullable=False, default=0, comment="已寫入的 products 數量")
+    status = Column(String(10), nullable=False, default=STATUS_RUNNING, comment="running / done")
+    updated_at = Column(DateTime, nullable=False, comment="最後更新時間（UTC）")
+
+    def __repr__(self):
+        return (
+            f"<CrawlCheckpoint(run_id={self.run_id!r}, category={self.category!r}, "
+            f"last_page={self.last_page}, status={self.status!r})>"
+        )
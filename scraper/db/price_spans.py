@@ -0,0 +1,196 @@
+# price_spans.py
+# PRICE_STORAGE_MODE=changes：價格只在變動時新增一筆 product_price_span（valid_from / valid_to），
+# 價格沒變只把目前那筆的 checked_at 更新成今天。寫入前要知道每個 product 目前的價格：
+# PriceIndex 每個 DB 只用一次 bulk query 載入（valid_to IS NULL 的 span），之後隨 commit 更新，不再逐頁查詢。
+#
+#     python -m scraper.db.price_spans backfill          # 從 product_price_history 重建全部 span
+#     python -m scraper.db.price_spans verify --days 30  # 抽樣比對兩種儲存方式重建出的每日價格
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from datetime import date, timedelta
+import argparse
+import logging
+import random
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from scraper.config import Config
+from scraper.db.model import ProductPriceSpan
+from scraper.logger_setup import get_logger
+
+logger = get_logger(__name__, log_file="logs/db_logger.log", level=logging.DEBUG)
+
+MODE_DAILY = 'daily'
+MODE_CHANGES = 'changes'
+CENT = Decimal('0.01')
+
+
+def storage_mode(mode: str = None) -> str:
+    mode = (mode or Config.PRICE_STORAGE_MODE).lower()
+    if mode not in (MODE_DAILY, MODE_CHANGES):
+        raise ValueError(f"Unknown PRICE_STORAGE_MODE {mode!r} (expected {MODE_DAILY} or {MODE_CHANGES})")
+    return mode
+
+
+def to_price(value) -> Decimal:
+    """統一成兩位小數的 Decimal（與 Numeric(10, 2) 讀回來的值可直接比較）"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT)
+
+
+class CurrentPrice(NamedTuple):
+    price: Decimal
+    valid_from: date
+    checked_at: date
+
+
+class PriceIndex:
+    """
+    {product_id: CurrentPrice}：每個 product 目前的價格。
+    第一次寫入時才載入（一次 bulk query），寫入的變更在 commit 之後才套用，rollback 的不會留在 index 裡。
+    每個 process 各自一份：同一個 product 同一天通常只由一個 process 寫入（fetch queue 的 lease），
+    其他 process 造成的變動要到下次執行（或 invalidate）才會看到。
+    """
+
+    def __init__(self):
+        self._prices: Optional[Dict[int, CurrentPrice]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._prices is not None
+
+    def load(self, db: Session) -> Dict[int, CurrentPrice]:
+        with self._lock:
+            if self._prices is None:
+                rows = db.execute(
+                    select(ProductPriceSpan.product_id, ProductPriceSpan.price,
+                           ProductPriceSpan.valid_from, ProductPriceSpan.checked_at)
+                    .where(ProductPriceSpan.valid_to.is_(None))
+                ).all()
+                self._prices = {pid: CurrentPrice(to_price(price), valid_from, checked_at)
+                                for pid, price, valid_from, checked_at in rows}
+                logger.debug(f"💾 Loaded current prices of {len(self._prices)} products")
+            return self._prices
+
+    def apply(self, updates: Dict[int, CurrentPrice]) -> None:
+        with self._lock:
+            if self._prices is not None:
+                self._prices.update(updates)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._prices = None
+
+
+_indexes: Dict[tuple, PriceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def price_index(db: Session) -> PriceIndex:
+    """db 所連的 DB 的 PriceIndex；sync / async engine 指向同一個 DB 時共用（不看 driver）"""
+    url = db.get_bind().url
+    key = (url.get_backend_name(), url.host, url.port, url.database)
+    with _indexes_lock:
+        return _indexes.setdefault(key, PriceIndex())
+
+
+def reset_price_indexes() -> None:
+    """backfill 之後或其他 process 大量改動時，讓下次寫入重新載入"""
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.invalidate()
+
+
+def stage_index_updates(db: Session, index: PriceIndex, updates: Dict[int, CurrentPrice]) -> None:
+    """updates 等 db commit 之後才套用到 index"""
+    if updates:
+        db.info.setdefault('price_index_pending', []).append((index, updates))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    for index, updates in session.info.pop('price_index_pending', ()):
+        index.apply(updates)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('price_index_pending', None)
+
+
+def build_spans(observations: Iterable[Tuple[int, object, date]]) -> Iterator[dict]:
+    """
+    (product_id, price, 日期) 依 product_id、日期排序 → span dict。
+    連續相同價格合併成一段；每段的 valid_to 是下一個價格的第一天，最後一段為 None。
+    """
+    current = None
+    for product_id, price, day in observations:
+        price = to_price(price)
+        if current is not None and current['product_id'] == product_id:
+            if current['price'] == price:
+                current['checked_at'] = day
+                continue
+            current['valid_to'] = day
+        if current is not None:
+            yield current
+        current = {'product_id': product_id, 'price': price, 'valid_from': day,
+                   'valid_to': None, 'checked_at': day}
+    if current is not None:
+        yield current
+
+
+def expand_series(points: List[Tuple[date, Decimal]], start: date, end: date) -> List[Tuple[date, Decimal]]:
+    """
+    價格變動點（日期, 價格）→ start..end 每天的價格（沿用前一個價格）。
+    points 依日期排序，第一個點可以早於 start；第一次有價格之前的日子不列出。
+    """
+    series = []
+    i, price = 0, None
+    day = start
+    while day <= end:
+        while i < len(points) and points[i][0] <= day:
+            price = points[i][1]
+            i += 1
+        if price is not None:
+            series.append((day, price))
+        day += timedelta(days=1)
+    return series
+
+
+def verify(repo, days: int = 30, sample: int = 10) -> int:
+    """抽樣 sample 天，比對 daily / changes 兩種儲存方式重建出的每日價格；回傳不一致的 product 數"""
+    today = date.today()
+    mismatches = 0
+    for offset in sorted(random.sample(range(days), min(sample, days))):
+        day = today - timedelta(days=offset)
+        daily = repo.get_prices_on(day, mode=MODE_DAILY)
+        spans = repo.get_prices_on(day, mode=MODE_CHANGES)
+        diff = {pid for pid in daily.keys() | spans.keys() if daily.get(pid) != spans.get(pid)}
+        mismatches += len(diff)
+        status = "✅" if not diff else f"❌ {len(diff)} mismatches, e.g. product {sorted(diff)[:5]}"
+        logger.info(f"{day}: {len(daily)} daily vs {len(spans)} span prices {status}")
+    return mismatches
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Change-only price storage (product_price_span)")
+    parser.add_argument("command", choices=["backfill", "verify"])
+    parser.add_argument("--chunk-size", type=int, default=None, help="backfill：每次從 DB 串流幾筆")
+    parser.add_argument("--days", type=int, default=30, help="verify：從最近幾天抽樣")
+    parser.add_argument("--sample", type=int, default=10, help="verify：抽樣幾天")
+    args = parser.parse_args(argv)
+
+    from scraper.db.repository_factory import get_product_repo
+    repo = get_product_repo()
+    if args.command == "backfill":
+        repo.backfill_price_spans(args.chunk_size)
+    elif verify(repo, args.days, args.sample):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
-from typing import List
-from contextlib import contextmanager
-from sqlalchemy import create_engine, select, func
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import TYPE_CHECKING, Dict, List, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+from contextlib import asynccontextmanager, contextmanager
+from sqlalchemy import select, func, insert, update, delete, and_, literal, bindparam
 from sqlalchemy import or_  # ✅ 這邊 import or_ 函式
 from sqlalchemy.sql import exists
 from sqlalchemy.orm import sessionmaker, Session
@@ -10,16 +9,29 @@ from sqlalchemy.exc import SQLAlchemyError
 from scraper.db.model import Base  # ✅ 這邊 import model.py 裡面的 Base
 from scraper.db.model import Product  # ✅ 這邊 import model.py 裡面的 Product
 from scraper.db.model import ProductPriceHistory  # ✅ 這邊 import model.py 裡面的 ProductPriceHistory
-from scraper.db.sync_engine import engine  # ✅ 這邊 import sync_engine.py 裡面的 SessionLocal
+from scraper.db.model import ProductPriceSpan
+from scraper.db.model import ProductFetchTask
+from scraper.db.model import FetchBudget
+from scraper.db.model import CrawlCheckpoint
+from scraper.db import price_spans
+from scraper import scheduler
+from scraper.db.price_spans import CurrentPrice, MODE_CHANGES, storage_mode, to_price
+from scraper.db.sync_engine import get_engine  # ✅ engine 第一次使用時才建立
 from dotenv import load_dotenv
 from scraper.logger_setup import get_logger  # ✅ 這邊 import logger_setup.py 裡面的 get_logger
 from scraper.config import Config
 from typing import Callable, AsyncGenerator, Generator
+import asyncio
 import logging
 import csv
 import os
-from datetime import date
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 
+if TYPE_CHECKING:  # sqlalchemy.ext.asyncio 只在真的開 async session 時才載入
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # 🧠 建立 session factory
@@ -27,23 +39,692 @@ logger = get_logger(__name__,log_file="logs/db_logger.log", level=logging.DEBUG)
 CSV_FILE = 'temp/failed_products.csv'
 FIELDNAMES = ['name', 'price', 'unit', 'url']
 
+
+def _priced_on(day: date):
+    """
+    correlated EXISTS：該 product 在 day 這天已有價格歷史。
+    created_at 本身就是 Date，直接比較才能用到 (product_id, created_at) 索引，不要包 func.date()。
+    changes 模式：涵蓋 day 的 span 在 day 當天（或之後）確認過價格。
+    """
+    if storage_mode() == MODE_CHANGES:
+        return exists().where(
+            ProductPriceSpan.product_id == Product.id,
+            ProductPriceSpan.checked_at >= day,
+            ProductPriceSpan.valid_from <= day,
+        )
+    return exists().where(
+        ProductPriceHistory.product_id == Product.id,
+        ProductPriceHistory.created_at == day,
+    )
+
+
+def _keyset_claim_stmts(bounds, day: date, limit: int, exclude_ids: Iterable[int] = ()):
+    """
+    產生「今天還沒價格的 product」的 keyset 查詢：先取 id >= 隨機起點，再取 id < 起點（繞回）。
+    兩段都是沿 primary key 的 range scan + LIMIT，不需要對整張表排序。
+    呼叫端依序執行，湊滿 limit 就停。
+    """
+    min_id, max_id = bounds
+    if min_id is None:
+        return []
+    pivot = random.randint(min_id, max_id)
+    base = select(Product).where(~_priced_on(day))
+    exclude_ids = list(exclude_ids)
+    if exclude_ids:
+        base = base.where(Product.id.notin_(exclude_ids))
+    return [
+        base.where(Product.id >= pivot).order_by(Product.id),
+        base.where(Product.id < pivot).order_by(Product.id),
+    ]
+
+
+def _dialect_insert(db: Session, model):
+    """
+    回傳該 DB dialect 的 insert()（Postgres / SQLite 都支援 on_conflict_do_nothing / do_update），
+    其他 dialect 退回一般 insert。
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(model)
+    return dialect_insert(model)
+
+
+def _utcnow() -> datetime:
+    """lease 時間一律用 naive UTC 存"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _latest_prices(db: Session, product_ids: Iterable[int]) -> dict:
+    """{product_id: 最後一筆價格歷史的價格}；走 (product_id, created_at) 索引。changes 模式直接查 PriceIndex"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    if storage_mode() == MODE_CHANGES:
+        current = price_spans.price_index(db).load(db)
+        return {pid: current[pid].price for pid in product_ids if pid in current}
+    last_day = (
+        select(ProductPriceHistory.product_id, func.max(ProductPriceHistory.created_at).label('created_at'))
+        .where(ProductPriceHistory.product_id.in_(product_ids))
+        .group_by(ProductPriceHistory.product_id)
+        .subquery()
+    )
+    stmt = select(ProductPriceHistory.product_id, ProductPriceHistory.price).join(
+        last_day,
+        and_(ProductPriceHistory.product_id == last_day.c.product_id,
+             ProductPriceHistory.created_at == last_day.c.created_at),
+    )
+    return dict(db.execute(stmt).all())
+
+
+def _write_price_rows(db: Session, rows: List[dict]) -> None:
+    """
+    在目前的 transaction 內寫入價格歷史；同一 product 同一天已有紀錄的略過。
+    rows: [{'product_id', 'price', 'created_at'}]，依 PRICE_STORAGE_MODE 寫入每日一筆或只記價格變動。
+    """
+    if not rows:
+        return
+    if storage_mode() == MODE_CHANGES:
+        _write_price_spans(db, rows)
+        return
+    stmt = _dialect_insert(db, ProductPriceHistory)
+    if hasattr(stmt, 'on_conflict_do_nothing'):
+        stmt = stmt.on_conflict_do_nothing(index_elements=['product_id', 'created_at'])
+    db.execute(stmt, rows)
+
+
+_span_table = ProductPriceSpan.__table__
+# 價格沒變：只更新目前那段的 checked_at
+_confirm_span_stmt = (
+    update(_span_table)
+    .where(_span_table.c.product_id == bindparam('b_product_id'),
+           _span_table.c.valid_to.is_(None),
+           _span_table.c.checked_at < bindparam('b_day'))
+    .values(checked_at=bindparam('b_day'))
+)
+# 價格變了：結束目前那段（valid_to = 新價格的第一天）
+_close_span_stmt = (
+    update(_span_table)
+    .where(_span_table.c.product_id == bindparam('b_product_id'),
+           _span_table.c.valid_to.is_(None),
+           _span_table.c.valid_from < bindparam('b_day'))
+    .values(valid_to=bindparam('b_day'))
+)
+
+
+def _write_price_spans(db: Session, rows: List[dict]) -> None:
+    """
+    changes 模式的 _write_price_rows：和 PriceIndex 的目前價格比較，
+    沒變的只更新 checked_at，變了的結束舊的 span 並新增一段。
+    同一天已有價格的略過（與 daily 模式一樣以先寫入的為準）；比目前價格還舊的日期也略過。
+    """
+    index = price_spans.price_index(db)
+    current = index.load(db)
+    updates: Dict[int, CurrentPrice] = {}
+    confirm, close, new_spans = [], [], []
+    for row in rows:
+        product_id, day, price = row['product_id'], row['created_at'], to_price(row['price'])
+        last = updates.get(product_id) or current.get(product_id)
+        if last is not None and day <= last.valid_from:
+            continue
+        if last is not None and last.price == price:
+            if day > last.checked_at:
+                confirm.append({'b_product_id': product_id, 'b_day': day})
+                updates[product_id] = last._replace(checked_at=day)
+            continue
+        if last is not None:
+            close.append({'b_product_id': product_id, 'b_day': day})
+        new_spans.append({'product_id': product_id, 'price': price, 'valid_from': day, 'checked_at': day})
+        updates[product_id] = CurrentPrice(price, day, day)
+
+    if confirm:
+        db.execute(_confirm_span_stmt, confirm)
+    if close:
+        db.execute(_close_span_stmt, close)
+    if new_spans:
+        stmt = _dialect_insert(db, ProductPriceSpan)
+        if hasattr(stmt, 'on_conflict_do_nothing'):
+            stmt = stmt.on_conflict_do_nothing(index_elements=['product_id', 'valid_from'])
+        db.execute(stmt, new_spans)
+    price_spans.stage_index_updates(db, index, updates)
+    logger.debug(f"Price spans: {len(new_spans)} changes ({len(close)} closed), {len(confirm)} unchanged")
+
+
+def retry_delay(attempts: int) -> int:
+    """第 attempts 次失敗後要等幾秒才重試：FETCH_RETRY_BASE_SECONDS x 2^(attempts-1)，上限 FETCH_RETRY_MAX_SECONDS"""
+    return min(Config.FETCH_RETRY_MAX_SECONDS, Config.FETCH_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+def _chunked(rows: List[dict], size: int) -> Iterator[List[dict]]:
+    """將 rows 切成每段最多 size 筆"""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+# ----------------------------------------------------------------------
+# 以 db（Session）為參數的實作：sync 方法直接呼叫，*_async 方法透過 AsyncSession.run_sync 呼叫，
+# 同一份邏輯、同樣的 SQL，只是 I/O 走 asyncpg
+# ----------------------------------------------------------------------
+def _upsert_listing_products(db: Session, products: List[Product], category: str = None,
+                             day: date = None) -> dict:
+    today = day or date.today()
+    by_url = {}
+    skipped = 0
+    for p in products:
+        if p.price is None or not p.url or p.url == 'N/A':
+            skipped += 1  # products.price 不可為 NULL；沒有網址也無法辨識
+            continue
+        by_url[p.url] = p
+    stats = {'inserted': 0, 'updated': 0, 'price_changes': 0, 'skipped': skipped}
+    if not by_url:
+        return stats
+
+    rows = [
+        {
+            'name': p.name,
+            'price': p.price,
+            'unit': p.unit,
+            'url': url,
+            'category': category or p.category,
+            'created_at': today,
+            'updated_at': today,
+        }
+        for url, p in by_url.items()
+    ]
+
+    try:
+        existing = dict(db.execute(
+            select(Product.url, Product.id).where(Product.url.in_(by_url))
+        ).all())
+        last_prices = _latest_prices(db, existing.values())
+
+        stmt = _dialect_insert(db, Product)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['url'],
+            set_={
+                'name': stmt.excluded.name,
+                'price': stmt.excluded.price,
+                'unit': stmt.excluded.unit,
+                'category': func.coalesce(stmt.excluded.category, Product.category),
+                'updated_at': stmt.excluded.updated_at,
+            },
+        )
+        db.execute(stmt, rows)
+
+        new_urls = [url for url in by_url if url not in existing]
+        if new_urls:
+            existing.update(db.execute(
+                select(Product.url, Product.id).where(Product.url.in_(new_urls))
+            ).all())
+
+        # 價格沒變也記下今天的觀察（daily 模式同一天已有的略過、changes 模式只更新 checked_at），
+        # 否則 _seed_fetch_queue 會把列表上已經看到價格的 product 又排進明細 fetch
+        price_rows = [
+            {'product_id': existing[url], 'price': p.price, 'created_at': today}
+            for url, p in by_url.items()
+        ]
+        _write_price_rows(db, price_rows)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error upserting {len(rows)} listing products: {e}", exc_info=True)
+        raise
+
+    stats['inserted'] = len(new_urls)
+    stats['updated'] = len(rows) - len(new_urls)
+    stats['price_changes'] = sum(1 for row in price_rows if last_prices.get(row['product_id']) != row['price'])
+    logger.debug(
+        f"Upserted {len(rows)} listing products ({stats['inserted']} new); "
+        f"{len(price_rows)} prices recorded for {today} ({stats['price_changes']} changed)"
+    )
+    return stats
+
+
+def _insert_price_histories(db: Session, rows: Iterable[dict], flush_size: int = None) -> int:
+    flush_size = flush_size or Config.DB_FLUSH_SIZE
+    today = date.today()
+    records = [{'created_at': today, **row} for row in rows]
+    if not records:
+        return 0
+
+    inserted = 0
+    try:
+        for chunk in _chunked(records, flush_size):
+            # 同一個 product 同一天已經有紀錄（例如別的 process 先寫了）就略過
+            _write_price_rows(db, chunk)
+            db.commit()
+            inserted += len(chunk)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(
+            f"Error bulk inserting price history ({inserted}/{len(records)} committed): {e}",
+            exc_info=True
+        )
+        raise
+    logger.debug(f"Bulk inserted {inserted} price history rows")
+    return inserted
+
+
+def _update_products_bulk(db: Session, rows: Iterable[dict], flush_size: int = None) -> int:
+    flush_size = flush_size or Config.DB_FLUSH_SIZE
+    today = date.today()
+    records = [
+        {'id': row['id'], 'sku': row.get('sku'), 'location': row.get('location'), 'updated_at': today}
+        for row in rows
+    ]
+    if not records:
+        return 0
+
+    updated = 0
+    try:
+        for chunk in _chunked(records, flush_size):
+            db.execute(update(Product), chunk)
+            db.commit()
+            updated += len(chunk)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(
+            f"Error bulk updating products ({updated}/{len(records)} committed): {e}",
+            exc_info=True
+        )
+        raise
+    logger.debug(f"Bulk updated {updated} products")
+    return updated
+
+
+class ProductRow(NamedTuple):
+    """
+    iter_* 方法 yield 的唯讀 product：不進 identity map、不會 expire，session 關掉之後照常讀取。
+    要改欄位用 update_product(row, ...) / update_products_bulk（依 id 下 UPDATE）。
+    """
+    id: int
+    name: str
+    price: Decimal
+    unit: Optional[str]
+    url: str
+    category: Optional[str]
+    sku: Optional[str]
+    location: Optional[str]
+
+
+_PRODUCT_ROW_COLUMNS = (Product.id, Product.name, Product.price, Product.unit, Product.url,
+                        Product.category, Product.sku, Product.location)
+
+
+def _iter_product_rows(db: Session, *criteria, chunk_size: int = None) -> Iterator[ProductRow]:
+    """
+    依 id 順序串流符合 criteria 的 products。yield_per：Postgres 上是 server-side cursor，
+    每次只從 DB 取 chunk_size 筆，記憶體用量與總筆數無關。
+    迭代期間 session（連線）一直開著：SQLite 上邊讀邊逐筆 commit 會等 lock，更新請累積後用 update_products_bulk。
+    """
+    stmt = (
+        select(*_PRODUCT_ROW_COLUMNS)
+        .where(*criteria)
+        .order_by(Product.id)
+        .execution_options(yield_per=chunk_size or Config.DB_READ_CHUNK_ROWS)
+    )
+    for rows in db.execute(stmt).partitions():
+        for row in rows:
+            yield ProductRow._make(row)
+
+
+def _get_products_by_ids(db: Session, product_ids: Iterable[int]) -> list[Product]:
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    return db.execute(
+        select(Product).where(Product.id.in_(product_ids)).order_by(Product.id)
+    ).scalars().all()
+
+
+def _seed_fetch_queue(db: Session, day: date = None) -> int:
+    day = day or date.today()
+    source = select(
+        literal(day, ProductFetchTask.work_date.type),
+        Product.id,
+        literal(ProductFetchTask.STATUS_PENDING, ProductFetchTask.status.type),
+        literal(0, ProductFetchTask.attempts.type),
+    ).where(or_(
+        ~_priced_on(day),
+        # 列表 crawl 已經記了今天價格的新 product 還是要抓一次明細頁補 sku / location
+        Product.sku.is_(None),
+        Product.location.is_(None),
+    ))
+    stmt = _dialect_insert(db, ProductFetchTask).from_select(
+        ['work_date', 'product_id', 'status', 'attempts'], source
+    )
+    if hasattr(stmt, 'on_conflict_do_nothing'):
+        stmt = stmt.on_conflict_do_nothing(index_elements=['work_date', 'product_id'])
+    seeded = db.execute(stmt).rowcount
+    db.commit()
+    # 只在有新 task 時排序：同一天重跑或 orchestrator 的每個 shard 各自 seed 時不必重算
+    if seeded and Config.FETCH_SCHEDULER == 'priority':
+        _prioritize_fetch_queue(db, day)
+    pending = db.execute(
+        select(func.count())
+        .select_from(ProductFetchTask)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.status == ProductFetchTask.STATUS_PENDING)
+    ).scalar_one()
+    logger.info(f"🗂️ Fetch queue for {day}: {pending} pending tasks")
+    return pending
+
+
+def _claim_products(db: Session, worker_id: str, limit: int = 10, lease_seconds: int = None,
+                    day: date = None) -> list[Product]:
+    day = day or date.today()
+    lease_seconds = lease_seconds or Config.FETCH_LEASE_SECONDS
+    if Config.FETCH_DAILY_BUDGET:
+        # 鎖住當天的 budget 計數：同時 claim 的 process 在這裡排隊，領取與扣額度在同一個 transaction
+        used = _lock_fetch_budget(db, day)
+        limit = min(limit, Config.FETCH_DAILY_BUDGET - used)
+        if limit <= 0:
+            db.commit()
+            return []
+    now = _utcnow()
+    claimable = (
+        select(ProductFetchTask.product_id)
+        .where(
+            ProductFetchTask.work_date == day,
+            or_(
+                ProductFetchTask.status == ProductFetchTask.STATUS_PENDING,
+                and_(ProductFetchTask.status == ProductFetchTask.STATUS_FAILED,
+                     ProductFetchTask.next_attempt_at <= now),
+                and_(ProductFetchTask.status == ProductFetchTask.STATUS_LEASED,
+                     ProductFetchTask.lease_expires_at < now),
+            ),
+        )
+        .order_by(ProductFetchTask.priority.desc(), ProductFetchTask.product_id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(ProductFetchTask)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.product_id.in_(claimable.scalar_subquery()))
+        .values(
+            status=ProductFetchTask.STATUS_LEASED,
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=ProductFetchTask.attempts + 1,
+        )
+        .returning(ProductFetchTask.product_id)
+    )
+    try:
+        product_ids = db.execute(stmt).scalars().all()
+        if Config.FETCH_DAILY_BUDGET and product_ids:
+            db.execute(update(FetchBudget).where(FetchBudget.work_date == day)
+                       .values(used=FetchBudget.used + len(product_ids)))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error claiming fetch tasks for {worker_id}: {e}", exc_info=True)
+        raise
+    products = _get_products_by_ids(db, product_ids)
+    if products:
+        logger.debug(f"🔒 {worker_id} claimed {len(products)} fetch tasks for {day}")
+    return products
+
+
+def _prioritize_fetch_queue(db: Session, day: date = None) -> int:
+    """依 scheduler 的分數更新 day 還沒完成的 task 的 priority，回傳更新筆數"""
+    day = day or date.today()
+    scores = scheduler.priorities(db, day)
+    task_ids = db.execute(
+        select(ProductFetchTask.product_id)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.status.in_([ProductFetchTask.STATUS_PENDING, ProductFetchTask.STATUS_FAILED]))
+    ).scalars().all()
+    rows = [{'work_date': day, 'product_id': pid, 'priority': scores.get(pid, 0.0)} for pid in task_ids]
+    try:
+        for chunk in _chunked(rows, Config.DB_FLUSH_SIZE):
+            db.execute(update(ProductFetchTask), chunk)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error prioritizing fetch queue for {day}: {e}", exc_info=True)
+        raise
+    logger.info(f"🧭 Prioritized {len(rows)} fetch tasks for {day}")
+    return len(rows)
+
+
+def _lock_fetch_budget(db: Session, day: date) -> int:
+    """
+    取得並鎖住 day 的 budget 計數（沒有就建立），回傳已使用的數量。
+    用 no-op UPDATE 上鎖：Postgres 鎖住這一列，SQLite 則是取得寫入鎖，直到 transaction 結束。
+    """
+    db.execute(_dialect_insert(db, FetchBudget).values(work_date=day, used=0)
+               .on_conflict_do_nothing(index_elements=['work_date']))
+    return db.execute(
+        update(FetchBudget)
+        .where(FetchBudget.work_date == day)
+        .values(used=FetchBudget.used)
+        .returning(FetchBudget.used)
+    ).scalar_one()
+
+
+def _fetch_budget_left(db: Session, day: date = None) -> Optional[int]:
+    """FETCH_DAILY_BUDGET 還剩幾次 page load（fetch_budget 當天的計數）；沒有設定時回傳 None"""
+    if not Config.FETCH_DAILY_BUDGET:
+        return None
+    day = day or date.today()
+    used = db.execute(
+        select(FetchBudget.used).where(FetchBudget.work_date == day)
+    ).scalar_one_or_none() or 0
+    return max(0, Config.FETCH_DAILY_BUDGET - used)
+
+
+def _renew_leases(db: Session, worker_id: str, lease_seconds: int = None, day: date = None) -> int:
+    day = day or date.today()
+    lease_seconds = lease_seconds or Config.FETCH_LEASE_SECONDS
+    result = db.execute(
+        update(ProductFetchTask)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.lease_owner == worker_id,
+               ProductFetchTask.status == ProductFetchTask.STATUS_LEASED)
+        .values(lease_expires_at=_utcnow() + timedelta(seconds=lease_seconds))
+    )
+    db.commit()
+    return result.rowcount
+
+
+def _fail_fetch_tasks(db: Session, failures: Union[Dict[int, str], Iterable[int]], day: date = None) -> dict:
+    day = day or date.today()
+    if not isinstance(failures, dict):
+        failures = dict.fromkeys(failures)
+    counts = {'retry': 0, 'dead': 0}
+    if not failures:
+        return counts
+
+    now = _utcnow()
+    attempts = dict(db.execute(
+        select(ProductFetchTask.product_id, ProductFetchTask.attempts)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.product_id.in_(list(failures)))
+    ).all())
+    rows = []
+    for product_id, attempt in attempts.items():
+        error = failures[product_id]
+        row = {
+            'work_date': day,
+            'product_id': product_id,
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'last_error': error[:255] if error else None,
+        }
+        if attempt >= Config.FETCH_MAX_ATTEMPTS:
+            row.update(status=ProductFetchTask.STATUS_DEAD, next_attempt_at=None)
+            counts['dead'] += 1
+        else:
+            row.update(status=ProductFetchTask.STATUS_FAILED,
+                       next_attempt_at=now + timedelta(seconds=retry_delay(attempt)))
+            counts['retry'] += 1
+        rows.append(row)
+    try:
+        db.execute(update(ProductFetchTask), rows)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error recording {len(rows)} failed fetch tasks: {e}", exc_info=True)
+        raise
+    if counts['dead']:
+        logger.warning(f"☠️ {counts['dead']} fetch tasks gave up after {Config.FETCH_MAX_ATTEMPTS} attempts")
+    return counts
+
+
+def _next_fetch_retry_at(db: Session, day: date = None) -> Optional[datetime]:
+    day = day or date.today()
+    return db.execute(
+        select(func.min(ProductFetchTask.next_attempt_at))
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.status == ProductFetchTask.STATUS_FAILED)
+    ).scalar_one()
+
+
+def _get_fetch_queue_counts(db: Session, day: date = None) -> dict:
+    day = day or date.today()
+    return dict(db.execute(
+        select(ProductFetchTask.status, func.count())
+        .where(ProductFetchTask.work_date == day)
+        .group_by(ProductFetchTask.status)
+    ).all())
+
+
+def _release_leases(db: Session, worker_id: str, day: date = None) -> int:
+    day = day or date.today()
+    result = db.execute(
+        update(ProductFetchTask)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.lease_owner == worker_id,
+               ProductFetchTask.status == ProductFetchTask.STATUS_LEASED)
+        .values(status=ProductFetchTask.STATUS_PENDING, lease_owner=None, lease_expires_at=None)
+    )
+    db.commit()
+    if result.rowcount:
+        logger.info(f"🔓 {worker_id} released {result.rowcount} unfinished leases")
+    return result.rowcount
+
+
+def _set_fetch_task_status(db: Session, product_ids: Iterable[int], status: str, day: date = None) -> int:
+    day = day or date.today()
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    result = db.execute(
+        update(ProductFetchTask)
+        .where(ProductFetchTask.work_date == day,
+               ProductFetchTask.product_id.in_(product_ids))
+        .values(status=status, lease_owner=None, lease_expires_at=None)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def _get_prices_on(db: Session, day: date, product_ids: Iterable[int] = None, mode: str = None) -> Dict[int, Decimal]:
+    """{product_id: day 當天的價格}（day 之前最後一次記錄的價格）；兩種儲存方式結果相同"""
+    if storage_mode(mode) == MODE_CHANGES:
+        stmt = select(ProductPriceSpan.product_id, ProductPriceSpan.price).where(
+            ProductPriceSpan.valid_from <= day,
+            or_(ProductPriceSpan.valid_to.is_(None), ProductPriceSpan.valid_to > day),
+        )
+        if product_ids is not None:
+            stmt = stmt.where(ProductPriceSpan.product_id.in_(list(product_ids)))
+    else:
+        last_day = select(ProductPriceHistory.product_id, func.max(ProductPriceHistory.created_at).label('created_at'))
+        last_day = last_day.where(ProductPriceHistory.created_at <= day)
+        if product_ids is not None:
+            last_day = last_day.where(ProductPriceHistory.product_id.in_(list(product_ids)))
+        last_day = last_day.group_by(ProductPriceHistory.product_id).subquery()
+        stmt = select(ProductPriceHistory.product_id, ProductPriceHistory.price).join(
+            last_day,
+            and_(ProductPriceHistory.product_id == last_day.c.product_id,
+                 ProductPriceHistory.created_at == last_day.c.created_at),
+        )
+    return {pid: to_price(price) for pid, price in db.execute(stmt).all()}
+
+
+def _get_price_series(db: Session, product_id: int, start: date, end: date,
+                      mode: str = None) -> List[Tuple[date, Decimal]]:
+    if storage_mode(mode) == MODE_CHANGES:
+        points = db.execute(
+            select(ProductPriceSpan.valid_from, ProductPriceSpan.price)
+            .where(ProductPriceSpan.product_id == product_id,
+                   ProductPriceSpan.valid_from <= end,
+                   or_(ProductPriceSpan.valid_to.is_(None), ProductPriceSpan.valid_to > start))
+            .order_by(ProductPriceSpan.valid_from)
+        ).all()
+    else:
+        points = list(db.execute(
+            select(ProductPriceHistory.created_at, ProductPriceHistory.price)
+            .where(ProductPriceHistory.product_id == product_id,
+                   ProductPriceHistory.created_at > start,
+                   ProductPriceHistory.created_at <= end)
+            .order_by(ProductPriceHistory.created_at)
+        ).all())
+        first = _get_prices_on(db, start, [product_id], mode).get(product_id)
+        if first is not None:
+            points.insert(0, (start, first))
+    return price_spans.expand_series([(day, to_price(price)) for day, price in points], start, end)
+
+
+def _backfill_price_spans(db: Session, chunk_size: int = None) -> dict:
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_ROWS
+    stmt = (
+        select(ProductPriceHistory.product_id, ProductPriceHistory.price, ProductPriceHistory.created_at)
+        .order_by(ProductPriceHistory.product_id, ProductPriceHistory.created_at)
+        .execution_options(yield_per=chunk_size)
+    )
+    history_rows = spans = 0
+
+    def observations():
+        nonlocal history_rows
+        for partition in db.execute(stmt).partitions():
+            history_rows += len(partition)
+            yield from partition
+
+    try:
+        # 整個重建在同一個 transaction：失敗時保留原本的 span
+        db.execute(delete(ProductPriceSpan))
+        batch = []
+        for span in price_spans.build_spans(observations()):
+            batch.append(span)
+            if len(batch) >= chunk_size:
+                db.execute(insert(ProductPriceSpan), batch)
+                spans += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(ProductPriceSpan), batch)
+            spans += len(batch)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error backfilling price spans: {e}", exc_info=True)
+        raise
+    finally:
+        price_spans.reset_price_indexes()
+    return {'history_rows': history_rows, 'spans': spans}
+
+
 class ProductRepository:
     def __init__(
         self,
         sync_session_factory: Callable[[], Session],
-        async_session_factory: Callable[[], AsyncSession],
+        async_session_factory: Callable[[], 'AsyncSession'],
     ):
         self._sync_session_factory = sync_session_factory
         self._async_session_factory = async_session_factory
 
 
     @staticmethod
-    def init_db():
+    def init_db(bind=None):
         """
         初始化資料庫（建立資料表），只需執行一次。
+        bind: 可指定其他 engine（例如 benchmark 用的 SQLite），預設為 sync engine。
         """
         try:
-            Base.metadata.create_all(bind=engine)
+            Base.metadata.create_all(bind=bind or get_engine())
             logger.info("✅ Database initialized successfully.")
         except Exception as e:
             logger.exception(f"❌ Failed to initialize DB: {e}")
@@ -58,58 +739,42 @@ class ProductRepository:
         finally:
             db.close()
 
-    async def get_session_async(self) -> AsyncGenerator[AsyncSession, None]:
+    @asynccontextmanager
+    async def get_session_async(self) -> AsyncGenerator['AsyncSession', None]:
         async with self._async_session_factory() as session:
             yield session
-            
-    def get_product_random(self, limit: int = 10) -> list[Product]:
-        """
-        隨機取得指定數量的產品，條件為今天尚未有任何價格歷史記錄（sync 版本）。
-        """
-        today = date.today()
+
+    def _run(self, fn: Callable, *args):
+        """fn(db, ...) 在一個 sync session 上執行"""
         with self.get_session() as db:
-            subq = (
-                db.query(ProductPriceHistory)
-                .filter(
-                    ProductPriceHistory.product_id == Product.id,
-                    func.date(ProductPriceHistory.created_at) == today
-                )
-            )
-            products = (
-                db.query(Product)
-                .filter(~subq.exists())
-                .order_by(func.random())
-                .limit(limit)
-                .all()
-            )
-            logger.debug(f"📦 [SYNC] Fetched {len(products)} random products without price history on {today}")
-            return products
+            return fn(db, *args)
 
+    async def _run_async(self, fn: Callable, *args):
+        """
+        同一個 fn(db, ...) 改在 AsyncSession 上執行（run_sync：SQL 由 async driver 送出，等 DB 時 event loop 照常運作）。
+        沒有 async session factory（例如 benchmark 的 SQLite）時退回 thread pool，一樣不阻塞 event loop。
+        """
+        if self._async_session_factory is None:
+            return await asyncio.to_thread(self._run, fn, *args)
+        async with self.get_session_async() as db:
+            return await db.run_sync(fn, *args)
+            
     async def get_product_random_async(self, limit: int = 10) -> list[Product]:
         """
         隨機取得指定數量的產品，條件為今天尚未有任何價格歷史記錄（async 版本）。
         """
         today = date.today()
         async with self.get_session_async() as session:
-            subq = (
-                select(ProductPriceHistory.product_id)
-                .where(
-                    ProductPriceHistory.product_id == Product.id,
-                    func.date(ProductPriceHistory.created_at) == today
-                )
-            )
-
-            stmt = (
-                select(Product)
-                .where(~subq.exists())
-                .order_by(func.random())
-                .limit(limit)
-            )
-            result = await session.execute(stmt)
-            products = result.scalars().all()
+            bounds = (await session.execute(select(func.min(Product.id), func.max(Product.id)))).one()
+            products = []
+            for stmt in _keyset_claim_stmts(bounds, today, limit):
+                stmt = stmt.limit(limit - len(products))
+                products.extend((await session.execute(stmt)).scalars().all())
+                if len(products) >= limit:
+                    break
             logger.debug(f"📦 [ASYNC] Fetched {len(products)} random products without price history on {today}")
             return products
-        
+
     def insert_new_products(self, products: List[Product]):
         """
         只將資料庫中還沒有的 products（用 url 驗證）插入；
@@ -190,6 +855,21 @@ class ProductRepository:
 
 
 
+    def upsert_listing_products(self, products: List[Product], category: str = None, day: date = None) -> dict:
+        """
+        列表頁一頁的 products 直接 upsert（INSERT ... ON CONFLICT (url) DO UPDATE），
+        並記下每個 product 今天的列表價格（同一天已有價格的略過；價格沒變的也記，明細 fetch 不必再排它）。
+        整頁一個 transaction。回傳 {'inserted', 'updated', 'price_changes', 'skipped'}，
+        price_changes 是與最後一筆價格不同（或還沒有價格）的數量。
+        day：價格歷史與 updated_at 的日期（預設今天；scraper.reparse 重新匯入舊的 run 時指定）。
+        """
+        return self._run(_upsert_listing_products, products, category, day)
+
+    async def upsert_listing_products_async(self, products: List[Product], category: str = None,
+                                            day: date = None) -> dict:
+        """upsert_listing_products 的 async 版本"""
+        return await self._run_async(_upsert_listing_products, products, category, day)
+
     def get_products_missing_sku_or_location(self) -> list[Product]:
         """
         Retrieve all products where sku 或 location 欄位為 NULL。
@@ -209,49 +889,100 @@ class ProductRepository:
             logger.debug(f"Fetched {len(products)} products from DB")
             return products
 
+    def iter_products(self, chunk_size: int = None) -> Iterator[ProductRow]:
+        """fetch_all_products 的串流版：依 id 順序 yield ProductRow，不會一次把整個 catalogue 載入記憶體"""
+        with self.get_session() as db:
+            yield from _iter_product_rows(db, chunk_size=chunk_size)
+
+    def iter_products_missing_sku_or_location(self, chunk_size: int = None) -> Iterator[ProductRow]:
+        """get_products_missing_sku_or_location 的串流版"""
+        with self.get_session() as db:
+            yield from _iter_product_rows(db, or_(Product.sku.is_(None), Product.location.is_(None)),
+                                          chunk_size=chunk_size)
+
+    def iter_products_without_price_on(self, day: date = None, chunk_size: int = None) -> Iterator[ProductRow]:
+        """get_product_without_today_price_record 的串流版：day（預設今天）還沒有價格的 products"""
+        with self.get_session() as db:
+            yield from _iter_product_rows(db, ~_priced_on(day or date.today()), chunk_size=chunk_size)
+
     def update_product(self, prod, sku: str = None, location: str = None):
-        """更新 product 的 sku 與 location 欄位"""
+        """
+        更新 product 的 sku 與 location 欄位（只覆蓋有給值的欄位）。
+        prod 可以是 Product、ProductRow 或 product id：依 id 下 UPDATE，不必把 detached 的 ORM 物件 add 回 session。
+        """
+        product_id = prod if isinstance(prod, int) else prod.id
+        values = {'updated_at': func.current_date()}
+        if sku:
+            values['sku'] = sku
+        if location:
+            values['location'] = location
         with self.get_session() as db:
+            db.execute(update(Product).where(Product.id == product_id).values(**values))
+            db.commit()
+        if isinstance(prod, Product):
+            # 呼叫端手上的物件跟著更新（updated_at 由 DB 決定，不回填）
             if sku:
                 prod.sku = sku
             if location:
                 prod.location = location
-            prod.updated_at = func.current_date()
-            db.add(prod)
-            db.commit()
-            logger.debug(f"Updated product {prod.id}: sku={sku}, location={location}")
+        logger.debug(f"Updated product {product_id}: sku={sku}, location={location}")
 
 
     def insert_price_history(self, product_id: int, price: float):
-        """新增一筆 ProductPriceHistory 紀錄"""
+        """新增今天的一筆價格紀錄（依 PRICE_STORAGE_MODE）"""
         with self.get_session() as db:
-            record = ProductPriceHistory(
-                product_id=product_id,
-                price=price,
-                created_at=date.today()
-            )
-            db.add(record)
+            _write_price_rows(db, [{'product_id': product_id, 'price': price, 'created_at': date.today()}])
             db.commit()
             logger.debug(f"Inserted price history for product {product_id}: {price}")
 
-    def get_product_random(self, limit: int = 10) -> list[Product]:
+    def insert_price_histories(self, rows: Iterable[dict], flush_size: int = None) -> int:
+        """
+        批次新增 ProductPriceHistory（multi-row INSERT），每 flush_size 筆 commit 一次。
+        rows: [{'product_id': 1, 'price': 9.99}, ...]，沒給 created_at 則用今天。
+        同一 product 同一天已有紀錄的會被略過（ON CONFLICT DO NOTHING）。
+        回傳送出的筆數。
+        """
+        return self._run(_insert_price_histories, rows, flush_size)
+
+    async def insert_price_histories_async(self, rows: Iterable[dict], flush_size: int = None) -> int:
+        """insert_price_histories 的 async 版本"""
+        return await self._run_async(_insert_price_histories, rows, flush_size)
+
+    def update_products_bulk(self, rows: Iterable[dict], flush_size: int = None) -> int:
+        """
+        批次更新 product 的 sku 與 location（以 primary key 做 executemany UPDATE）。
+        rows: [{'id': 1, 'sku': '...', 'location': '...'}, ...]
+        回傳更新筆數。
+        """
+        return self._run(_update_products_bulk, rows, flush_size)
+
+    async def update_products_bulk_async(self, rows: Iterable[dict], flush_size: int = None) -> int:
+        """update_products_bulk 的 async 版本"""
+        return await self._run_async(_update_products_bulk, rows, flush_size)
+
+    def get_products_by_ids(self, product_ids: Iterable[int]) -> list[Product]:
+        """依 id 取得 products（依 id 排序）"""
+        return self._run(_get_products_by_ids, product_ids)
+
+    async def get_products_by_ids_async(self, product_ids: Iterable[int]) -> list[Product]:
+        """get_products_by_ids 的 async 版本"""
+        return await self._run_async(_get_products_by_ids, product_ids)
+
+    def get_product_random(self, limit: int = 10, exclude_ids: Iterable[int] = ()) -> list[Product]:
         """
         隨機取得指定數量的產品，條件為今天尚未有任何價格歷史記錄。
+        不做 ORDER BY random() 全表排序：從隨機的 id 起點沿 primary key 往後取（不夠再從頭繞回來）。
+        exclude_ids: 已在處理中（例如還在 write buffer 未 flush）的 product id，不要再選到。
         """
         with self.get_session() as db:
             today = date.today()
-            # 子查詢：檢查當日是否已有價格歷史
-            subq = db.query(ProductPriceHistory).filter(
-                ProductPriceHistory.product_id == Product.id,
-                func.date(ProductPriceHistory.created_at) == today
-            )
-            products = (
-                db.query(Product)
-                .filter(~subq.exists())
-                .order_by(func.random())
-                .limit(limit)
-                .all()
-            )
+            bounds = db.execute(select(func.min(Product.id), func.max(Product.id))).one()
+            products = []
+            for stmt in _keyset_claim_stmts(bounds, today, limit, exclude_ids):
+                stmt = stmt.limit(limit - len(products))
+                products.extend(db.execute(stmt).scalars().all())
+                if len(products) >= limit:
+                    break
             logger.debug(f"Fetched {len(products)} random products without price history on {today}")
             return products
         
@@ -261,14 +992,9 @@ class ProductRepository:
         """
         with self.get_session() as db:
             today = date.today()
-            # 建立 correlated EXISTS 子查詢
-            history_exists = exists().where(
-                (ProductPriceHistory.product_id == Product.id) &
-                (func.date(ProductPriceHistory.created_at) == today)
-            )
             products = (
                 db.query(Product)
-                .filter(~history_exists)
+                .filter(~_priced_on(today))
                 .all()
             )
             logger.debug(f"Fetched {len(products)} random products without price history on {today}")
@@ -276,6 +1002,279 @@ class ProductRepository:
 
 
 
+    # ------------------------------------------------------------------
+    # 多 process 共用的每日 work queue（product_fetch_queue）
+    # ------------------------------------------------------------------
+    def seed_fetch_queue(self, day: date = None) -> int:
+        """
+        把 day（預設今天）還沒有價格、或還缺 sku / location 的 product 放進 work queue（已存在的略過），
+        回傳目前 pending 的數量。
+        failed 的 task 保留原本的 next_attempt_at，到時間才會被 claim_products 領走。
+        FETCH_SCHEDULER=priority 時，有新增 task 就用 scraper.scheduler 重新計算 priority。
+        多個 process 同時呼叫也安全。
+        """
+        return self._run(_seed_fetch_queue, day)
+
+    async def seed_fetch_queue_async(self, day: date = None) -> int:
+        """seed_fetch_queue 的 async 版本"""
+        return await self._run_async(_seed_fetch_queue, day)
+
+    def claim_products(self, worker_id: str, limit: int = 10, lease_seconds: int = None,
+                       day: date = None) -> list[Product]:
+        """
+        為 worker_id 領取最多 limit 個 task（pending、已到重試時間的 failed、或 lease 已過期的），
+        並回傳對應的 Product。依 priority 由高到低領取（所有 worker / process 共用同一個順序）；
+        FETCH_DAILY_BUDGET 用完後回傳空 list，領取與扣除 budget 在同一個 transaction。
+        Postgres 上用 FOR UPDATE SKIP LOCKED，同時領取的 process 不會拿到同一個 product。
+        """
+        return self._run(_claim_products, worker_id, limit, lease_seconds, day)
+
+    async def claim_products_async(self, worker_id: str, limit: int = 10, lease_seconds: int = None,
+                                   day: date = None) -> list[Product]:
+        """claim_products 的 async 版本"""
+        return await self._run_async(_claim_products, worker_id, limit, lease_seconds, day)
+
+    def prioritize_fetch_queue(self, day: date = None) -> int:
+        """重新計算 day 還沒完成的 task 的 priority（例如調整 SCHEDULER_* 設定之後），回傳更新筆數"""
+        return self._run(_prioritize_fetch_queue, day)
+
+    def get_fetch_budget_left(self, day: date = None) -> Optional[int]:
+        """FETCH_DAILY_BUDGET 今天還剩幾次 page load；沒有設定 budget 時回傳 None"""
+        return self._run(_fetch_budget_left, day)
+
+    async def get_fetch_budget_left_async(self, day: date = None) -> Optional[int]:
+        """get_fetch_budget_left 的 async 版本"""
+        return await self._run_async(_fetch_budget_left, day)
+
+    def renew_leases(self, worker_id: str, lease_seconds: int = None, day: date = None) -> int:
+        """延長 worker_id 目前持有的所有 lease，回傳延長的數量"""
+        return self._run(_renew_leases, worker_id, lease_seconds, day)
+
+    async def renew_leases_async(self, worker_id: str, lease_seconds: int = None, day: date = None) -> int:
+        """renew_leases 的 async 版本"""
+        return await self._run_async(_renew_leases, worker_id, lease_seconds, day)
+
+    def complete_fetch_tasks(self, product_ids: Iterable[int], day: date = None) -> int:
+        """價格已寫入 DB 的 task 標記為 done"""
+        return self._run(_set_fetch_task_status, product_ids, ProductFetchTask.STATUS_DONE, day)
+
+    async def complete_fetch_tasks_async(self, product_ids: Iterable[int], day: date = None) -> int:
+        """complete_fetch_tasks 的 async 版本"""
+        return await self._run_async(_set_fetch_task_status, product_ids, ProductFetchTask.STATUS_DONE, day)
+
+    def fail_fetch_tasks(self, failures: Union[Dict[int, str], Iterable[int]], day: date = None) -> dict:
+        """
+        抓取失敗的 task：failures 為 {product_id: 錯誤訊息}（或只有 product_id）。
+        attempts 未達 FETCH_MAX_ATTEMPTS 的標記為 failed 並排定 next_attempt_at（exponential backoff），
+        其餘標記為 dead。回傳 {'retry': 數量, 'dead': 數量}。
+        """
+        return self._run(_fail_fetch_tasks, failures, day)
+
+    async def fail_fetch_tasks_async(self, failures: Union[Dict[int, str], Iterable[int]],
+                                     day: date = None) -> dict:
+        """fail_fetch_tasks 的 async 版本"""
+        return await self._run_async(_fail_fetch_tasks, failures, day)
+
+    def next_fetch_retry_at(self, day: date = None) -> Optional[datetime]:
+        """最早一個 failed task 的重試時間（UTC）；沒有等待重試的 task 時回傳 None"""
+        return self._run(_next_fetch_retry_at, day)
+
+    async def next_fetch_retry_at_async(self, day: date = None) -> Optional[datetime]:
+        """next_fetch_retry_at 的 async 版本"""
+        return await self._run_async(_next_fetch_retry_at, day)
+
+    def get_fetch_queue_counts(self, day: date = None) -> dict:
+        """day 的 work queue 各狀態的數量，例如 {'done': 950, 'failed': 3, 'dead': 1}"""
+        return self._run(_get_fetch_queue_counts, day)
+
+    async def get_fetch_queue_counts_async(self, day: date = None) -> dict:
+        """get_fetch_queue_counts 的 async 版本"""
+        return await self._run_async(_get_fetch_queue_counts, day)
+
+    def release_leases(self, worker_id: str, day: date = None) -> int:
+        """worker 結束時把還持有、尚未完成的 lease 放回 pending，讓其他 worker 馬上可以接手"""
+        return self._run(_release_leases, worker_id, day)
+
+    async def release_leases_async(self, worker_id: str, day: date = None) -> int:
+        """release_leases 的 async 版本"""
+        return await self._run_async(_release_leases, worker_id, day)
+
+    # ------------------------------------------------------------------
+    # 任一天的價格（daily / changes 兩種儲存方式）
+    # ------------------------------------------------------------------
+    def get_prices_on(self, day: date, product_ids: Iterable[int] = None, mode: str = None) -> Dict[int, Decimal]:
+        """
+        {product_id: day 當天的價格}，也就是 day（含）之前最後一次記錄的價格；還沒有價格的 product 不列出。
+        mode 預設為 PRICE_STORAGE_MODE，指定 daily / changes 可讀另一種儲存方式（例如 backfill 後比對）。
+        """
+        return self._run(_get_prices_on, day, product_ids, mode)
+
+    async def get_prices_on_async(self, day: date, product_ids: Iterable[int] = None,
+                                  mode: str = None) -> Dict[int, Decimal]:
+        """get_prices_on 的 async 版本"""
+        return await self._run_async(_get_prices_on, day, product_ids, mode)
+
+    def get_price_series(self, product_id: int, start: date, end: date = None,
+                         mode: str = None) -> List[Tuple[date, Decimal]]:
+        """product 在 start..end（預設今天）每一天的價格 [(日期, 價格)]；沒有記錄的日子沿用前一個價格"""
+        return self._run(_get_price_series, product_id, start, end or date.today(), mode)
+
+    def backfill_price_spans(self, chunk_size: int = None) -> dict:
+        """
+        從 product_price_history 重建整張 product_price_span（切換到 PRICE_STORAGE_MODE=changes 前執行一次）。
+        依 (product_id, created_at) 串流，連續相同價格合併成一段。product_price_history 保留不動。
+        回傳 {'history_rows', 'spans'}。
+        """
+        started = time.perf_counter()
+        stats = self._run(_backfill_price_spans, chunk_size)
+        ratio = stats['history_rows'] / stats['spans'] if stats['spans'] else 0
+        logger.info(
+            f"🧮 Backfilled {stats['spans']} price spans from {stats['history_rows']} daily rows "
+            f"(x{ratio:.1f} fewer rows) in {time.perf_counter() - started:.1f}s"
+        )
+        return stats
+
+    # ------------------------------------------------------------------
+    # 分析用的匯出（scraper.export_parquet）
+    # ------------------------------------------------------------------
+    def iter_price_history_export(self, after_id: int = 0, chunk_size: int = None) -> Iterator[List[dict]]:
+        """
+        依 id 順序串流 id > after_id 的價格歷史（join products），每次 yield 最多 chunk_size 筆 dict。
+        用 yield_per（Postgres 上是 server-side cursor），不會一次把整張表載入記憶體。
+        """
+        chunk_size = chunk_size or Config.EXPORT_CHUNK_ROWS
+        stmt = (
+            select(
+                ProductPriceHistory.id.label('history_id'),
+                ProductPriceHistory.product_id,
+                ProductPriceHistory.price,
+                ProductPriceHistory.created_at.label('price_date'),
+                Product.name,
+                Product.unit,
+                Product.category,
+                Product.sku,
+            )
+            .join(Product, Product.id == ProductPriceHistory.product_id)
+            .where(ProductPriceHistory.id > after_id)
+            .order_by(ProductPriceHistory.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        with self.get_session() as db:
+            for rows in db.execute(stmt).mappings().partitions():
+                yield [dict(row) for row in rows]
+
+    def iter_price_span_export(self, start: date = None, end: date = None,
+                               chunk_size: int = None) -> Iterator[List[dict]]:
+        """
+        changes 模式的 iter_price_history_export：把涵蓋 start（預設最早的價格）..end（預設今天）的
+        product_price_span 用 expand_series 展開成每天一筆（欄位相同，history_id 為 None），
+        依 product_id 順序每次 yield 約 chunk_size 筆。
+        每個 product 只展開到最後一次確認價格的日期（checked_at），之後沒再看到的日子不列出。
+        """
+        chunk_size = chunk_size or Config.EXPORT_CHUNK_ROWS
+        end = end or date.today()
+        if start is None:
+            with self.get_session() as db:
+                start = db.execute(select(func.min(ProductPriceSpan.valid_from))).scalar_one()
+            if start is None:
+                return
+        stmt = (
+            select(
+                ProductPriceSpan.product_id,
+                ProductPriceSpan.price,
+                ProductPriceSpan.valid_from,
+                ProductPriceSpan.checked_at,
+                Product.name,
+                Product.unit,
+                Product.category,
+                Product.sku,
+            )
+            .join(Product, Product.id == ProductPriceSpan.product_id)
+            .where(ProductPriceSpan.valid_from <= end,
+                   or_(ProductPriceSpan.valid_to.is_(None), ProductPriceSpan.valid_to > start))
+            .order_by(ProductPriceSpan.product_id, ProductPriceSpan.valid_from)
+            .execution_options(yield_per=chunk_size)
+        )
+
+        def expand(spans: List) -> List[dict]:
+            last_checked = min(end, max(span.checked_at for span in spans))
+            points = [(span.valid_from, span.price) for span in spans]
+            product = spans[-1]
+            return [
+                {'history_id': None, 'product_id': product.product_id, 'price': price, 'price_date': day,
+                 'name': product.name, 'unit': product.unit, 'category': product.category, 'sku': product.sku}
+                for day, price in price_spans.expand_series(points, start, last_checked)
+            ]
+
+        rows, spans = [], []
+        with self.get_session() as db:
+            for span in db.execute(stmt):
+                if spans and span.product_id != spans[-1].product_id:
+                    rows.extend(expand(spans))
+                    spans = []
+                    if len(rows) >= chunk_size:
+                        yield rows
+                        rows = []
+                spans.append(span)
+        if spans:
+            rows.extend(expand(spans))
+        if rows:
+            yield rows
+
+    # ------------------------------------------------------------------
+    # 列表 crawl 的 checkpoint（crawl_checkpoint）
+    # ------------------------------------------------------------------
+    def get_crawl_checkpoints(self, run_id: str) -> Dict[str, CrawlCheckpoint]:
+        """run_id 所有類別的 checkpoint：{category: CrawlCheckpoint}"""
+        with self.get_session() as db:
+            rows = db.execute(
+                select(CrawlCheckpoint).where(CrawlCheckpoint.run_id == run_id)
+            ).scalars().all()
+            return {row.category: row for row in rows}
+
+    def save_crawl_checkpoint(self, run_id: str, category: str, last_page: int, products: int,
+                              total_pages: int = None, status: str = CrawlCheckpoint.STATUS_RUNNING) -> None:
+        """寫入（或覆蓋）一個類別的 checkpoint；total_pages 為 None 時保留原本的值"""
+        row = {
+            'run_id': run_id,
+            'category': category,
+            'last_page': last_page,
+            'total_pages': total_pages,
+            'products': products,
+            'status': status,
+            'updated_at': _utcnow(),
+        }
+        with self.get_session() as db:
+            stmt = _dialect_insert(db, CrawlCheckpoint)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['run_id', 'category'],
+                set_={
+                    'last_page': stmt.excluded.last_page,
+                    'total_pages': func.coalesce(stmt.excluded.total_pages, CrawlCheckpoint.total_pages),
+                    'products': stmt.excluded.products,
+                    'status': stmt.excluded.status,
+                    'updated_at': stmt.excluded.updated_at,
+                },
+            )
+            try:
+                db.execute(stmt, [row])
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"Error saving crawl checkpoint {run_id}/{category}: {e}", exc_info=True)
+                raise
+
+    def reset_crawl_checkpoints(self, run_id: str, categories: Iterable[str]) -> int:
+        """不是 resume 的新執行：清掉這些類別在 run_id 底下的舊進度"""
+        with self.get_session() as db:
+            result = db.execute(
+                delete(CrawlCheckpoint)
+                .where(CrawlCheckpoint.run_id == run_id, CrawlCheckpoint.category.in_(list(categories)))
+            )
+            db.commit()
+            return result.rowcount
+
+
 # ----------------------------------
 ## main entry point
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 # repository_factory.py
 
 from .product_repo import ProductRepository
-from .sync_engine import SessionLocal
-from .async_engine import AsyncSessionLocal
+from .sync_engine import new_session
+from .async_engine import new_async_session
 
 def get_product_repo() -> ProductRepository:
-    return ProductRepository(sync_session_factory=SessionLocal, async_session_factory=AsyncSessionLocal)
+    # 建立 repository 不會連 DB：engine 在第一次開 session 時才建立
+    return ProductRepository(sync_session_factory=new_session, async_session_factory=new_async_session)
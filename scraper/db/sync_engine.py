@@ -1,7 +1,49 @@
 # db/sync_engine.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+# engine / sessionmaker 在第一次使用時才建立：只 import model、不連 DB 的指令（--help、匯出檔案分析、
+# orchestrator 主 process）不必載入 DB driver。舊的 `from scraper.db.sync_engine import engine, SessionLocal`
+# 仍可用（模組層 __getattr__），但會在 import 當下就建立 engine。
+import threading
+
+from sqlalchemy.orm import Session, sessionmaker
+
 from scraper.config import Config
+from scraper.metrics import instrument_engine
+
+_engine = None
+_session_factory = None
+_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine, _session_factory
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, pool_size=5)
+                instrument_engine(engine)
+                _session_factory = sessionmaker(bind=engine, autoflush=True, autocommit=False)
+                _engine = engine
+    return _engine
+
+
+def get_sessionmaker() -> sessionmaker:
+    get_engine()
+    return _session_factory
+
+
+def new_session() -> Session:
+    """repository 的 sync_session_factory：第一次呼叫時才建立 engine"""
+    return get_sessionmaker()()
+
+
+def engine_created() -> bool:
+    return _engine is not None
+
 
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, pool_size=5)
-SessionLocal = sessionmaker(bind=engine,autoflush=True, autocommit=False)
+def __getattr__(name):
+    if name == 'engine':
+        return get_engine()
+    if name == 'SessionLocal':
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,136 @@
+# db/write_buffer.py
+import logging
+from collections import Counter
+from typing import Dict, List
+
+from scraper.config import Config
+from scraper.logger_setup import get_logger
+from scraper.metrics import timed
+
+logger = get_logger(__name__, log_file="logs/db_logger.log", level=logging.DEBUG)
+
+
+class PriceWriteBuffer:
+    """
+    暫存 fetch_product_detail 的結果，累積到 flush_size 筆再一次寫入 DB，
+    取代每個 product 各自開 session + commit。
+    complete_tasks=True 時，寫入後順便把對應的 product_fetch_queue task 標記為 done
+    （先寫價格再標 done：中途 crash 只會讓 lease 過期後重抓，不會漏掉價格）。
+    結果帶 unchanged=True（明細頁 cache 命中）時不更新 product，只記當天價格。
+    失敗的 product 用 add_failure 記下，flush 時一起交給 fail_fetch_tasks 排定重試（同一批的成功照常寫入）。
+    在 event loop 裡使用 add_result_async / add_failure_async / flush_async（DB 走 repo 的 *_async 方法）。
+    """
+
+    def __init__(self, repo, flush_size: int = None, complete_tasks: bool = False):
+        self.repo = repo
+        self.flush_size = flush_size or Config.DB_FLUSH_SIZE
+        self.complete_tasks = complete_tasks
+        self._prices: List[dict] = []
+        self._product_updates: List[dict] = []
+        self._completed_ids: List[int] = []
+        self._failures: Dict[int, str] = {}
+        self.total_prices = 0
+        self.total_product_updates = 0
+        self.skipped_product_updates = 0
+        self.retry_counts = Counter()  # fail_fetch_tasks 的結果：retry / dead
+
+    def __len__(self) -> int:
+        return len(self._prices) + len(self._product_updates) + len(self._failures)
+
+    def add_failure(self, prod, error: str = None) -> None:
+        """加入一筆抓取失敗的 product，滿了自動 flush"""
+        self._failures[prod.id] = error
+        if self.full:
+            self.flush()
+
+    def add_result(self, result: dict) -> None:
+        """加入一筆 fetch 結果（{'prod', 'price', 'sku', 'location'}），滿了自動 flush"""
+        self._add_result(result)
+        if self.full:
+            self.flush()
+
+    async def add_failure_async(self, prod, error: str = None) -> None:
+        """add_failure 的 async 版本：滿了用 repo 的 *_async 方法 flush，不阻塞 event loop"""
+        self._failures[prod.id] = error
+        if self.full:
+            await self.flush_async()
+
+    async def add_result_async(self, result: dict) -> None:
+        """add_result 的 async 版本"""
+        self._add_result(result)
+        if self.full:
+            await self.flush_async()
+
+    @property
+    def full(self) -> bool:
+        return len(self) >= self.flush_size
+
+    def _add_result(self, result: dict) -> None:
+        prod = result["prod"]
+        price = result["price"]
+        sku = result["sku"]
+        location = result["location"]
+
+        if price is None:
+            # 沒有價格不算抓到：不標 done，交給 fail_fetch_tasks 排定重試
+            self._failures[prod.id] = "price not parsed"
+            return
+
+        if result.get("unchanged"):
+            # 頁面跟上次抓的一樣：sku / location 上次就已經寫過了
+            self.skipped_product_updates += 1
+        elif (prod.sku is None or prod.location is None) and (sku or location):
+            # 跟 update_product 一樣：只覆蓋有抓到值的欄位
+            self._product_updates.append({
+                "id": prod.id,
+                "sku": sku or prod.sku,
+                "location": location or prod.location,
+            })
+
+        self._prices.append({"product_id": prod.id, "price": price})
+        self._completed_ids.append(prod.id)
+
+    def _take(self) -> tuple:
+        """取出目前暫存的內容並清空 buffer；async flush 寫入期間新加入的結果會留到下一批"""
+        batch = (self._product_updates, self._prices, self._completed_ids, self._failures)
+        self._product_updates, self._prices, self._completed_ids, self._failures = [], [], [], {}
+        return batch
+
+    def flush(self) -> None:
+        """把暫存的結果寫進 DB"""
+        product_updates, prices, completed_ids, failures = self._take()
+        with timed("write_buffer_flush"):
+            if product_updates:
+                self._updated(self.repo.update_products_bulk(product_updates, self.flush_size))
+            if prices:
+                self._priced(self.repo.insert_price_histories(prices, self.flush_size))
+            if completed_ids and self.complete_tasks:
+                self.repo.complete_fetch_tasks(completed_ids)
+            if failures and self.complete_tasks:
+                self._failed(len(failures), self.repo.fail_fetch_tasks(failures))
+
+    async def flush_async(self) -> None:
+        """flush 的 async 版本：寫入順序相同（先價格、再標記 task），只是 DB I/O 不佔用 event loop"""
+        product_updates, prices, completed_ids, failures = self._take()
+        with timed("write_buffer_flush"):
+            if product_updates:
+                self._updated(await self.repo.update_products_bulk_async(product_updates, self.flush_size))
+            if prices:
+                self._priced(await self.repo.insert_price_histories_async(prices, self.flush_size))
+            if completed_ids and self.complete_tasks:
+                await self.repo.complete_fetch_tasks_async(completed_ids)
+            if failures and self.complete_tasks:
+                self._failed(len(failures), await self.repo.fail_fetch_tasks_async(failures))
+
+    def _updated(self, count: int) -> None:
+        self.total_product_updates += count
+        logger.info(f"📝 Flushed {count} product sku/location updates")
+
+    def _priced(self, count: int) -> None:
+        self.total_prices += count
+        logger.info(f"💰 Flushed {count} price history rows")
+
+    def _failed(self, total: int, counts: dict) -> None:
+        self.retry_counts.update(counts)
+        logger.info(f"🔁 Recorded {total} failed fetches: "
+                    f"{counts['retry']} scheduled for retry, {counts['dead']} dead")
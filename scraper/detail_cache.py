@@ -0,0 +1,189 @@
+# detail_cache.py
+# 明細頁的本地 response cache（SQLite 檔案）：以 url 為 key 存 ETag / Last-Modified、內容 hash、
+# 壓縮後的 HTML 與上次解析出的欄位；超過容量時依最後使用時間（LRU）淘汰
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+
+from scraper.config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detail_pages (
+    url           TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    content_hash  TEXT NOT NULL,
+    body          BLOB NOT NULL,
+    size          INTEGER NOT NULL,
+    price         REAL,
+    sku           TEXT,
+    location      TEXT,
+    last_access   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_detail_pages_last_access ON detail_pages (last_access);
+-- 所有共用這個檔案的 process 合計的大小；與 insert / 淘汰在同一個 transaction 更新
+CREATE TABLE IF NOT EXISTS cache_size (
+    id          INTEGER PRIMARY KEY CHECK (id = 1),
+    total_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, total_bytes) SELECT 1, COALESCE(SUM(size), 0) FROM detail_pages;
+"""
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+@dataclass
+class CachedPage:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    price: Optional[float]
+    sku: Optional[str]
+    location: Optional[str]
+
+    def conditional_headers(self) -> dict:
+        """送給 server 的 If-None-Match / If-Modified-Since"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def fields(self) -> dict:
+        return {"price": self.price, "sku": self.sku, "location": self.location}
+
+
+class DetailPageCache:
+    """
+    用法：
+        cache = DetailPageCache()
+        cached = cache.get(url)               # 沒有時回傳 None
+        ...304 或 hash 相同 → cache.record_hit(url, revalidated=...)
+        ...內容有變 → cache.put(url, body, fields, etag, last_modified)
+        logger.info(cache.summary())
+    只在同一個 event loop / thread 裡使用；每次操作都是本地 SQLite 的單筆查詢。
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None):
+        self.path = path or Config.DETAIL_CACHE_PATH
+        self.max_bytes = Config.DETAIL_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # WAL + busy timeout：orchestrator 的多個 process 可以共用同一個 cache 檔
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.total_bytes = self._shared_total()  # 上次看到的合計大小（summary 用）
+        self.not_modified = 0   # server 回 304
+        self.same_content = 0   # 200 但內容 hash 與上次相同
+        self.misses = 0
+        self.evictions = 0
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        row = self._conn.execute(
+            "SELECT url, etag, last_modified, content_hash, price, sku, location "
+            "FROM detail_pages WHERE url = ?", (url,)
+        ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def get_body(self, url: str) -> Optional[bytes]:
+        row = self._conn.execute("SELECT body FROM detail_pages WHERE url = ?", (url,)).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def record_hit(self, url: str, revalidated: bool, etag: str = None, last_modified: str = None) -> None:
+        """
+        revalidated=True 表示 server 回 304；False 表示重新下載但內容相同。
+        server 換了 validator 時一併更新。
+        """
+        if revalidated:
+            self.not_modified += 1
+        else:
+            self.same_content += 1
+        self._conn.execute(
+            "UPDATE detail_pages SET last_access = ?, etag = COALESCE(?, etag), "
+            "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+            (time.time(), etag, last_modified, url),
+        )
+        self._conn.commit()
+
+    def put(self, url: str, body: bytes, fields: dict, etag: str = None, last_modified: str = None) -> None:
+        self.misses += 1
+        compressed = zlib.compress(body)
+        with self._write():
+            old = self._conn.execute("SELECT size FROM detail_pages WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detail_pages "
+                "(url, etag, last_modified, content_hash, body, size, price, sku, location, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash(body), compressed, len(compressed),
+                 fields.get("price"), fields.get("sku"), fields.get("location"), time.time()),
+            )
+            self._add_bytes(len(compressed) - (old[0] if old else 0))
+            self._evict()
+
+    def record_miss(self) -> None:
+        """沒辦法寫進 cache 的 miss（例如頁面沒有 server-side render 出價格）"""
+        self.misses += 1
+
+    @contextmanager
+    def _write(self):
+        """BEGIN IMMEDIATE：一開始就取得寫入鎖，其他 process 的 put 排隊，合計大小不會被同時改動"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _shared_total(self) -> int:
+        return self._conn.execute("SELECT total_bytes FROM cache_size WHERE id = 1").fetchone()[0]
+
+    def _add_bytes(self, delta: int) -> None:
+        self._conn.execute("UPDATE cache_size SET total_bytes = total_bytes + ? WHERE id = 1", (delta,))
+        self.total_bytes = self._shared_total()
+
+    def _evict(self) -> None:
+        """刪掉最久沒用到的 entry，直到（所有 process 合計的）總大小回到上限以內；呼叫端持有寫入鎖"""
+        total, freed = self.total_bytes, 0
+        while total - freed > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM detail_pages ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                freed = total
+                break
+            for url, size in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM detail_pages WHERE url = ?", (url,))
+                freed += size
+                self.evictions += 1
+        if freed:
+            self._add_bytes(-freed)
+
+    @property
+    def hits(self) -> int:
+        return self.not_modified + self.same_content
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        return (
+            f"detail cache: {self.hits}/{total} hits ({self.hits / total if total else 0:.0%}; "
+            f"{self.not_modified} not modified, {self.same_content} same content), "
+            f"{self.misses} misses, {self.evictions} evicted, "
+            f"{self.total_bytes / 1024 / 1024:.1f}/{self.max_bytes / 1024 / 1024:.1f} MiB used"
+        )
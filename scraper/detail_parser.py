@@ -0,0 +1,62 @@
+# detail_parser.py
+# 產品明細頁的解析邏輯，Playwright 與純 HTTP 兩種 fetch 方式共用
+from typing import Optional
+import re
+
+from scraper.selector import ProductDetailSelector
+
+
+class DetailParseError(ValueError):
+    """明細頁載入了，但解析不出價格（selector 失效或價格格式改變）：當成抓取失敗交給 fail_fetch_tasks 重試"""
+
+# 抽取 SKU
+def extract_sku(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    match = re.search(r'\b\d{8,}\b', text)
+    if match:
+        return match.group()
+    return lines[-1] if lines else ''
+
+# 抽取位置
+def extract_location(text: str) -> str:
+    if "Location:" in text:
+        return text.split("Location:")[1].strip()
+    return ''
+
+# 價格字串 → float，解析失敗回傳 None
+def parse_price(price_text: str) -> Optional[float]:
+    try:
+        return float(price_text.strip().replace('$', '').replace(',', ''))
+    except ValueError:
+        return None
+
+def parse_detail_fields(price_text: str, sku_raw: Optional[str], location_raw: Optional[str]) -> dict:
+    """把三個 selector 抓到的文字轉成 {'price', 'sku', 'location'}"""
+    return {
+        "price": parse_price(price_text),
+        "sku": extract_sku(sku_raw) if sku_raw else None,
+        "location": extract_location(location_raw) if location_raw else None,
+    }
+
+def parse_product_detail_html(html: str) -> Optional[dict]:
+    """
+    用 ProductDetailSelector 解析明細頁 HTML。
+    找不到價格節點（例如頁面需要 JS render）時回傳 None。
+    """
+    from bs4 import BeautifulSoup  # 只有 HTTP engine 需要；Playwright 路徑不必載入
+
+    soup = BeautifulSoup(html, 'html.parser')
+    price_tag = soup.select_one(ProductDetailSelector.PRICE)
+    if price_tag is None:
+        return None
+
+    sku_tag = soup.select_one(ProductDetailSelector.SKU)
+    location_tag = soup.select_one(ProductDetailSelector.LOCATION)
+
+    # get_text("\n") 近似 Playwright inner_text()：block 之間以換行分隔
+    price_text = price_tag.get_text(strip=True)
+    sku_raw = sku_tag.get_text("\n", strip=True) if sku_tag else None
+    location_raw = location_tag.get_text(" ", strip=True) if location_tag else None
+    fields = parse_detail_fields(price_text, sku_raw or None, location_raw or None)
+    fields["price_text"] = price_text
+    return fields
@@ -0,0 +1,274 @@
+# export_parquet.py
+# 把 product_price_history（join products）增量匯出成 Parquet，分析改讀這些檔案，不再對正式 DB 下查詢。
+# 目錄是 hive partition：<EXPORT_DIR>/price_history/date=YYYY-MM-DD/category=<類別>/part-<起始 id>.parquet
+# 匯出進度（已匯出的最大 price history id）記在 <EXPORT_DIR>/export_state.json，下次只串流比它新的資料；
+# 晚到的舊日期資料 id 也比較大，會在該日期的 partition 多一個 part 檔。
+# 並行寫入時比較小的 id 可能比較晚 commit：EXPORT_ID_LOOKBACK 範圍內還沒出現的 id 也記在 state（id_gaps），
+# 每次重新掃描這段範圍，只匯出之前沒匯出過的 id。
+# PRICE_STORAGE_MODE=changes 時改從 product_price_span 展開成每天一筆：state 記已匯出的最後一天，
+# 下次從那天（當天之後還可能有新的確認）重新匯出到今天，重新匯出的日期先整個清掉再寫。
+#
+#     python -m scraper.export_parquet            # 增量
+#     python -m scraper.export_parquet --full     # 清掉重新匯出
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from urllib.parse import quote
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+
+from scraper.config import Config
+from scraper.logger_setup import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional：只有匯出 / 分析需要
+    pa = None
+
+logger = get_logger(__name__, log_file="logs/export.log", level=logging.DEBUG)
+
+DATASET = "price_history"
+STATE_FILE = "export_state.json"
+# hive 慣例：NULL 的 partition 值
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("Parquet export / analytics need pyarrow: pip install pyarrow")
+
+
+def price_history_schema():
+    """檔案內的欄位；date / category 在目錄名稱上（hive partition）"""
+    return pa.schema([
+        ("history_id", pa.int64()),
+        ("product_id", pa.int64()),
+        ("name", pa.string()),
+        ("unit", pa.string()),
+        ("sku", pa.string()),
+        ("price", pa.decimal128(10, 2)),
+    ])
+
+
+def partition_dir(root: str, price_date, category: str) -> str:
+    category_value = quote(category, safe="") if category else NULL_PARTITION
+    return os.path.join(root, DATASET, f"date={price_date.isoformat()}", f"category={category_value}")
+
+
+def load_state(root: str) -> dict:
+    path = os.path.join(root, STATE_FILE)
+    if not os.path.exists(path):
+        return {"last_history_id": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(root: str, state: dict) -> None:
+    """先寫暫存檔再 rename：中途 crash 時 state 不會是寫一半的 JSON"""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_partition(directory: str, file_name: str, rows: List[dict]) -> None:
+    os.makedirs(directory, exist_ok=True)
+    schema = price_history_schema()
+    table = pa.Table.from_pylist([{name: row[name] for name in schema.names} for row in rows], schema=schema)
+    path = os.path.join(directory, file_name)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def write_chunk(root: str, rows: List[dict], file_name: str = None) -> Dict[Tuple, int]:
+    """
+    一個 chunk（依 id 排序）依 (日期, 類別) 分組，各寫一個 part-<chunk 第一個 id>.parquet。
+    檔名由 chunk 決定：crash 後重跑同一個 chunk 會覆蓋同名檔案，不會重複。
+    """
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row["price_date"], row["category"])].append(row)
+    file_name = file_name or f"part-{rows[0]['history_id']:012d}.parquet"
+    for (price_date, category), group in groups.items():
+        _write_partition(partition_dir(root, price_date, category), file_name, group)
+    return {key: len(group) for key, group in groups.items()}
+
+
+def _to_ranges(ids: Iterable[int]) -> List[List[int]]:
+    """{3, 4, 5, 9} → [[3, 5], [9, 9]]（state 裡的 id_gaps）"""
+    ranges = []
+    for i in sorted(ids):
+        if ranges and i == ranges[-1][1] + 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+def _from_ranges(ranges: Iterable[List[int]]) -> Set[int]:
+    return {i for lo, hi in ranges for i in range(lo, hi + 1)}
+
+
+def _unexported_chunks(chunks: Iterable[List[dict]], last_id: int, gaps: Set[int],
+                       chunk_size: int) -> Iterator[List[dict]]:
+    """
+    略過重新掃描範圍內已經匯出過的 row（id <= last_id 且不在 gaps 裡），剩下的重新切成 chunk_size 一批：
+    批次只由還沒匯出的 row 決定，crash 後重跑同一批會得到同樣的檔名。
+    """
+    batch = []
+    for rows in chunks:
+        for row in rows:
+            if row["history_id"] > last_id or row["history_id"] in gaps:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def _check_state_mode(state: dict, mode: str) -> None:
+    """同一個匯出資料夾不能混用兩種來源（會重複匯出同一天的價格）"""
+    exported_mode = state.get("mode") or ("daily" if state.get("last_history_id") else None)
+    if exported_mode not in (None, mode):
+        raise RuntimeError(
+            f"{STATE_FILE} was written with PRICE_STORAGE_MODE={exported_mode} but the current mode is {mode}; "
+            f"rerun with --full to re-export from the current storage"
+        )
+
+
+def export_price_history(repo, root: str = None, full: bool = False, chunk_size: int = None) -> dict:
+    """
+    增量匯出，回傳 {'rows', 'files', 'partitions', 'last_history_id', 'seconds'}。
+    每寫完一個 chunk 就更新 state，中斷後重跑從最後一個完整的 chunk 之後繼續。
+    PRICE_STORAGE_MODE=changes 時改匯出 product_price_span（見 export_price_spans）。
+    """
+    require_pyarrow()
+    from scraper.db.price_spans import MODE_CHANGES, storage_mode
+
+    if storage_mode() == MODE_CHANGES:
+        return export_price_spans(repo, root, full, chunk_size)
+    root = root or Config.EXPORT_DIR
+    started = time.perf_counter()
+    if full and os.path.exists(os.path.join(root, DATASET)):
+        shutil.rmtree(os.path.join(root, DATASET))
+    state = {"last_history_id": 0} if full else load_state(root)
+    _check_state_mode(state, "daily")
+    last_id = state["last_history_id"]
+    gaps = _from_ranges(state.get("id_gaps", []))
+    # 從最小的 gap 開始重新掃描：期間晚 commit 的 row 這次會被匯出
+    after_id = min(gaps) - 1 if gaps else last_id
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_ROWS
+    lookback = Config.EXPORT_ID_LOOKBACK
+
+    rows_written = files_written = 0
+    partitions = set()
+    chunks = repo.iter_price_history_export(after_id, chunk_size)
+    for rows in _unexported_chunks(chunks, last_id, set(gaps), chunk_size):
+        counts = write_chunk(root, rows)
+        rows_written += len(rows)
+        files_written += len(counts)
+        partitions.update(counts)
+        for row in rows:
+            history_id = row["history_id"]
+            if history_id > last_id:
+                gaps.update(range(max(last_id + 1, history_id - lookback), history_id))
+                last_id = history_id
+            else:
+                gaps.discard(history_id)
+        # 超出 lookback 的 gap 不再等（rollback 或 ON CONFLICT DO NOTHING 用掉的 id）
+        gaps = {i for i in gaps if i > last_id - lookback}
+        state = {
+            "last_history_id": last_id,
+            "id_gaps": _to_ranges(gaps),
+            "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        save_state(root, state)
+        logger.debug(f"📦 Exported {len(rows)} rows up to history id {last_id} ({len(gaps)} ids still pending)")
+
+    summary = {
+        "rows": rows_written,
+        "files": files_written,
+        "partitions": len(partitions),
+        "last_history_id": last_id,
+        "seconds": time.perf_counter() - started,
+    }
+    logger.info(
+        f"🗄️ Exported {rows_written} price history rows after id {after_id} into {files_written} files "
+        f"({len(partitions)} date/category partitions) in {summary['seconds']:.1f}s → {root}"
+    )
+    return summary
+
+
+def export_price_spans(repo, root: str = None, full: bool = False, chunk_size: int = None) -> dict:
+    """
+    changes 模式的匯出：product_price_span 展開成每天一筆，寫成與 daily 模式相同的 partition 與欄位
+    （history_id 為 None）。從 state 的 last_date（第一次從最早的價格）重新匯出到今天，
+    這些日期的 partition 先刪掉再寫，檔名是 part-p<chunk 第一個 product id>.parquet。
+    全部寫完才更新 state：中途 crash 時重跑會再清掉同樣的日期，不會重複。
+    回傳 {'rows', 'files', 'partitions', 'last_date', 'seconds'}。
+    """
+    root = root or Config.EXPORT_DIR
+    started = time.perf_counter()
+    dataset = os.path.join(root, DATASET)
+    if full and os.path.exists(dataset):
+        shutil.rmtree(dataset)
+    state = {} if full else load_state(root)
+    _check_state_mode(state, "changes")
+    start = date.fromisoformat(state["last_date"]) if state.get("last_date") else None
+    end = date.today()
+
+    if os.path.isdir(dataset):
+        for name in os.listdir(dataset):
+            if start is None or name >= f"date={start.isoformat()}":
+                shutil.rmtree(os.path.join(dataset, name))
+    rows_written = files_written = 0
+    partitions = set()
+    for rows in repo.iter_price_span_export(start, end, chunk_size):
+        counts = write_chunk(root, rows, f"part-p{rows[0]['product_id']:012d}.parquet")
+        rows_written += len(rows)
+        files_written += len(counts)
+        partitions.update(counts)
+    state = {
+        "mode": "changes",
+        "last_date": end.isoformat(),
+        "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    save_state(root, state)
+
+    summary = {
+        "rows": rows_written,
+        "files": files_written,
+        "partitions": len(partitions),
+        "last_date": end,
+        "seconds": time.perf_counter() - started,
+    }
+    logger.info(
+        f"🗄️ Exported {rows_written} daily prices from price spans ({start or 'first price'} → {end}) "
+        f"into {files_written} files ({len(partitions)} date/category partitions) "
+        f"in {summary['seconds']:.1f}s → {root}"
+    )
+    return summary
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Export daily prices (product_price_history, or product_price_span in changes mode) to partitioned Parquet")
+    parser.add_argument("--dir", default=None, help=f"匯出資料夾（預設 {Config.EXPORT_DIR}）")
+    parser.add_argument("--full", action="store_true", help="清掉既有的匯出，從頭匯出")
+    parser.add_argument("--chunk-size", type=int, default=None, help="每次從 DB 串流幾筆")
+    args = parser.parse_args(argv)
+
+    from scraper.db.repository_factory import get_product_repo
+    export_price_history(get_product_repo(), args.dir, full=args.full, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,325 @@
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-from sqlalchemy import func 
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import asyncio
-from datetime import  datetime
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Callable
 import logging
-import re
+import os
+import socket
+import time
 from .logger_setup import get_logger
-from scraper import Selector, ProductDetailSelector
+from scraper import ProductDetailSelector
+# 明細頁欄位解析：與 http_fetcher 共用 detail_parser 的實作
+from scraper.detail_parser import DetailParseError, parse_detail_fields
+from scraper.adaptive_limiter import AdaptiveLimiter, OVERLOAD_STATUS_CODES, is_overload
+from scraper.context_pool import BrowserContextPool, LazyBrowser, context_options
+from scraper.detail_cache import DetailPageCache
+from scraper.html_archive import KIND_DETAIL, archive_page, get_archive
+from scraper.http_fetcher import HttpDetailFetcher, HttpFetchError
+from scraper.db.async_engine import dispose_async_engine
 from scraper.db.repository_factory import get_product_repo
+from scraper.db.write_buffer import PriceWriteBuffer
 from scraper.config import Config
-
-# Import your ORM models
-from scraper.db.model import Product, ProductPriceHistory  # adjust import path as needed
+from scraper.page_profile import ResourceBlocker
+from scraper.run_stats import RunStats
+from scraper import metrics
+from scraper.metrics import count, timed
 
 # 設定 logging
 logger = get_logger(__name__, log_file="logs/fetch_product_detail.log", level=logging.DEBUG)
 repo = get_product_repo()
-# 抽取 SKU
-def extract_sku(text: str) -> str:
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-    match = re.search(r'\b\d{8,}\b', text)
-    if match:
-        return match.group()
-    return lines[-1] if lines else ''
-
-# 抽取位置
-def extract_location(text: str) -> str:
-    if "Location:" in text:
-        return text.split("Location:")[1].strip()
-    return ''
-
-# 單一產品 fetch 任務
-async def fetch_product_detail(prod, browser_semaphore, browser):
-    async with browser_semaphore:
-        context = await browser.new_context()
-        page = await context.new_page()
-        try:
-            await page.goto(prod.url, timeout=Config.ONLINE_TIMEOUT * 1000)
+
+# HTML_ARCHIVE 開啟時存明細頁 HTML；等不到價格的頁面也存（selector 修正後可以 reparse）
+async def _archive_detail(prod, page) -> None:
+    if get_archive() is None:
+        return
+    try:
+        with timed("page_content"):
+            html = await asyncio.wait_for(page.content(), timeout=5)
+    except Exception as e:  # 頁面還在 navigation 或已經關閉
+        logger.debug(f"Could not read HTML of {prod.url} for the archive: {e}")
+        return
+    archive_page(KIND_DETAIL, prod.url, html, product_id=prod.id)
+
+# 用已經開好的 Playwright 分頁抓明細
+async def read_product_detail(prod, page, blocker: ResourceBlocker = None):
+    try:
+        with timed("detail_goto"):
+            response = await page.goto(prod.url, timeout=Config.ONLINE_TIMEOUT * 1000,
+                                       wait_until=Config.PAGE_WAIT_UNTIL)
+        if response is not None and response.status in OVERLOAD_STATUS_CODES:
+            # 不必等 selector timeout：直接回報給 AdaptiveLimiter 降低並行數
+            raise HttpFetchError(f"HTTP {response.status}", status_code=response.status)
+        with timed("detail_wait_for_selector"):
             await page.wait_for_selector(
                 ProductDetailSelector.PRICE,
                 timeout=Config.FETCH_PRODUCT_DETAIL_TIMEOUT * 1000
             )
 
+        with timed("detail_read_fields"):
             price_elem = await page.query_selector(ProductDetailSelector.PRICE)
             sku_elem = await page.query_selector(ProductDetailSelector.SKU)
             location_elem = await page.query_selector(ProductDetailSelector.LOCATION)
 
             price_text = await price_elem.inner_text() if price_elem else ''
             price_text = price_text.strip()
-            try:
-                price = float(price_text.replace('$', '').replace(',', ''))
-            except ValueError:
-                price = None
-                logger.error(f"❌ Failed to parse price '{price_text}' @ {prod.url}")
-
             sku_raw = (await sku_elem.inner_text()).strip() if sku_elem else None
             location_raw = (await location_elem.inner_text()).strip() if location_elem else None
-            sku = extract_sku(sku_raw) if sku_raw else None
-            location = extract_location(location_raw) if location_raw else None
-
-            return {
-                "prod": prod,
-                "price": price,
-                "sku": sku,
-                "location": location
-            }
-
-        except PlaywrightTimeoutError:
-            logger.warning(f"⏱️ Timeout loading {prod.url}")
-            raise
-        except Exception as e:
-            logger.error(f"❌ Error fetching {prod.url}: {e}")
-            raise
-        finally:
+        await _archive_detail(prod, page)
+
+        fields = parse_detail_fields(price_text, sku_raw, location_raw)
+        if blocker:
+            blocker.page_loaded()
+        if fields["price"] is None:
+            count("detail_price_unparsed")
+            raise DetailParseError(f"failed to parse price '{price_text}'")
+
+        return {"prod": prod, **fields}
+
+    except PlaywrightTimeoutError:
+        count("detail_timeouts")
+        logger.warning(f"⏱️ Timeout loading {prod.url}")
+        await _archive_detail(prod, page)
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error fetching {prod.url}: {e}")
+        raise
+
+# 每個 product 各開一個 context（沒有 context pool 時）
+async def fetch_product_detail_with_browser(prod, browser, blocker: ResourceBlocker = None):
+    with timed("detail_new_context"):
+        context = await browser.new_context(**context_options())
+        if blocker:
+            await blocker.attach(context)
+        page = await context.new_page()
+    try:
+        return await read_product_detail(prod, page, blocker)
+    finally:
+        with timed("detail_close_context"):
             await page.close()
             await context.close()
 
-# 批次處理：所有 fetch 成功才寫入
-async def run_batch(products, browser, browser_semaphore):
-    tasks = [fetch_product_detail(prod, browser_semaphore, browser) for prod in products]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+# 單一產品 fetch 任務：有 http_fetcher 時先走純 HTTP，失敗才 fallback 到 Playwright
+# （429 / 5xx / timeout 不 fallback，直接交給 limiter 降速）
+async def fetch_product_detail(prod, limiter: AdaptiveLimiter, browser, http_fetcher: HttpDetailFetcher = None,
+                               blocker: ResourceBlocker = None, pool: BrowserContextPool = None):
+    async with limiter.slot():
+        if http_fetcher is not None:
+            try:
+                return await http_fetcher.fetch(prod)
+            except HttpFetchError as e:
+                if is_overload(e):
+                    raise
+                count("detail_http_fallbacks")
+                logger.debug(f"↩️ HTTP path failed for {prod.url} ({e}); falling back to Playwright")
 
-    if any(isinstance(res, Exception) for res in results):
-        failed_count = sum(1 for res in results if isinstance(res, Exception))
-        logger.warning(f"⚠️ Skip DB write: {failed_count} products failed to fetch.")
-        return
+        if pool is not None:
+            async with pool.page() as page:
+                return await read_product_detail(prod, page, blocker)
+        return await fetch_product_detail_with_browser(prod, browser, blocker)
 
-    # All success → proceed to DB write
-    for result in results:
-        prod = result["prod"]
-        price = result["price"]
-        sku = result["sku"]
-        location = result["location"]
+def default_worker_id() -> str:
+    """lease owner 名稱：host + pid，同一台機器多個 process 也不會重複"""
+    return f"{socket.gethostname()}:{os.getpid()}"
 
-        if (prod.sku is None or prod.location is None) and (sku or location):
-            repo.update_product(prod, sku=sku, location=location)
-            logger.info(f"📝 Updated product {prod.id}: sku={sku}, location={location}")
+class DetailFetchPipeline:
+    """
+    Producer/consumer：producer 持續從 DB 補貨到有上限的 asyncio.Queue，
+    N 個常駐 worker（= 並行上限的最大值）各自取下一個 product，實際同時開幾頁由 AdaptiveLimiter 決定，
+    慢的頁面不會卡住其他分頁。
+    補貨是向 product_fetch_queue 領 lease，所以多個 process / 機器可以同時跑而不重複抓。
+    should_stop：回傳 True 時不再補貨，手上的 product 做完、寫入 DB 並歸還 lease 後結束。
+    progress：每處理完一個 product 呼叫一次（參數為 RunStats）。
+    """
 
-        if price is not None:
-            repo.insert_price_history(prod.id, price)
-            logger.info(f"💰 Inserted price history for {prod.id}: {price}")
+    def __init__(self, browser, write_buffer: PriceWriteBuffer, http_fetcher: HttpDetailFetcher = None,
+                 workers: int = None, queue_size: int = None, daily_limit: int = None,
+                 worker_id: str = None, limiter: AdaptiveLimiter = None, pool: BrowserContextPool = None,
+                 should_stop: Callable[[], bool] = None, progress: Callable[[RunStats], None] = None):
+        self.worker_id = worker_id or default_worker_id()
+        self.should_stop = should_stop
+        self.progress = progress
+        self.browser = browser
+        self.write_buffer = write_buffer
+        self.http_fetcher = http_fetcher
+        self.limiter = limiter or AdaptiveLimiter()
+        self.workers = workers or self.limiter.max_limit
+        self.queue_size = queue_size or Config.DETAIL_QUEUE_SIZE or self.workers * 2
+        self.daily_limit = Config.DETAIL_DAILY_LIMIT if daily_limit is None else daily_limit
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.stats = RunStats()
+        self.blocker = ResourceBlocker() if Config.BLOCK_RESOURCES else None
+        if pool is None and Config.CONTEXT_POOL:
+            pool = BrowserContextPool(browser, size=self.limiter.max_limit, blocker=self.blocker)
+        self.pool = pool
+        self.enqueued = 0
 
-# 主流程：不斷拿 batch
-async def main():
-    max_tabs = Config.MAX_TAB_FOR_PRODUCT_DETAIL
-    browser_semaphore = asyncio.Semaphore(max_tabs)
+    async def produce(self) -> None:
+        try:
+            while not self.daily_limit or self.enqueued < self.daily_limit:
+                if self.stopping():
+                    logger.info("🛑 Stop requested; finishing queued products.")
+                    break
+                limit = self.queue_size
+                if self.daily_limit:
+                    limit = min(limit, self.daily_limit - self.enqueued)
+                with timed("claim_products"):
+                    products = await repo.claim_products_async(self.worker_id, limit)
+                if not products:
+                    if await repo.get_fetch_budget_left_async() == 0:
+                        logger.info(f"💸 Daily page-load budget ({Config.FETCH_DAILY_BUDGET}) used up.")
+                        break
+                    if await self.wait_for_retry():
+                        continue
+                    logger.info("🎯 No more products to process.")
+                    break
+
+                for prod in products:
+                    await self.queue.put(prod)
+                    self.enqueued += 1
+                logger.debug(f"📦 Enqueued {len(products)} products ({self.enqueued} total)")
+        finally:
+            # 每個 worker 一個結束訊號
+            for _ in range(self.workers):
+                await self.queue.put(None)
+
+    async def wait_for_retry(self) -> bool:
+        """
+        沒有可領的工作時：等手上的 product 都處理完、失敗寫回 DB 後，
+        若最早的重試時間在 FETCH_RETRY_MAX_WAIT 秒內就睡到那時候並回傳 True
+        """
+        await self.queue.join()
+        await self.write_buffer.flush_async()
+        retry_at = await repo.next_fetch_retry_at_async()
+        if retry_at is None or self.stopping():
+            return False
+        delay = max(0.0, (retry_at - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds())
+        if delay > Config.FETCH_RETRY_MAX_WAIT:
+            logger.info(f"⏳ Next retry in {delay:.0f}s; leaving it for a later run.")
+            return False
+        logger.info(f"⏳ Waiting {delay:.0f}s for failed products to become retryable")
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline and not self.stopping():
+            await asyncio.sleep(min(1.0, deadline - time.monotonic()))
+        return not self.stopping()
+
+    def stopping(self) -> bool:
+        return bool(self.should_stop and self.should_stop())
+
+    async def work(self) -> None:
+        while True:
+            prod = await self.queue.get()
+            try:
+                if prod is None:
+                    return
+                await self._process(prod)
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, prod) -> None:
+        start = time.perf_counter()
+        try:
+            result = await fetch_product_detail(prod, self.limiter, self.browser, self.http_fetcher,
+                                                self.blocker, self.pool)
+        except Exception as e:
+            self.stats.record(time.perf_counter() - start, ok=False)
+            metrics.REGISTRY.observe("stage_seconds", time.perf_counter() - start, stage="detail_fetch_failed")
+            count("detail_failed")
+            await self.write_buffer.add_failure_async(prod, f"{type(e).__name__}: {e}")
+        else:
+            await self.write_buffer.add_result_async(result)
+            self.stats.record(time.perf_counter() - start, ok=True)
+            metrics.REGISTRY.observe("stage_seconds", time.perf_counter() - start, stage="detail_fetch_ok")
+            count("detail_ok")
+            logger.debug(f"🧺 Buffered result for {prod.id}: price={result['price']}")
+        if self.progress:
+            self.progress(self.stats)
+
+    async def heartbeat(self) -> None:
+        # 定期延長手上的 lease，避免排隊中的 product 被別的 worker 當成過期接走
+        interval = max(1, Config.FETCH_LEASE_SECONDS // 3)
+        while True:
+            await asyncio.sleep(interval)
+            await repo.renew_leases_async(self.worker_id)
 
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=not Config.SHOW_UI)
+    async def log_retry_summary(self) -> None:
+        """失敗逐筆處理（成功照常寫入、失敗排定重試）比整批丟棄省下多少次重抓"""
+        saved = self.stats.all_or_nothing_losses(Config.MAX_TAB_FOR_PRODUCT_DETAIL)
+        retry = self.write_buffer.retry_counts
+        logger.info(
+            f"🧮 {self.stats.success_count} fetches committed, {self.stats.failure_count} failed "
+            f"({retry['retry']} scheduled for retry, {retry['dead']} dead); per-item commits kept "
+            f"{saved} successful fetches that all-or-nothing batches of "
+            f"{Config.MAX_TAB_FOR_PRODUCT_DETAIL} would have discarded"
+        )
+        counts = await repo.get_fetch_queue_counts_async()
+        logger.info("🗂️ Fetch queue today: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
 
-        total = 10
-        batch_size = 2
-        processed = 0
+    async def run(self) -> RunStats:
+        await repo.seed_fetch_queue_async()
+        if self.pool is not None and self.http_fetcher is None:
+            await self.pool.warm(self.limiter.limit)
+        heartbeat = asyncio.create_task(self.heartbeat())
+        workers = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+        try:
+            await self.produce()
+            await asyncio.gather(*workers)
+        finally:
+            for task in [heartbeat, *workers]:
+                task.cancel()
+            await self.write_buffer.flush_async()
+            await repo.release_leases_async(self.worker_id)
+            if self.pool is not None:
+                await self.pool.close()
+                logger.info(f"♻️ {self.pool.summary()}")
+        logger.info(f"📊 Detail fetch finished: {self.stats.summary()}")
+        logger.info(f"🎚️ {self.limiter.summary()}")
+        await self.log_retry_summary()
+        if self.blocker:
+            logger.info(f"🚫 {self.blocker.summary()}")
+        return self.stats
 
-        while processed < total:
-            products = repo.get_product_random(batch_size)
-            if not products:
-                logger.info("🎯 No more products to process.")
-                break
+# 主流程：producer 持續補貨，worker 持續抓，直到今天的工作做完（或 should_stop）
+async def run_detail_fetch(should_stop: Callable[[], bool] = None, progress: Callable[[RunStats], None] = None,
+                           worker_id: str = None, metrics_job: str = "detail") -> RunStats:
+    """metrics_job：結束時耗時表 / Prometheus textfile 的名稱（orchestrator 每個 shard 各一個）"""
+    write_buffer = PriceWriteBuffer(repo, complete_tasks=True)
 
-            logger.info(f"📦 Running batch of {len(products)} products...")
-            await run_batch(products, browser, browser_semaphore)
-            processed += len(products)
+    async with AsyncExitStack() as stack:
+        pw = await stack.enter_async_context(async_playwright())
+        http_fetcher = None
+        if Config.DETAIL_FETCH_ENGINE == 'http':
+            cache = DetailPageCache() if Config.DETAIL_CACHE else None
+            http_fetcher = await stack.enter_async_context(HttpDetailFetcher(cache=cache))
+            # 只有 HTTP 失敗需要 fallback 時才啟動 Chromium
+            browser = LazyBrowser(pw)
+        else:
+            with timed("browser_launch"):
+                browser = await pw.chromium.launch(headless=not Config.SHOW_UI)
 
+        pipeline = DetailFetchPipeline(browser, write_buffer, http_fetcher, worker_id=worker_id,
+                                       should_stop=should_stop, progress=progress)
+        stats = await pipeline.run()
+
+        if http_fetcher is not None:
+            logger.info(
+                f"🌐 HTTP engine: {http_fetcher.success_count} served without browser, "
+                f"{http_fetcher.failure_count} fell back to Playwright"
+            )
+            if http_fetcher.cache is not None:
+                logger.info(
+                    f"🗃️ {http_fetcher.cache.summary()}; "
+                    f"{write_buffer.skipped_product_updates} product updates skipped"
+                )
         await browser.close()
+    # asyncpg 連線綁在這個 event loop 上，結束前關掉
+    await dispose_async_engine()
+    metrics.report(metrics_job)
+    return stats
+
+async def main():
+    metrics.serve()
+    await run_detail_fetch()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,237 @@
+# html_archive.py
+# 原始 HTML 的 append-only 壓縮 archive（HTML_ARCHIVE=true 時開啟）：每個 process 一組檔案
+#   <HTML_ARCHIVE_DIR>/<YYYY-MM-DD>/part-<pid>-<開始時間>.zst   每頁一個獨立的 zstd frame（沒安裝 zstandard 時用 zlib，副檔名 .zz）
+#   同名的 .idx                                                 每頁一行 JSON：offset / length / kind / url / day / meta
+# 先寫 frame 再寫 index：crash 時最多多出一段沒有 index 的資料，讀取只看 index；任一頁都能單獨 seek + 解壓。
+# python -m scraper.reparse 用它離線重跑 parser。
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from datetime import date, datetime, timezone
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+from scraper.config import Config
+from scraper.logger_setup import get_logger
+from scraper.metrics import count, timed
+
+try:
+    import zstandard
+except ImportError:  # optional：沒有時退回 zlib（壓縮率差一些、也比較慢）
+    zstandard = None
+
+logger = get_logger(__name__, log_file="logs/dropit.log", level=logging.DEBUG)
+
+KIND_LISTING = "listing"
+KIND_DETAIL = "detail"
+
+# 資料檔副檔名 → codec
+CODECS = {".zst": "zstd", ".zz": "zlib"}
+
+
+class ArchiveRecord(NamedTuple):
+    """index 的一行：資料檔 path 的 offset 起 length bytes 是一頁壓縮後的 HTML"""
+    path: str
+    offset: int
+    length: int
+    kind: str
+    url: str
+    day: str
+    fetched_at: str
+    meta: dict
+
+
+def _compressor(level: int, codec: str = None):
+    """(副檔名, compress)；codec 預設為 zstd（沒安裝時 zlib）"""
+    codec = codec or ("zstd" if zstandard is not None else "zlib")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("codec zstd needs the zstandard package")
+        return ".zst", zstandard.ZstdCompressor(level=level).compress
+    return ".zz", lambda data: zlib.compress(data, min(level, 9))
+
+
+def decompress(path: str, data: bytes) -> bytes:
+    codec = CODECS[os.path.splitext(path)[1]]
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if zstandard is None:
+        raise RuntimeError(f"{path} is zstd-compressed; pip install zstandard to read it")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+class HtmlArchive:
+    """
+    用法：
+        archive = HtmlArchive()
+        archive.append("listing", url, html, category="dairy", page=3)
+        archive.append("detail", url, html, product_id=42)
+        archive.close()
+    同一個 process 的 thread / coroutine 共用一個 instance（寫入有 lock）；檔案在第一次 append 時才建立，
+    跨過午夜後的第一次 append 關閉舊檔、在新一天的資料夾開新檔（長時間執行的 process 不會把隔天的頁面寫進前一天）。
+    """
+
+    def __init__(self, root: str = None, level: int = None, codec: str = None):
+        self.root = root or Config.HTML_ARCHIVE_DIR
+        self.ext, self._compress = _compressor(Config.HTML_ARCHIVE_LEVEL if level is None else level, codec)
+        self.pid = os.getpid()
+        self.path: Optional[str] = None
+        self.day: Optional[str] = None
+        self._data = None
+        self._index = None
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def _open(self, day: str) -> None:
+        directory = os.path.join(self.root, day)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"part-{self.pid}-{time.time_ns() // 1_000_000}")
+        self.path = base + self.ext
+        self._data = open(self.path, "xb")
+        self._index = open(base + ".idx", "x", encoding="utf-8")
+        self._offset = 0
+        self.day = day
+
+    def _close_files(self) -> None:
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = self._index = None
+
+    def append(self, kind: str, url: str, html: str, **meta) -> None:
+        raw = html.encode("utf-8")
+        frame = self._compress(raw)
+        entry = {"kind": kind, "url": url,
+                 "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "meta": meta}
+        with self._lock:
+            day = date.today().isoformat()
+            if self._data is None or day != self.day:
+                self._close_files()
+                self._open(day)
+            entry["day"] = day
+            self._data.write(frame)
+            self._data.flush()
+            entry["offset"], entry["length"] = self._offset, len(frame)
+            self._index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index.flush()
+            self._offset += len(frame)
+            self.pages += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(frame)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_files()
+
+    def summary(self) -> str:
+        ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0
+        return (f"archived {self.pages} pages: {self.raw_bytes / 1e6:.1f} MB HTML → "
+                f"{self.stored_bytes / 1e6:.1f} MB ({ratio:.1f}x, {self.ext[1:]}) in {self.path}")
+
+
+# ----------------------------------------------------------------------
+# process 內共用的 archive：HTML_ARCHIVE 關閉時 archive_page 什麼都不做
+# ----------------------------------------------------------------------
+_archive: Optional[HtmlArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> Optional[HtmlArchive]:
+    """HTML_ARCHIVE 開啟時回傳這個 process 的 archive（fork 出來的 process 各自開新檔）"""
+    global _archive
+    if not Config.HTML_ARCHIVE:
+        return None
+    if _archive is None or _archive.pid != os.getpid():
+        with _archive_lock:
+            if _archive is None or _archive.pid != os.getpid():
+                _archive = HtmlArchive()
+    return _archive
+
+
+def close_archive() -> None:
+    global _archive
+    with _archive_lock:
+        if _archive is not None and _archive.pid == os.getpid():
+            _archive.close()
+            if _archive.pages:
+                logger.info(f"🗄️ {_archive.summary()}")
+        _archive = None
+
+
+atexit.register(close_archive)
+
+
+def archive_page(kind: str, url: str, html: str, **meta) -> None:
+    """存一頁原始 HTML；寫入失敗只記 log，不影響抓取"""
+    archive = get_archive()
+    if archive is None or not html:
+        return
+    try:
+        with timed("html_archive"):
+            archive.append(kind, url, html, **meta)
+        count(f"archived_{kind}_pages")
+    except OSError as e:
+        logger.warning(f"⚠️ Failed to archive {url}: {e}")
+
+
+# ----------------------------------------------------------------------
+# 讀取
+# ----------------------------------------------------------------------
+def archive_days(root: str = None) -> List[str]:
+    """archive 裡有資料的日期（YYYY-MM-DD，由舊到新）"""
+    root = root or Config.HTML_ARCHIVE_DIR
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+
+def iter_records(day: str, root: str = None, kind: str = None) -> Iterator[ArchiveRecord]:
+    """某一天所有 index 的紀錄（依檔名、檔內順序）；寫到一半的最後一行略過"""
+    directory = os.path.join(root or Config.HTML_ARCHIVE_DIR, day)
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".idx"):
+            continue
+        base = os.path.join(directory, name[:-len(".idx")])
+        path = next((base + ext for ext in CODECS if os.path.exists(base + ext)), None)
+        if path is None:
+            logger.warning(f"⚠️ {name}: data file not found")
+            continue
+        with open(base + ".idx", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ {name}: skipping truncated index line")
+                    continue
+                if kind and entry["kind"] != kind:
+                    continue
+                yield ArchiveRecord(path, entry["offset"], entry["length"], entry["kind"], entry["url"],
+                                    entry["day"], entry["fetched_at"], entry["meta"])
+
+
+def read_page(f, record: ArchiveRecord) -> str:
+    """從已開啟的資料檔 f 讀出一頁 HTML"""
+    f.seek(record.offset)
+    return decompress(record.path, f.read(record.length)).decode("utf-8")
+
+
+def read_pages(records: Iterable[ArchiveRecord]) -> Iterator[Tuple[ArchiveRecord, str]]:
+    """(record, html)；同一個資料檔只開一次"""
+    handles = {}
+    try:
+        for record in records:
+            f = handles.get(record.path)
+            if f is None:
+                f = handles[record.path] = open(record.path, "rb")
+            yield record, read_page(f, record)
+    finally:
+        for f in handles.values():
+            f.close()
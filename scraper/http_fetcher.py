@@ -0,0 +1,128 @@
+# http_fetcher.py
+# 不開瀏覽器，直接用 HTTP 抓產品明細頁 HTML 再用同一組 selector 解析
+import logging
+
+import httpx
+
+from scraper.config import Config
+from scraper.detail_cache import DetailPageCache, content_hash
+from scraper.detail_parser import parse_product_detail_html
+from scraper.html_archive import KIND_DETAIL, archive_page
+from scraper.logger_setup import get_logger
+from scraper.metrics import count, timed
+
+logger = get_logger(__name__, log_file="logs/fetch_product_detail.log", level=logging.DEBUG)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+}
+
+
+class HttpFetchError(Exception):
+    """
+    輕量 HTTP 路徑失敗（狀態碼錯誤、連線錯誤、或頁面沒有 server-side render 出價格）。
+    status_code：server 有回應時的狀態碼（AdaptiveLimiter 用來判斷 429 / 5xx）。
+    timeout：連線或讀取 timeout（httpx 的 timeout 不是 TimeoutError 的子類別，由這個旗標告訴 AdaptiveLimiter）。
+    """
+
+    def __init__(self, message: str, status_code: int = None, timeout: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.timeout = timeout
+
+
+class HttpDetailFetcher:
+    """
+    共用一個 httpx.AsyncClient（connection pool），逐頁抓 HTML 並解析。
+    有 cache 時先送條件式請求；304 或內容 hash 與上次相同就直接用上次解析的欄位，
+    結果帶 unchanged=True，不重新解析。
+    用法：
+        async with HttpDetailFetcher(cache=DetailPageCache()) as fetcher:
+            result = await fetcher.fetch(prod)
+    """
+
+    def __init__(self, max_connections: int = None, timeout: float = None, cache: DetailPageCache = None):
+        self.max_connections = max_connections or Config.HTTP_MAX_CONNECTIONS
+        self.timeout = timeout or Config.ONLINE_TIMEOUT
+        self.cache = cache
+        self._client: httpx.AsyncClient = None
+        self.success_count = 0
+        self.failure_count = 0
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+        if self.cache is not None:
+            self.cache.close()
+
+    async def fetch(self, prod) -> dict:
+        """回傳跟 fetch_product_detail 一樣格式的 dict（另加 unchanged）；失敗時 raise HttpFetchError"""
+        cached = self.cache.get(prod.url) if self.cache is not None else None
+        try:
+            with timed("http_get"):
+                response = await self._client.get(prod.url, headers=cached.conditional_headers() if cached else None)
+        except httpx.TimeoutException as e:
+            self.failure_count += 1
+            count("http_timeouts")
+            raise HttpFetchError(f"{type(e).__name__}: {e}", timeout=True) from e
+        except httpx.HTTPError as e:
+            self.failure_count += 1
+            raise HttpFetchError(f"{type(e).__name__}: {e}") from e
+
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        count(f"http_status_{response.status_code}")
+        if response.status_code == 304 and cached:
+            self.cache.record_hit(prod.url, revalidated=True, etag=etag, last_modified=last_modified)
+            return self._unchanged(prod, cached)
+
+        if response.status_code != 200:
+            self.failure_count += 1
+            raise HttpFetchError(f"HTTP {response.status_code}", status_code=response.status_code)
+
+        body = response.content
+        if cached and content_hash(body) == cached.content_hash:
+            self.cache.record_hit(prod.url, revalidated=False, etag=etag, last_modified=last_modified)
+            archive_page(KIND_DETAIL, prod.url, response.text, product_id=prod.id)
+            return self._unchanged(prod, cached)
+
+        with timed("detail_parse_html"):
+            fields = parse_product_detail_html(response.text)
+        if fields is None or fields["price"] is None:
+            self.failure_count += 1
+            if self.cache is not None:
+                self.cache.record_miss()
+            raise HttpFetchError("price not found in static HTML")
+
+        # 解析失敗的頁面會 fallback 到 Playwright，由那邊存 render 後的 HTML
+        archive_page(KIND_DETAIL, prod.url, response.text, product_id=prod.id)
+        if self.cache is not None:
+            self.cache.put(prod.url, body, fields, etag=etag, last_modified=last_modified)
+        self.success_count += 1
+        return {
+            "prod": prod,
+            "price": fields["price"],
+            "sku": fields["sku"],
+            "location": fields["location"],
+            "unchanged": False,
+        }
+
+    def _unchanged(self, prod, cached) -> dict:
+        self.success_count += 1
+        return {"prod": prod, **cached.fields(), "unchanged": True}
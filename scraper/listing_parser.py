@@ -0,0 +1,140 @@
+# listing_parser.py
+# 類別列表頁（96 item / 頁）的解析，可切換 parser backend：
+#   bs4        - BeautifulSoup + html.parser（原本的實作，純 Python，最慢）
+#   lxml       - lxml.html + 事先 compile 好的 CSS selector（需要 lxml、cssselect）
+#   selectolax - selectolax 的 Lexbor parser（需要 selectolax）
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+import logging
+
+from scraper.config import Config
+from scraper.db.model import Product
+from scraper.logger_setup import get_logger
+from scraper.selector import Selector
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # optional backend
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional backend
+    LexborHTMLParser = None
+
+logger = get_logger(__name__, log_file="logs/dropit.log", level=logging.DEBUG)
+BASE_URL = Config.BASE_URL
+
+
+def build_product(name: Optional[str], price_text: Optional[str], unit: Optional[str],
+                  href: Optional[str]) -> Product:
+    """各 backend 抓到的原始文字 → Product（缺值補 'N/A'，價格轉 Decimal）"""
+    product_name = name.strip() if name is not None else 'N/A'
+    product_price_with_dollar = price_text.strip() if price_text is not None else 'N/A'
+    product_unit = unit.strip() if unit is not None else 'N/A'
+    product_url = href if href is not None else 'N/A'
+    full_url = urljoin(BASE_URL, product_url) if product_url else 'N/A'
+
+    product_price: Optional[Decimal] = None
+    if product_price_with_dollar.startswith('$'):
+        try:
+            product_price = Decimal(product_price_with_dollar[1:])
+        except InvalidOperation:
+            product_price = None
+
+    return Product(
+        name=product_name,
+        price=product_price,
+        unit=product_unit,
+        url=full_url
+    )
+
+
+def _parse_bs4(html) -> List[Product]:
+    from bs4 import BeautifulSoup  # 預設 backend 是 lxml，用到 bs4 才載入（約 100ms）
+
+    soup = BeautifulSoup(html, 'html.parser')
+    results: List[Product] = []
+
+    for item in soup.select(Selector.LIST_OF_PRODUCTS):
+        name_tag = item.select_one(Selector.NAME)
+        price_tag = item.select_one(Selector.PRICE)
+        unit_tag = item.select_one(Selector.UNIT)
+        results.append(build_product(
+            name_tag.text if name_tag else None,
+            price_tag.text if price_tag else None,
+            unit_tag.text if unit_tag else None,
+            name_tag['href'] if name_tag and 'href' in name_tag.attrs else None,
+        ))
+
+    return results
+
+
+if lxml is not None:
+    # selector 只 compile 一次（CSS → XPath），每頁重複使用
+    _LXML_ITEMS = CSSSelector(Selector.LIST_OF_PRODUCTS)
+    _LXML_NAME = CSSSelector(Selector.NAME)
+    _LXML_PRICE = CSSSelector(Selector.PRICE)
+    _LXML_UNIT = CSSSelector(Selector.UNIT)
+
+
+def _parse_lxml(html) -> List[Product]:
+    if not html or not html.strip():
+        return []
+    root = lxml.html.fromstring(html)
+    results: List[Product] = []
+
+    for item in _LXML_ITEMS(root):
+        name_tags = _LXML_NAME(item)
+        price_tags = _LXML_PRICE(item)
+        unit_tags = _LXML_UNIT(item)
+        name_tag = name_tags[0] if name_tags else None
+        results.append(build_product(
+            name_tag.text_content() if name_tag is not None else None,
+            price_tags[0].text_content() if price_tags else None,
+            unit_tags[0].text_content() if unit_tags else None,
+            name_tag.get('href') if name_tag is not None else None,
+        ))
+
+    return results
+
+
+def _parse_selectolax(html) -> List[Product]:
+    tree = LexborHTMLParser(html)
+    results: List[Product] = []
+
+    for item in tree.css(Selector.LIST_OF_PRODUCTS):
+        name_tag = item.css_first(Selector.NAME)
+        price_tag = item.css_first(Selector.PRICE)
+        unit_tag = item.css_first(Selector.UNIT)
+        results.append(build_product(
+            name_tag.text() if name_tag is not None else None,
+            price_tag.text() if price_tag is not None else None,
+            unit_tag.text() if unit_tag is not None else None,
+            name_tag.attributes.get('href') if name_tag is not None else None,
+        ))
+
+    return results
+
+
+PARSER_BACKENDS: Dict[str, Callable[[str], List[Product]]] = {'bs4': _parse_bs4}
+if lxml is not None:
+    PARSER_BACKENDS['lxml'] = _parse_lxml
+if LexborHTMLParser is not None:
+    PARSER_BACKENDS['selectolax'] = _parse_selectolax
+
+
+def get_parser(backend: str = None) -> Callable[[str], List[Product]]:
+    """取得 parser；指定的 backend 沒安裝時退回 bs4"""
+    backend = (backend or Config.LISTING_PARSER).lower()
+    parser = PARSER_BACKENDS.get(backend)
+    if parser is None:
+        logger.warning(f"⚠️ Listing parser '{backend}' not available; falling back to bs4")
+        PARSER_BACKENDS[backend] = parser = _parse_bs4
+    return parser
+
+
+def extract_product_info(html, backend: str = None) -> List[Product]:
+    return get_parser(backend)(html)
@@ -1,73 +1,85 @@
 # Converted version of your Selenium scraper using Playwright
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
 from scraper.logger_setup import get_logger
+from scraper.listing_parser import extract_product_info
+from scraper.context_pool import context_options
+from scraper import metrics
+from scraper.metrics import count, timed
+from scraper.crawl_checkpoint import CategoryCheckpoint, default_run_id, resume_plan, write_listing_page
+from scraper.html_archive import KIND_LISTING, archive_page
+from scraper.pagination import page_url
+from scraper.rate_limiter import HostRateLimiter
+from scraper.page_profile import ResourceBlocker
 
 from scraper.selector import Selector
 from scraper.db.model import Product
 from scraper.db.repository_factory import get_product_repo
-from decimal import Decimal, InvalidOperation
-from typing import List, Optional
+from scraper.config import Config
+from collections import Counter
+from typing import Callable, List
+import argparse
+import asyncio
 import logging
 import json
 import time
 
 logger = get_logger(__name__, log_file="logs/dropit.log", level=logging.DEBUG)
 repo = get_product_repo()
-BASE_URL = 'https://www.dropit.bm'
-
-def extract_product_info(html) -> List[Product]:
-    soup = BeautifulSoup(html, 'html.parser')
-    items = soup.select(Selector.LIST_OF_PRODUCTS)
-    results: List[Product] = []
-
-    for item in items:
-        name_tag = item.select_one(Selector.NAME)
-        price_tag = item.select_one(Selector.PRICE)
-        unit_tag = item.select_one(Selector.UNIT)
-
-        product_name = name_tag.text.strip() if name_tag else 'N/A'
-        product_price_with_dollar = price_tag.text.strip() if price_tag else 'N/A'
-        product_unit = unit_tag.text.strip() if unit_tag else 'N/A'
-        product_url = name_tag['href'] if name_tag and 'href' in name_tag.attrs else 'N/A'
-        full_url = urljoin(BASE_URL, product_url) if product_url else 'N/A'
-
-        product_price: Optional[Decimal] = None
-        if product_price_with_dollar.startswith('$'):
-            try:
-                product_price = Decimal(product_price_with_dollar[1:])
-            except InvalidOperation:
-                product_price = None
-
-        results.append(Product(
-            name=product_name,
-            price=product_price,
-            unit=product_unit,
-            url=full_url
-        ))
-
-    return results
-
-def scrape_page(page):
-    html = page.content()
-    return extract_product_info(html)
-
-def scrape_all_pages_with_pagination(page, base_url, category_name):
+BASE_URL = Config.BASE_URL
+
+# 網址跟著 BASE_URL（benchmarks.fake_dropit 的本地 server 也用同樣的路徑）
+CATEGORY_MAP = {
+    #"frozen food": f"{BASE_URL}/shop/frozen_foods/d/22886624#!/?limit=96&page=1",
+    "bakery": f"{BASE_URL}/shop/bakery/d/22886616#!/?limit=96&page=1",
+    "BWS": f"{BASE_URL}/shop/beer_wine_spirits/d/22886618#!/?limit=96&page=1",
+    "dairy": f"{BASE_URL}/shop/dairy/d/22886620#!/?limit=96&page=1",
+    "deli": f"{BASE_URL}/shop/deli/d/22886622#!/?limit=96&page=1",
+    "home_floral": f"{BASE_URL}/shop/home_floral/d/22886626#!/?limit=96&page=1",
+    "meat": f"{BASE_URL}/shop/meat/d/22886628#!/?limit=96&page=1",
+    "pantry": f"{BASE_URL}/shop/pantry/d/22886630#!/?limit=96&page=1",
+    "produce": f"{BASE_URL}/shop/produce/d/22886632#!/?limit=96&page=1",
+    "seafood": f"{BASE_URL}/shop/seafood/d/22886634#!/?limit=96&page=1",
+}
+
+def scrape_page(page, category_name: str = None, page_number: int = None):
+    with timed("page_content"):
+        html = page.content()
+    archive_page(KIND_LISTING, page.url, html, category=category_name, page=page_number)
+    with timed("extract_product_info"):
+        return extract_product_info(html)
+
+def scrape_all_pages_with_pagination(page, base_url, category_name, blocker: ResourceBlocker = None,
+                                     on_page: Callable[[int, List[Product]], None] = None, start_page: int = 1):
+    """
+    逐頁點「下一頁」收集 products（依 url 去重）。
+    on_page：每頁收集完就呼叫一次，參數為頁數與該頁新出現的 products（用來逐頁寫入 DB + checkpoint）。
+    start_page > 1 時直接用網址開該頁（resume）。
+    換頁等新一頁的商品列表出現就繼續，與 --parallel 一樣用 HOST_MIN_INTERVAL 限制對 host 的間隔，不固定 sleep。
+    """
+    limiter = HostRateLimiter(Config.HOST_MIN_INTERVAL)
     all_products = []
     seen_urls = set()
-    page.goto(base_url)
+    first_url = page_url(base_url, start_page) if start_page > 1 else base_url
+    with timed("page_goto"):
+        page.goto(first_url, wait_until=Config.PAGE_WAIT_UNTIL)
 
-    page.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
+    with timed("wait_for_selector"):
+        page.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
 
-    current_page = 1
+    current_page = start_page
 
     while True:
-        products = scrape_page(page)
+        products = scrape_page(page, category_name, current_page)
+        if blocker:
+            blocker.page_loaded()
+        new_products = []
         for p in products:
             if p.url not in seen_urls:
                 seen_urls.add(p.url)
-                all_products.append(p)
+                new_products.append(p)
+        all_products.extend(new_products)
+        if on_page:
+            on_page(current_page, new_products)
         logger.debug(f"Scraped {len(products)} products from page {current_page}.")
 
         try:
@@ -76,44 +88,80 @@ def scrape_all_pages_with_pagination(page, base_url, category_name):
                 logger.debug("Next button is disabled; end of pagination.")
                 break
 
-            with page.expect_navigation(wait_until="load", timeout=10000):
-                next_btn.click()
+            with timed("rate_limit_wait"):
+                limiter.wait_blocking(page.url)
+            with timed("next_page_navigation"):
+                with page.expect_navigation(wait_until=Config.PAGE_WAIT_UNTIL, timeout=10000):
+                    next_btn.click()
 
-            page.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
+            with timed("wait_for_selector"):
+                page.wait_for_selector(Selector.LIST_OF_PRODUCTS, timeout=20000)
             current_page += 1
 
-            # Rate limiting: wait 1.5 seconds between pages
-            time.sleep(1.5)
-
         except PlaywrightTimeout:
             logger.debug("No next button or timeout waiting; end of pagination.")
             break
 
     # Save screenshot of the last page
-    screenshot_path = f"screenshots/{category_name}_page_{current_page}.png"
-    page.screenshot(path=screenshot_path, full_page=True)
-    logger.info(f"Saved screenshot to {screenshot_path}")
+    if Config.LISTING_SCREENSHOTS:
+        screenshot_path = f"screenshots/{category_name}_page_{current_page}.png"
+        with timed("screenshot"):
+            page.screenshot(path=screenshot_path, full_page=True)
+        logger.info(f"Saved screenshot to {screenshot_path}")
     logger.info(f"Last page number for category '{category_name}': {current_page}")
 
     return all_products
 
-def run_category_scraper(category_name: str, url: str) -> None:
+def log_upsert_totals(category_name: str, totals: Counter) -> None:
+    logger.info(
+        f"🔁 [{category_name}] upserted {totals['inserted']} new / {totals['updated']} existing products, "
+        f"{totals['price_changes']} listing price changes recorded, {totals['skipped']} skipped"
+    )
+
+def run_category_scraper(category_name: str, url: str, incremental: bool = False, run_id: str = None,
+                         start_page: int = 1) -> None:
+    """
+    每頁抓完就寫入 DB 並更新 checkpoint（run_id 預設為今天），中斷後可從 start_page 繼續。
+    incremental=True：每頁 upsert 並記錄列表價格變動；否則只 insert 新的 products。
+    """
+    started = time.perf_counter()
+    upsert_totals = Counter()
+    checkpoint = CategoryCheckpoint(repo, run_id or default_run_id(), category_name, start_page)
+    last_page = start_page - 1
+
+    def flush_page(page_number: int, page_products: List[Product]) -> None:
+        nonlocal last_page
+        with timed("listing_page_write"):
+            stats = write_listing_page(repo, page_products, category_name, incremental)
+        if stats:
+            upsert_totals.update(stats)
+        with timed("checkpoint_write"):
+            checkpoint.page_done(page_number, len(page_products))
+        count("listing_pages")
+        count("listing_products", len(page_products))
+        last_page = max(last_page, page_number)
+
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
+        browser = p.chromium.launch(headless=not Config.SHOW_UI)
+        context = browser.new_context(**context_options())
+        blocker = ResourceBlocker() if Config.BLOCK_RESOURCES else None
+        if blocker:
+            blocker.attach_sync(context)
+        page = context.new_page()
 
         try:
-            raw_products = scrape_all_pages_with_pagination(page, url, category_name)
+            raw_products = scrape_all_pages_with_pagination(
+                page, url, category_name, blocker, on_page=flush_page, start_page=start_page
+            )
+            checkpoint.finish(last_page)
             logger.info(f"[{category_name}] Scraped {len(raw_products)} raw products.")
-
-            products: List[Product] = []
-            for rp in raw_products:
-                rp.category = category_name
-                products.append(rp)
-
-            repo.insert_new_products(products)
+            if incremental:
+                log_upsert_totals(category_name, upsert_totals)
         finally:
             browser.close()
+            logger.info(f"⏱️ [{category_name}] listing crawl took {time.perf_counter() - started:.1f}s")
+            if blocker:
+                logger.info(f"🚫 [{category_name}] {blocker.summary()}")
 
 def save_to_json(data, filename='output.json'):
     with open(filename, 'w', encoding='utf-8') as f:
@@ -134,22 +182,49 @@ def print_longest_property_lengths(products):
     for key, length in max_lengths.items():
         logger.debug(f"{key}: max length = {length}")
 
-def main():
-    category_map = {
-        #"frozen food": "https://www.dropit.bm/shop/frozen_foods/d/22886624#!/?limit=96&page=1",
-        "bakery": "https://www.dropit.bm/shop/bakery/d/22886616#!/?limit=96&page=1",
-        "BWS": "https://www.dropit.bm/shop/beer_wine_spirits/d/22886618#!/?limit=96&page=1",
-        "dairy": "https://www.dropit.bm/shop/dairy/d/22886620#!/?limit=96&page=1",
-        "deli": "https://www.dropit.bm/shop/deli/d/22886622#!/?limit=96&page=1",
-        "home_floral": "https://www.dropit.bm/shop/home_floral/d/22886626#!/?limit=96&page=1",
-        "meat": "https://www.dropit.bm/shop/meat/d/22886628#!/?limit=96&page=1",
-        "pantry": "https://www.dropit.bm/shop/pantry/d/22886630#!/?limit=96&page=1",
-        "produce": "https://www.dropit.bm/shop/produce/d/22886632#!/?limit=96&page=1",
-        "seafood": "https://www.dropit.bm/shop/seafood/d/22886634#!/?limit=96&page=1",
-    }
-
-    for cat, url in category_map.items():
-        run_category_scraper(cat, url)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch all product from category")
+    parser.add_argument("--parallel", action="store_true",
+                        help="共用一個 headless browser 同時 crawl 多個類別（async）")
+    parser.add_argument("--concurrency", type=int, default=Config.CATEGORY_CONCURRENCY,
+                        help="--parallel 時同時 crawl 幾個類別")
+    parser.add_argument("--incremental", action="store_true",
+                        help="每頁直接 upsert products，並記下當天的列表價格")
+    parser.add_argument("--run-id", default=None, help="checkpoint 用的執行代號（預設為今天日期）")
+    parser.add_argument("--resume", action="store_true",
+                        help="從 --run-id 的 checkpoint 繼續：略過已完成的類別，未完成的從中斷的頁繼續")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_id = args.run_id or default_run_id()
+    metrics.serve()
+
+    failed = []
+    try:
+        if args.parallel:
+            from scraper.category_crawler import crawl_categories
+            results = asyncio.run(crawl_categories(CATEGORY_MAP, concurrency=args.concurrency,
+                                                   incremental=args.incremental, run_id=run_id, resume=args.resume))
+            failed = [r.category for r in results if r.error]
+        else:
+            plan = resume_plan(repo, run_id, CATEGORY_MAP, args.resume)
+            for cat, url in CATEGORY_MAP.items():
+                if plan[cat] is None:
+                    logger.info(f"⏭️ [{cat}] already done in run {run_id}")
+                    continue
+                # 與 --parallel 一樣：一個類別失敗不影響其他類別，最後以非 0 結束
+                try:
+                    run_category_scraper(cat, url, incremental=args.incremental, run_id=run_id,
+                                         start_page=plan[cat])
+                except Exception as e:
+                    logger.exception(f"❌ [{cat}] listing crawl failed: {e}")
+                    failed.append(cat)
+    finally:
+        metrics.report("listing")
+    if failed:
+        logger.error(f"❌ {len(failed)} categories failed ({', '.join(failed)}); rerun with --resume to continue")
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,352 @@
+# metrics.py
+# 輕量的執行期 metrics：histogram（各 stage 耗時）與 counter，放在每個 process 自己的 REGISTRY。
+#   - 結束時 log 一張各 stage 的耗時表（次數、總時間、p50/p95/max），看時間花在哪裡
+#   - METRICS_DIR：把 Prometheus text format 寫成 <job>.prom（node_exporter textfile collector 讀這個資料夾）
+#   - METRICS_PORT：開一個本地 HTTP endpoint（/metrics）讓 Prometheus scrape
+# DB 的 query / commit 耗時由 instrument_engine 掛在 SQLAlchemy engine / session 的 event 上，不用改 repository。
+#
+#     with timed("page_goto"):
+#         await page.goto(url)
+#     count("listing_products", len(products))
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+import bisect
+import logging
+import os
+import threading
+import time
+
+from scraper.config import Config
+from scraper.logger_setup import get_logger
+
+logger = get_logger(__name__, log_file="logs/metrics.log", level=logging.DEBUG)
+
+# 秒；涵蓋 parser 的毫秒級到明細頁的數十秒。頁面載入集中的 50ms~3s 切得比較細，quantile 內插才準
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.125,
+                   0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0, 7.5, 10.0, 15.0,
+                   30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """累積式 bucket（Prometheus histogram）+ sum / count / max"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後一格是 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """跟 Prometheus histogram_quantile 一樣在 bucket 內線性內插；落在 +Inf 的用 max"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.max
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i], self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    metric 以 (名稱, labels) 區分，同名的是一個 family（Prometheus 輸出時一起列 HELP / TYPE）。
+    observe / inc 會從 asyncio.to_thread 的 DB thread 與 HTTP endpoint thread 呼叫，全部用同一把 lock。
+    """
+
+    def __init__(self, prefix: str = "dropit", enabled: bool = True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            histogram = family.get(key)
+            if histogram is None:
+                histogram = family[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            family[key] = family.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """量 with 區塊的耗時（raise 也算，stage 的時間一樣花掉了）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._histograms.get(name, {}).get(_label_key(labels), Histogram())
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # 輸出
+    # ------------------------------------------------------------------
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, family in sorted(self._histograms.items()):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, h in sorted(family.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += bucket_count
+                        le = f'le="{bound}"'
+                        lines.append(f"{full}_bucket{_format_labels(key, le)} {cumulative}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{full}_count{_format_labels(key)} {h.count}")
+            for name, family in sorted(self._counters.items()):
+                full = f"{self.prefix}_{name}_total"
+                lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {full} counter")
+                for key, value in sorted(family.items()):
+                    lines.append(f"{full}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """先寫暫存檔再 rename，collector 不會讀到寫一半的檔案"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_textfile(cls, path: str, prefix: str = "dropit") -> "MetricsRegistry":
+        """
+        讀回 write_textfile 寫出的 <job>.prom（例如 benchmark 讀子 process 的結果）。
+        檔案裡沒有 max：以最高的非空 bucket 上限代替，quantile 一樣在 bucket 內內插。
+        """
+        registry = cls(prefix=prefix)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                series, value = line.rsplit(" ", 1)
+                name, _, label_text = series.partition("{")
+                labels = dict(part.split("=", 1) for part in label_text.rstrip("}").split(",") if part)
+                labels = {k: v.strip('"') for k, v in labels.items()}
+                name = name[len(prefix) + 1:]
+                if name.endswith("_total"):
+                    registry._counters.setdefault(name[:-len("_total")], {})[_label_key(labels)] = float(value)
+                    continue
+                le = labels.pop("le", None)
+                for suffix in ("_bucket", "_sum", "_count"):
+                    if name.endswith(suffix):
+                        family = registry._histograms.setdefault(name[:-len(suffix)], {})
+                        h = family.setdefault(_label_key(labels), Histogram())
+                        registry._load_series(h, suffix, le, float(value))
+                        break
+        return registry
+
+    @staticmethod
+    def _load_series(h: Histogram, suffix: str, le: str, value: float) -> None:
+        if suffix == "_sum":
+            h.sum = value
+        elif suffix == "_count":
+            h.count = int(value)
+        else:
+            # bucket 是累積值，依序讀入時扣掉前面的就是這一格
+            i = len(h.buckets) if le == "+Inf" else h.buckets.index(float(le))
+            h.counts[i] = int(value) - sum(h.counts[:i])
+            if h.counts[i] and i < len(h.buckets):
+                h.max = h.buckets[i]
+
+    def summary_table(self) -> str:
+        """每個 histogram 一列，依總耗時排序；並行執行時各 stage 的總和會超過 wall time"""
+        wall = time.perf_counter() - self.started_at
+        with self._lock:
+            rows = [
+                (name + _format_labels(key), h)
+                for name, family in self._histograms.items()
+                for key, h in family.items()
+            ]
+            counters = [
+                (name + _format_labels(key), value)
+                for name, family in self._counters.items()
+                for key, value in family.items()
+            ]
+        rows.sort(key=lambda row: row[1].sum, reverse=True)
+        width = max([len(label) for label, _ in rows + counters] + [5])
+        lines = [
+            f"{'stage':<{width}} {'count':>8} {'total s':>10} {'mean ms':>9} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'max ms':>9} {'% wall':>7}"
+        ]
+        for label, h in rows:
+            lines.append(
+                f"{label:<{width}} {h.count:>8} {h.sum:>10.1f} {h.sum / h.count * 1000:>9.1f} "
+                f"{h.quantile(0.5) * 1000:>9.1f} {h.quantile(0.95) * 1000:>9.1f} {h.max * 1000:>9.1f} "
+                f"{h.sum / wall * 100 if wall else 0:>6.0f}%"
+            )
+        for label, value in sorted(counters):
+            lines.append(f"{label:<{width}} {value:>8g}")
+        lines.append(f"wall time {wall:.1f}s")
+        return "\n".join(lines)
+
+
+REGISTRY = MetricsRegistry(enabled=Config.METRICS)
+REGISTRY.describe("stage_seconds", "Time spent in each crawl stage (page load, parse, DB write, ...)")
+REGISTRY.describe("db_query_seconds", "SQL statement execution time by statement type")
+REGISTRY.describe("db_commit_seconds", "Session commit time (flush + COMMIT)")
+REGISTRY.describe("events", "Crawl event counts (pages, products, failures, ...)")
+
+
+def timed(stage: str):
+    """with timed("page_goto"): ... → stage_seconds{stage="page_goto"}"""
+    if not REGISTRY.enabled:
+        return nullcontext()
+    return REGISTRY.timer("stage_seconds", stage=stage)
+
+
+def count(event_name: str, amount: float = 1) -> None:
+    REGISTRY.inc("events", amount, event=event_name)
+
+
+# ----------------------------------------------------------------------
+# SQLAlchemy：query / commit 耗時
+# ----------------------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    kind = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    REGISTRY.observe("db_query_seconds", time.perf_counter() - starts.pop(), statement=kind)
+
+
+def _before_commit(session):
+    session.info["metrics_commit_start"] = time.perf_counter()
+
+
+def _after_commit(session):
+    start = session.info.pop("metrics_commit_start", None)
+    if start is not None:
+        REGISTRY.observe("db_commit_seconds", time.perf_counter() - start)
+
+
+def _after_rollback(session):
+    session.info.pop("metrics_commit_start", None)
+
+
+_sessions_instrumented = False
+
+
+def instrument_engine(engine) -> None:
+    """在 engine（async engine 傳 .sync_engine）掛上 query 計時；session commit 計時只需掛一次"""
+    global _sessions_instrumented
+    if not REGISTRY.enabled:
+        return
+    # 只有建立 engine 的 process 才需要 SQLAlchemy：orchestrator 主 process、metrics CLI 不必載入
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if not _sessions_instrumented:
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _sessions_instrumented = True
+
+
+# ----------------------------------------------------------------------
+# 輸出
+# ----------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrape 很頻繁，不寫 access log
+
+
+def serve(port: int = None) -> ThreadingHTTPServer:
+    """在 daemon thread 開 /metrics；port 為 0 或沒設定 METRICS_PORT 時不開，回傳 None"""
+    port = Config.METRICS_PORT if port is None else port
+    if not port or not REGISTRY.enabled:
+        return None
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📡 Metrics at http://127.0.0.1:{server.server_address[1]}/metrics")
+    return server
+
+
+def report(job: str) -> None:
+    """一次執行結束：log 耗時表，有設定 METRICS_DIR 時寫 <job>.prom"""
+    if not REGISTRY.enabled:
+        return
+    logger.info(f"⏱️ [{job}] where the time went:\n{REGISTRY.summary_table()}")
+    if Config.METRICS_DIR:
+        path = os.path.join(Config.METRICS_DIR, f"{job}.prom")
+        REGISTRY.write_textfile(path)
+        logger.info(f"📝 Wrote metrics to {path}")
@@ -0,0 +1,274 @@
+# orchestrator.py
+# 多 process 分 shard 執行：每個 process 有自己的 event loop、browser 與 DB 連線，用滿多核心。
+#   listing：把 CATEGORY_MAP 的類別分成 N 份，每份在一個 process 裡跑 crawl_categories
+#   detail ：N 個 process 各跑一個 DetailFetchPipeline，共用同一個 product_fetch_queue，
+#            依 priority 全域領取（FOR UPDATE SKIP LOCKED，不會領到同一個 product）
+# Ctrl-C（SIGINT）只送到主 process：通知所有 shard 停止領新工作，做完手上的、寫入 DB、歸還 lease 後結束。
+# 再按一次 Ctrl-C 會直接中止。
+#
+#     python -m scraper.orchestrator listing --processes 3 --incremental
+#     python -m scraper.orchestrator listing --processes 3 --resume   # 略過今天已完成的類別，未完成的從中斷的頁繼續
+#     python -m scraper.orchestrator detail --processes 4             # 中斷後再執行一次即接續
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Tuple
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from scraper import metrics
+from scraper.config import Config
+from scraper.logger_setup import get_logger
+
+logger = get_logger(__name__, log_file="logs/orchestrator.log", level=logging.DEBUG)
+
+# 子 process 內由 _init_worker 設定
+_stop_event = None
+_progress_queue = None
+
+
+def _init_worker(stop_event, progress_queue) -> None:
+    """
+    子 process 自成一個 process group：終端機的 Ctrl-C 不會直接打斷它（以及它啟動的 Playwright driver / browser），
+    改由主 process 透過 stop_event 通知
+    """
+    global _stop_event, _progress_queue
+    _stop_event, _progress_queue = stop_event, progress_queue
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _report(shard: int, kind: str, **payload) -> None:
+    _progress_queue.put((shard, kind, payload))
+
+
+def split_evenly(items: List, shards: int) -> List[List]:
+    """round-robin 分成最多 shards 份（沒有東西的 shard 不回傳）"""
+    buckets = [items[i::shards] for i in range(max(1, shards))]
+    return [bucket for bucket in buckets if bucket]
+
+
+# ----------------------------------------------------------------------
+# 子 process 的進入點（必須是 module-level function 才能 pickle）
+# ----------------------------------------------------------------------
+def run_listing_shard(shard: int, category_map: Dict[str, str], incremental: bool, run_id: str) -> List[dict]:
+    from scraper.category_crawler import crawl_categories
+
+    def on_result(result) -> None:
+        _report(shard, "category", category=result.category, products=len(result.products),
+                pages=result.pages, seconds=result.seconds, error=result.error, skipped=result.skipped)
+
+    # checkpoint 已由主 process 依 --resume 整理好，shard 一律接續
+    results = asyncio.run(crawl_categories(category_map, incremental=incremental,
+                                           should_stop=_stop_event.is_set, on_result=on_result,
+                                           run_id=run_id, resume=True))
+    metrics.report(f"listing_shard{shard}")
+    return [
+        {"category": r.category, "products": len(r.products), "error": r.error, "skipped": r.skipped}
+        for r in results
+    ]
+
+
+def run_detail_shard(shard: int) -> dict:
+    from scraper.fetch_product_price import default_worker_id, run_detail_fetch
+
+    last_report = 0.0
+
+    def progress(stats) -> None:
+        nonlocal last_report
+        if time.monotonic() - last_report >= 1:
+            last_report = time.monotonic()
+            _report(shard, "detail", ok=stats.success_count, failed=stats.failure_count)
+
+    stats = asyncio.run(run_detail_fetch(should_stop=_stop_event.is_set, progress=progress,
+                                         worker_id=f"{default_worker_id()}#shard{shard}",
+                                         metrics_job=f"detail_shard{shard}"))
+    _report(shard, "detail", ok=stats.success_count, failed=stats.failure_count)
+    return {"ok": stats.success_count, "failed": stats.failure_count, "seconds": stats.elapsed}
+
+
+# ----------------------------------------------------------------------
+# 主 process
+# ----------------------------------------------------------------------
+class ListingProgress:
+    """彙整各 shard 回報的類別結果（進度本身由各 shard 逐頁寫進 crawl_checkpoint）"""
+
+    def __init__(self, total: int, completed: List[str] = ()):
+        self.total = total
+        self.completed = list(completed)
+        self.failed: List[str] = []
+        self.products = 0
+
+    def handle(self, shard: int, kind: str, payload: dict) -> None:
+        if payload["skipped"]:
+            return
+        if payload["error"]:
+            self.failed.append(payload["category"])
+            logger.warning(f"❌ [shard {shard}] {payload['category']} failed: {payload['error']}")
+            return
+        self.completed.append(payload["category"])
+        self.products += payload["products"]
+        logger.info(
+            f"✅ [shard {shard}] {payload['category']}: {payload['products']} products, "
+            f"{payload['pages']} pages in {payload['seconds']:.1f}s "
+            f"({len(self.completed)}/{self.total} categories done)"
+        )
+
+    def summary(self) -> str:
+        remaining = self.total - len(self.completed)
+        return (f"{len(self.completed)}/{self.total} categories done, {self.products} products, "
+                f"{len(self.failed)} failed, {remaining} left for --resume")
+
+
+class DetailProgress:
+    """各 shard 回報的是累計數字，保留每個 shard 最新的一筆再加總"""
+
+    def __init__(self, shards: int):
+        self.latest = {shard: {"ok": 0, "failed": 0} for shard in range(shards)}
+        self.crashed: List[int] = []
+        self.started_at = time.perf_counter()
+        self._last_log = 0.0
+
+    def handle(self, shard: int, kind: str, payload: dict) -> None:
+        self.latest[shard] = payload
+        if time.monotonic() - self._last_log >= 10:
+            self._last_log = time.monotonic()
+            logger.info(f"📈 {self.summary()}")
+
+    def summary(self) -> str:
+        ok = sum(p["ok"] for p in self.latest.values())
+        failed = sum(p["failed"] for p in self.latest.values())
+        elapsed = time.perf_counter() - self.started_at
+        per_shard = " ".join(f"#{s}={p['ok']}" for s, p in sorted(self.latest.items()))
+        crashed = f", shards {self.crashed} crashed" if self.crashed else ""
+        return (f"{ok} ok / {failed} failed across {len(self.latest)} shards{crashed} "
+                f"({ok / elapsed if elapsed else 0:.1f} products/s; {per_shard})")
+
+
+def run_shards(jobs: List[Tuple], processes: int, progress) -> List:
+    """
+    jobs: [(function, shard, *args)]。每個 job 在獨立的 process 執行，期間把回報交給 progress.handle。
+    第一次 Ctrl-C 通知各 shard 停止並等它們收尾；第二次直接中止。
+    """
+    ctx = multiprocessing.get_context("spawn")  # 不 fork 主 process 的 event loop / DB 連線 / 執行緒
+    stop_event = ctx.Event()
+    progress_queue = ctx.Queue()
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                                   initializer=_init_worker, initargs=(stop_event, progress_queue))
+    futures = {executor.submit(fn, shard, *args): shard for fn, shard, *args in jobs}
+    pending = set(futures)
+    results = [None] * len(jobs)
+
+    def drain() -> None:
+        while True:
+            try:
+                shard, kind, payload = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            progress.handle(shard, kind, payload)
+
+    try:
+        while pending:
+            try:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                drain()
+                for future in done:
+                    shard = futures[future]
+                    try:
+                        results[shard] = future.result()
+                    except Exception as e:
+                        logger.exception(f"❌ Shard {shard} crashed: {e}")
+            except KeyboardInterrupt:
+                if stop_event.is_set():
+                    raise
+                stop_event.set()
+                logger.warning("🛑 Stopping: shards finish in-flight work and flush; Ctrl-C again to abort.")
+        drain()
+    except KeyboardInterrupt:
+        logger.error("⛔ Aborted; unfinished leases expire after FETCH_LEASE_SECONDS.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return results
+
+
+def orchestrate_listing(processes: int, incremental: bool = False, resume: bool = False,
+                        run_id: str = None) -> ListingProgress:
+    from scraper.crawl_checkpoint import default_run_id, resume_plan
+    from scraper.main import CATEGORY_MAP, repo
+
+    run_id = run_id or default_run_id()
+    plan = resume_plan(repo, run_id, CATEGORY_MAP, resume)
+    completed = [cat for cat, start_page in plan.items() if start_page is None]
+    if resume:
+        logger.info(f"↩️ Resuming run {run_id}: skipping {len(completed)} categories already done")
+
+    todo = [(cat, url) for cat, url in CATEGORY_MAP.items() if plan[cat] is not None]
+    progress = ListingProgress(total=len(CATEGORY_MAP), completed=completed)
+    shards = split_evenly(todo, processes)
+    jobs = [(run_listing_shard, i, dict(shard), incremental, run_id) for i, shard in enumerate(shards)]
+    logger.info(f"🚀 Listing crawl: {len(todo)} categories in {len(jobs)} processes")
+    results = run_shards(jobs, processes, progress)
+    for shard, result in zip(shards, results):
+        if result is None:  # shard crash：還沒回報結果的類別都算失敗
+            progress.failed.extend(cat for cat, _ in shard
+                                   if cat not in progress.completed and cat not in progress.failed)
+    logger.info(f"🏁 Listing crawl: {progress.summary()}")
+    return progress
+
+
+def orchestrate_detail(processes: int) -> DetailProgress:
+    from scraper.db.model import ProductFetchTask
+    from scraper.fetch_product_price import repo
+
+    # 先 seed 一次；中斷後重跑時已完成的 task 不會再被領取（done 的不會再領，lease 已歸還）
+    repo.seed_fetch_queue()
+    counts = repo.get_fetch_queue_counts()
+    remaining = sum(counts.get(status, 0) for status in (ProductFetchTask.STATUS_PENDING,
+                                                         ProductFetchTask.STATUS_FAILED,
+                                                         ProductFetchTask.STATUS_LEASED))
+    shards = max(1, min(processes, remaining))
+    progress = DetailProgress(shards if remaining else 0)
+    if not remaining:
+        logger.info("🎯 No detail fetch work left for today.")
+        return progress
+    jobs = [(run_detail_shard, i) for i in range(shards)]
+    logger.info(f"🚀 Detail fetch: {remaining} tasks left, {shards} processes claiming by priority")
+    results = run_shards(jobs, processes, progress)
+    # crash 的 shard 手上的 lease 到期後由其他 worker / 下次執行接手
+    progress.crashed = [shard for shard, result in enumerate(results) if result is None]
+    logger.info(f"🏁 Detail fetch: {progress.summary()}")
+    return progress
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run listing / detail crawls as sharded processes")
+    parser.add_argument("stage", choices=["listing", "detail"])
+    parser.add_argument("--processes", type=int, default=Config.ORCHESTRATOR_PROCESSES or os.cpu_count(),
+                        help="同時執行幾個 shard process")
+    parser.add_argument("--incremental", action="store_true", help="listing：每頁直接 upsert（同 scraper.main）")
+    parser.add_argument("--resume", action="store_true", help="listing：依 checkpoint 接續同一個 run")
+    parser.add_argument("--run-id", default=None, help="listing：checkpoint 的 run id（預設今天的日期）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.stage == "listing":
+        progress = orchestrate_listing(args.processes, incremental=args.incremental, resume=args.resume,
+                                       run_id=args.run_id)
+        if progress.failed:
+            raise SystemExit(1)
+    else:
+        progress = orchestrate_detail(args.processes)
+        if progress.crashed:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# page_profile.py
+# Playwright 精簡頁面設定：攔截圖片、字型、CSS、追蹤碼等用不到的 request
+# sync（scraper.main）與 async（category_crawler / fetch_product_price）共用同一套規則與計數
+from collections import Counter
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from scraper.config import Config
+
+# 被擋掉的 request 無法得知實際大小，以各類型常見大小估算省下的流量
+ESTIMATED_BYTES = {
+    'image': 40_000,
+    'media': 500_000,
+    'font': 30_000,
+    'stylesheet': 25_000,
+    'script': 50_000,
+    'xhr': 5_000,
+    'fetch': 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+
+class ResourceBlocker:
+    """
+    用法：
+        blocker = ResourceBlocker()
+        await blocker.attach(context)      # async API
+        blocker.attach_sync(context)       # sync API
+        ...每載完一頁呼叫 blocker.page_loaded()
+        logger.info(blocker.summary())
+    """
+
+    def __init__(self, blocked_types: Iterable[str] = None, allowed_hosts: Iterable[str] = None,
+                 block_third_party: bool = None):
+        self.blocked_types = set(Config.BLOCKED_RESOURCE_TYPES if blocked_types is None else blocked_types)
+        hosts = Config.ALLOWED_HOST_SUFFIXES if allowed_hosts is None else allowed_hosts
+        self.allowed_hosts = {h.lower() for h in hosts} | {urlsplit(Config.BASE_URL).hostname}
+        self.block_third_party = Config.BLOCK_THIRD_PARTY if block_third_party is None else block_third_party
+        self.blocked = Counter()  # resource type / 'third-party' → 次數
+        self.allowed_requests = 0
+        self.bytes_loaded = 0
+        self.estimated_bytes_saved = 0
+        self.pages = 0
+
+    def _is_first_party(self, url: str) -> bool:
+        host = (urlsplit(url).hostname or '').lower()
+        return any(host == allowed or host.endswith('.' + allowed) for allowed in self.allowed_hosts)
+
+    def should_block(self, resource_type: str, url: str, main_frame_navigation: bool = False) -> Optional[str]:
+        """
+        要擋的話回傳原因（resource type 或 'third-party'），否則 None。
+        主頁面本身的 navigation 一律放行（即使被 redirect 到其他網域）。
+        """
+        if main_frame_navigation or url.startswith(('data:', 'blob:')):
+            return None
+        if resource_type in self.blocked_types:
+            return resource_type
+        if self.block_third_party and not self._is_first_party(url):
+            return 'third-party'
+        return None
+
+    def _decide(self, request) -> bool:
+        main_frame_navigation = request.is_navigation_request() and request.frame.parent_frame is None
+        reason = self.should_block(request.resource_type, request.url, main_frame_navigation)
+        if reason is None:
+            self.allowed_requests += 1
+            return False
+        self.blocked[reason] += 1
+        self.estimated_bytes_saved += ESTIMATED_BYTES.get(request.resource_type, DEFAULT_ESTIMATED_BYTES)
+        return True
+
+    def _on_response(self, response) -> None:
+        length = response.headers.get('content-length')
+        if length and length.isdigit():
+            self.bytes_loaded += int(length)
+
+    async def _route_async(self, route) -> None:
+        if self._decide(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _route_sync(self, route) -> None:
+        if self._decide(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+    async def attach(self, context) -> None:
+        """掛到 async API 的 BrowserContext（或 Page）"""
+        await context.route("**/*", self._route_async)
+        context.on("response", self._on_response)
+
+    def attach_sync(self, context) -> None:
+        """掛到 sync API 的 BrowserContext（或 Page）"""
+        context.route("**/*", self._route_sync)
+        context.on("response", self._on_response)
+
+    def page_loaded(self) -> None:
+        self.pages += 1
+
+    @property
+    def blocked_requests(self) -> int:
+        return sum(self.blocked.values())
+
+    def summary(self) -> str:
+        pages = max(self.pages, 1)
+        by_reason = ", ".join(f"{reason}={count}" for reason, count in self.blocked.most_common())
+        return (
+            f"{self.pages} pages: blocked {self.blocked_requests} requests "
+            f"({self.blocked_requests / pages:.1f}/page; {by_reason or 'none'}), "
+            f"~{self.estimated_bytes_saved / pages / 1024:.0f} KiB/page saved (estimated), "
+            f"{self.allowed_requests / pages:.1f} requests and "
+            f"{self.bytes_loaded / pages / 1024:.0f} KiB/page still loaded"
+        )
@@ -0,0 +1,22 @@
+# pagination.py
+import re
+from typing import Iterable, Optional
+
+_PAGE_PARAM = re.compile(r'([?&]page=)\d+')
+
+
+def page_url(base_url: str, page_number: int) -> str:
+    """
+    類別網址已經帶 `#!/?limit=96&page=1`，把所有 page=N 換成指定頁數；
+    沒有 page 參數時補在最後。
+    """
+    if _PAGE_PARAM.search(base_url):
+        return _PAGE_PARAM.sub(lambda m: f"{m.group(1)}{page_number}", base_url)
+    separator = '&' if '?' in base_url else '?'
+    return f"{base_url}{separator}page={page_number}"
+
+
+def max_page_number(pager_texts: Iterable[str]) -> Optional[int]:
+    """從分頁列各個按鈕的文字（1、2、…、40、Next）找出最大頁數；找不到回傳 None"""
+    numbers = [int(text.strip()) for text in pager_texts if text and text.strip().isdigit()]
+    return max(numbers) if numbers else None
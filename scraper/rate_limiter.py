@@ -0,0 +1,37 @@
+# rate_limiter.py
+import asyncio
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """
+    每個 host 的 request 之間至少間隔 min_interval 秒（所有並行的 crawl 共用），
+    取代各自在迴圈裡 time.sleep 固定秒數。
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_allowed: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def wait(self, url: str) -> None:
+        """輪到這個 host 時才 return"""
+        host = urlsplit(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            delay = self._next_allowed.get(host, now) - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_allowed[host] = time.monotonic() + self.min_interval
+
+    def wait_blocking(self, url: str) -> None:
+        """sync 版（scraper.main 單一 thread 逐頁 crawl 用）：距離上次 request 不足 min_interval 時等剩下的時間"""
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+        delay = self._next_allowed.get(host, now) - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_allowed[host] = time.monotonic() + self.min_interval
@@ -0,0 +1,243 @@
+# reparse.py
+# 用 html_archive 存下來的原始 HTML 離線重跑 parser 並重新匯入 DB，不開瀏覽器、不連網站：
+# selector 改了或 parser 修好之後（例如明細價格 float() 失敗、列表欄位變成 'N/A'），不必整個重新 crawl。
+# archive 依資料檔切成多段，交給多個 process 平行解壓 + 解析（spawn，跟 orchestrator 一樣），
+# 主 process 依序收結果、邊收邊寫 DB：
+#   列表頁  跟 main.py 一樣走 write_listing_page：預設只 insert 新的 products；--incremental 時 upsert，
+#           列表價格記在抓取那天（會用 archive 裡的名稱 / 價格覆蓋 product，請用最近一次的 run）
+#   明細頁  價格歷史記在抓取那天（同一天已有價格的略過，跟 fetch 時一樣以先寫入的為準），
+#           補上缺的 sku / location，並把該天的 fetch task 標記為 done
+#
+#     python -m scraper.reparse --dry-run                              # 今天的 archive：只解析，列出仍然失敗的頁面
+#     python -m scraper.reparse --day 2026-10-16 --kind detail --processes 8
+#     python -m scraper.reparse --day 2026-10-16 --incremental
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+
+from scraper import html_archive
+from scraper.html_archive import KIND_DETAIL, KIND_LISTING, ArchiveRecord
+from scraper.logger_setup import get_logger
+
+logger = get_logger(__name__, log_file="logs/dropit.log", level=logging.DEBUG)
+
+
+def chunk_records(records: Iterable[ArchiveRecord], chunk_pages: int) -> List[List[ArchiveRecord]]:
+    """依資料檔分組，每段最多 chunk_pages 頁（worker 每段只開一次檔案）"""
+    chunks = []
+    for _, group in groupby(records, key=lambda r: r.path):
+        group = list(group)
+        chunks.extend(group[start:start + chunk_pages] for start in range(0, len(group), chunk_pages))
+    return chunks
+
+
+def parse_chunk(records: List[ArchiveRecord]) -> List[dict]:
+    """
+    worker：解壓並解析一段 records（同一個資料檔），回傳可以 pickle 的 dict：
+    列表頁 {'kind', 'day', 'url', 'category', 'page', 'products': [(name, price, unit, url)]}
+    明細頁 {'kind', 'day', 'url', 'product_id', 'price', 'sku', 'location'}
+    壞掉的 frame 回傳 {'kind': 'corrupt', 'url', 'error'}
+    """
+    from scraper.detail_parser import parse_product_detail_html
+    from scraper.listing_parser import extract_product_info
+
+    results = []
+    with open(records[0].path, "rb") as f:
+        for record in records:
+            try:
+                html = html_archive.read_page(f, record)
+            except Exception as e:  # zlib.error / ZstdError / 截斷的資料檔
+                results.append({"kind": "corrupt", "url": record.url, "error": f"{type(e).__name__}: {e}"})
+                continue
+            base = {"kind": record.kind, "day": record.day, "url": record.url}
+            if record.kind == KIND_LISTING:
+                products = extract_product_info(html)
+                results.append({**base, "category": record.meta.get("category"), "page": record.meta.get("page"),
+                                "products": [(p.name, p.price, p.unit, p.url) for p in products]})
+            else:
+                fields = parse_product_detail_html(html) or {}
+                results.append({**base, "product_id": record.meta.get("product_id"), "price": fields.get("price"),
+                                "sku": fields.get("sku"), "location": fields.get("location")})
+    return results
+
+
+def map_chunks(chunks: List[List[ArchiveRecord]], processes: int) -> Iterator[List[dict]]:
+    """依序 yield 每段的解析結果；同時最多 processes x 2 段在處理中，結果不會全部堆在記憶體"""
+    if processes <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk)
+        return
+    ctx = multiprocessing.get_context("spawn")  # 不 fork 主 process 的 DB 連線
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(parse_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class Reingest:
+    """把 parse_chunk 的結果寫回 DB（dry_run 時只統計）"""
+
+    def __init__(self, repo, incremental: bool = False, dry_run: bool = False, show_failures: int = 10):
+        self.repo = repo
+        self.incremental = incremental
+        self.dry_run = dry_run
+        self.show_failures = show_failures
+        self.stats = Counter()
+        self.failures: List[str] = []
+        self._seen_urls: Dict[tuple, set] = defaultdict(set)  # (day, category) → 已寫入的 url（同 crawl 時的去重）
+
+    def _failed(self, message: str) -> None:
+        if len(self.failures) < self.show_failures:
+            self.failures.append(message)
+
+    def add(self, results: List[dict]) -> None:
+        details = []
+        for result in results:
+            self.stats[f"{result['kind']}_pages"] += 1
+            if result["kind"] == KIND_LISTING:
+                self._listing(result)
+            elif result["kind"] == KIND_DETAIL:
+                details.append(result)
+            else:
+                self._failed(f"corrupt frame {result['url']}: {result['error']}")
+        if details:
+            self._details(details)
+
+    def _listing(self, result: dict) -> None:
+        from scraper.crawl_checkpoint import write_listing_page
+        from scraper.db.model import Product
+
+        rows = result["products"]
+        unparsed = sum(1 for name, price, _, url in rows if price is None or 'N/A' in (name, url))
+        self.stats["listing_products"] += len(rows)
+        self.stats["listing_unparsed"] += unparsed
+        if not rows:
+            self._failed(f"no products on {result['category']} page {result['page']} ({result['url']})")
+        elif unparsed:
+            self._failed(f"{unparsed} unparsed products on {result['category']} page {result['page']}")
+        if self.dry_run or not result["category"]:
+            return
+        # 解析不完整的 product 只回報、不寫入（跟 upsert_listing_products 一樣：沒有價格或網址的略過）
+        seen = self._seen_urls[(result["day"], result["category"])]
+        products = []
+        for name, price, unit, url in rows:
+            if price is not None and url and url != 'N/A' and url not in seen:
+                seen.add(url)
+                products.append(Product(name=name, price=price, unit=unit, url=url))
+        stats = write_listing_page(self.repo, products, result["category"], self.incremental,
+                                   date.fromisoformat(result["day"]))
+        self.stats["listing_written"] += len(products)
+        self.stats.update({f"listing_{key}": value for key, value in (stats or {}).items()})
+
+    def _details(self, results: List[dict]) -> None:
+        # 同一天同一個 product 抓了不只一次時用最後一次的結果
+        by_day: Dict[str, Dict[int, dict]] = defaultdict(dict)
+        for r in results:
+            if r["price"] is None:
+                self.stats["detail_unparsed"] += 1
+                self._failed(f"no price in {r['url']}")
+            elif r["product_id"] is not None:
+                by_day[r["day"]][r["product_id"]] = r
+        for day, rows in by_day.items():
+            self.stats["detail_priced"] += len(rows)
+            if not self.dry_run:
+                self._write_details(date.fromisoformat(day), rows)
+
+    def _write_details(self, day: date, rows: Dict[int, dict]) -> None:
+        """跟 PriceWriteBuffer 一樣：只補 product 缺的 sku / location，價格寫進 day 那天"""
+        products = {p.id: p for p in self.repo.get_products_by_ids(rows)}
+        updates = [
+            {"id": pid, "sku": r["sku"] or products[pid].sku, "location": r["location"] or products[pid].location}
+            for pid, r in rows.items()
+            if pid in products and (products[pid].sku is None or products[pid].location is None)
+            and (r["sku"] or r["location"])
+        ]
+        if updates:
+            self.stats["detail_product_updates"] += self.repo.update_products_bulk(updates)
+        prices = [{"product_id": pid, "price": r["price"], "created_at": day}
+                  for pid, r in rows.items() if pid in products]
+        self.stats["detail_price_rows"] += self.repo.insert_price_histories(prices)
+        self.repo.complete_fetch_tasks([row["product_id"] for row in prices], day)
+        self.stats["detail_unknown_products"] += len(rows) - len(prices)
+
+
+def reparse(repo, day: str, kind: str = None, processes: int = None, chunk_pages: int = 200,
+            incremental: bool = False, dry_run: bool = False, show_failures: int = 10,
+            root: str = None) -> Reingest:
+    processes = processes or os.cpu_count() or 1
+    records = list(html_archive.iter_records(day, root=root, kind=kind))
+    chunks = chunk_records(records, chunk_pages)
+    ingest = Reingest(repo, incremental=incremental, dry_run=dry_run, show_failures=show_failures)
+    logger.info(f"🗄️ Reparsing {len(records)} archived pages from {day} "
+                f"({len(chunks)} chunks, {processes} processes{', dry run' if dry_run else ''})")
+    started = time.perf_counter()
+    for results in map_chunks(chunks, processes):
+        ingest.add(results)
+    ingest.stats["seconds"] = time.perf_counter() - started
+    return ingest
+
+
+def print_report(day: str, ingest: Reingest) -> None:
+    stats = ingest.stats
+    pages = stats["listing_pages"] + stats["detail_pages"]
+    seconds = stats["seconds"] or 1e-9
+    print(f"{day}: {pages} pages in {seconds:.1f}s ({pages / seconds:,.0f} pages/s)")
+    if stats["listing_pages"]:
+        print(f"  listing: {stats['listing_pages']} pages, {stats['listing_products']} products, "
+              f"{stats['listing_unparsed']} unparsed"
+              + ("" if ingest.dry_run else f"; {stats['listing_written']} written")
+              + ("" if ingest.dry_run or not ingest.incremental else
+                 f" ({stats['listing_inserted']} new / {stats['listing_updated']} existing, "
+                 f"{stats['listing_price_changes']} price changes)"))
+    if stats["detail_pages"]:
+        print(f"  detail: {stats['detail_pages']} pages, {stats['detail_priced']} priced products, "
+              f"{stats['detail_unparsed']} without a price"
+              + ("" if ingest.dry_run else
+                 f"; {stats['detail_price_rows']} price rows sent, {stats['detail_product_updates']} sku/location "
+                 f"updates, {stats['detail_unknown_products']} products no longer in DB"))
+    if stats["corrupt_pages"]:
+        print(f"  ⚠️ {stats['corrupt_pages']} corrupt frames")
+    for failure in ingest.failures:
+        print(f"  ❌ {failure}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Re-run the parsers over the HTML archive and re-ingest the results")
+    parser.add_argument("--day", default=date.today().isoformat(), help="archive 的日期（YYYY-MM-DD，預設今天）")
+    parser.add_argument("--kind", choices=[KIND_LISTING, KIND_DETAIL], default=None, help="預設兩種都做")
+    parser.add_argument("--processes", type=int, default=0, help="解析用幾個 process（0 = CPU 核心數，1 = 不開 process）")
+    parser.add_argument("--chunk-pages", type=int, default=200, help="每個 process 一次處理幾頁")
+    parser.add_argument("--incremental", action="store_true", help="列表頁 upsert 並記錄列表價格（同 main.py）")
+    parser.add_argument("--dry-run", action="store_true", help="只解析，不寫 DB")
+    parser.add_argument("--show-failures", type=int, default=10, help="列出幾個仍然解析失敗的頁面")
+    parser.add_argument("--list", action="store_true", help="列出 archive 裡有哪些日期")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for day in html_archive.archive_days():
+            pages = Counter(record.kind for record in html_archive.iter_records(day))
+            print(f"{day}  " + ", ".join(f"{kind}={n}" for kind, n in sorted(pages.items())))
+        return
+
+    repo = None
+    if not args.dry_run:
+        from scraper.db.repository_factory import get_product_repo
+        repo = get_product_repo()
+    ingest = reparse(repo, args.day, args.kind, args.processes, args.chunk_pages,
+                     args.incremental, args.dry_run, args.show_failures)
+    print_report(args.day, ingest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# run_stats.py
+import math
+import time
+from typing import List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """nearest-rank percentile；sorted_values 需先排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class RunStats:
+    """
+    記錄一次執行中每個 item 的耗時與成功/失敗，結束時輸出 throughput 與 tail latency。
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.latencies: List[float] = []
+        self.outcomes: List[bool] = []  # 依完成順序的成功 / 失敗
+        self.success_count = 0
+        self.failure_count = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(ok)
+        if ok:
+            self.success_count += 1
+        else:
+            self.failure_count += 1
+
+    def all_or_nothing_losses(self, batch_size: int) -> int:
+        """
+        若依完成順序每 batch_size 個一批、整批只要有一個失敗就全部不寫入（舊的 run_batch 行為），
+        會被丟掉而需要重抓的成功數量
+        """
+        lost = 0
+        for i in range(0, len(self.outcomes), batch_size):
+            batch = self.outcomes[i:i + batch_size]
+            if not all(batch):
+                lost += sum(batch)
+        return lost
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> str:
+        total = self.success_count + self.failure_count
+        elapsed = self.elapsed
+        ordered = sorted(self.latencies)
+        return (
+            f"{total} items in {elapsed:.1f}s "
+            f"({self.success_count} ok, {self.failure_count} failed) → "
+            f"{total / elapsed if elapsed else 0:.2f} items/s; latency "
+            f"p50={percentile(ordered, 50):.2f}s p95={percentile(ordered, 95):.2f}s "
+            f"p99={percentile(ordered, 99):.2f}s max={ordered[-1] if ordered else 0:.2f}s"
+        )
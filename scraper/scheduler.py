@@ -0,0 +1,340 @@
+# scheduler.py
+# 明細抓取的優先順序：每天不是每個 product 都值得抓一次。依價格歷史估計每個 product 的變動率，
+# 排在前面的是「距離上次抓取這段時間內價格最可能已經變了」的 product：
+#
+#     score = P(價格已變) x 抓了之後可望維持正確的比例 x 類別權重 x FAILURE_DECAY ^ 近期失敗天數
+#     P(價格已變) = 1 - exp(-變動率 x 距上次成功抓取的天數)
+#     可望維持正確的比例 = (1 - exp(-變動率 x H)) / (變動率 x H)，H = 平均多久輪一次（product 數 / 每天 budget）
+#
+# 第二項讓幾乎每天都變價的 product 不會吃掉整個 budget：抓了隔天又過期，花在較穩定的 product 上 freshness 比較高。
+# 變動率 = 觀察期間的變動次數 / 天數，以同類別的平均變動率當 prior（SCHEDULER_PRIOR_DAYS 天的權重）平滑，
+# 歷史很短的新 product 不會被估成 0 或 1。超過 SCHEDULER_MAX_AGE_DAYS 天沒抓到的 product 一律排到前面，不會餓死；
+# lookback 期間完全沒有價格的（新 product）最優先。
+#
+# seed_fetch_queue 新增 task 時寫入 priority，claim_products 依 priority 由高到低領取；
+# FETCH_DAILY_BUDGET 限制每天總共的 page load（所有 process 的 claim 次數合計）。
+#
+#     python -m scraper.scheduler top --limit 20                         # 今天優先順序最高的 products
+#     python -m scraper.scheduler replay --days 60 --budget 500 --budget 1000
+#         # 用 DB 裡的價格歷史回放：每天只抓 budget 個時，各策略的 freshness 與每 1,000 次 page load 抓到的變動
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional
+import argparse
+import heapq
+import logging
+import math
+import random
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.orm import Session
+
+from scraper.config import Config
+from scraper.db.model import Product, ProductFetchTask, ProductPriceHistory, ProductPriceSpan
+from scraper.db.price_spans import MODE_CHANGES, storage_mode
+from scraper.logger_setup import get_logger
+
+logger = get_logger(__name__, log_file="logs/scheduler.log", level=logging.DEBUG)
+
+# 沒有任何類別資料時假設的變動率（每天）
+DEFAULT_CHANGE_RATE = 1 / 30
+# lookback 期間沒有價格的 product：比任何「可能已變」、超過 MAX_AGE 的 product 都優先
+NEVER_FETCHED_SCORE = 3.0
+
+
+def parse_category_weights(text: str) -> Dict[str, float]:
+    """'produce=2,meat=1.5' → {'produce': 2.0, 'meat': 1.5}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+@dataclass
+class ProductStats:
+    """一個 product 在 lookback 期間的觀察：第一次 / 最後一次成功抓到價格的日期、價格變動次數、失敗天數"""
+    product_id: int
+    category: Optional[str] = None
+    first_seen: Optional[date] = None
+    last_fetched: Optional[date] = None
+    changes: int = 0
+    failures: int = 0
+
+    @property
+    def observed_days(self) -> int:
+        if self.first_seen is None:
+            return 0
+        return (self.last_fetched - self.first_seen).days
+
+
+@dataclass
+class PriorityScorer:
+    category_weights: Dict[str, float] = field(
+        default_factory=lambda: parse_category_weights(Config.SCHEDULER_CATEGORY_WEIGHTS))
+    prior_days: float = field(default_factory=lambda: Config.SCHEDULER_PRIOR_DAYS)
+    max_age_days: int = field(default_factory=lambda: Config.SCHEDULER_MAX_AGE_DAYS)
+    failure_decay: float = field(default_factory=lambda: Config.SCHEDULER_FAILURE_DECAY)
+
+    @staticmethod
+    def category_rates(stats: Iterable[ProductStats]) -> Dict[Optional[str], float]:
+        """{類別: 平均每天變動次數}；key None 是全部 product 的平均（沒有類別時的 prior）"""
+        changes: Dict[Optional[str], int] = {}
+        days: Dict[Optional[str], int] = {}
+        for s in stats:
+            for key in {s.category, None}:
+                changes[key] = changes.get(key, 0) + s.changes
+                days[key] = days.get(key, 0) + s.observed_days
+        overall = changes.get(None, 0) / days[None] if days.get(None) else DEFAULT_CHANGE_RATE
+        return {key: (changes[key] / days[key] if days[key] else overall) for key in changes} | {None: overall}
+
+    def change_rate(self, s: ProductStats, rates: Dict[Optional[str], float]) -> float:
+        prior = rates.get(s.category, rates.get(None, DEFAULT_CHANGE_RATE))
+        return (s.changes + self.prior_days * prior) / (s.observed_days + self.prior_days)
+
+    def score(self, s: ProductStats, day: date, rates: Dict[Optional[str], float], horizon: float = 1.0) -> float:
+        if s.last_fetched is None:
+            base = NEVER_FETCHED_SCORE
+        else:
+            age = (day - s.last_fetched).days
+            if age <= 0:
+                return 0.0
+            rate = self.change_rate(s, rates)
+            # rate → 0 的極限是 0（歷史太短、完全沒看過價格變動時會發生）
+            base = 0.0
+            if rate > 0:
+                base = (1 - math.exp(-rate * age)) * (1 - math.exp(-rate * horizon)) / (rate * horizon)
+            if age >= self.max_age_days:
+                base += 1.0
+        return base * self.category_weights.get(s.category, 1.0) * self.failure_decay ** s.failures
+
+    def rank(self, stats: Iterable[ProductStats], day: date, budget: int = None) -> Dict[int, float]:
+        """{product_id: score}；budget 為每天的 page load 數（None 表示每天都能全抓）"""
+        stats = list(stats)
+        rates = self.category_rates(stats)
+        horizon = max(1.0, len(stats) / budget) if budget else 1.0
+        return {s.product_id: self.score(s, day, rates, horizon) for s in stats}
+
+
+# ----------------------------------------------------------------------
+# 從 DB 載入觀察
+# ----------------------------------------------------------------------
+def _observations_daily(db: Session, start: date, day: date):
+    """daily：每天一筆，用 lag() 與前一筆價格比較，算出變動次數"""
+    previous = func.lag(ProductPriceHistory.price).over(
+        partition_by=ProductPriceHistory.product_id, order_by=ProductPriceHistory.created_at)
+    rows = (
+        select(ProductPriceHistory.product_id, ProductPriceHistory.created_at,
+               ProductPriceHistory.price, previous.label('previous'))
+        .where(ProductPriceHistory.created_at >= start, ProductPriceHistory.created_at < day)
+        .subquery()
+    )
+    changed = case((and_(rows.c.previous.isnot(None), rows.c.price != rows.c.previous), 1), else_=0)
+    return db.execute(
+        select(rows.c.product_id, func.min(rows.c.created_at), func.max(rows.c.created_at), func.sum(changed))
+        .group_by(rows.c.product_id)
+    ).all()
+
+
+def _observations_spans(db: Session, start: date, day: date):
+    """changes：lookback 期間內開始的 span 各是一次變動；checked_at 是最後一次確認價格的日期"""
+    return [
+        (product_id, max(first, start), last, changes)
+        for product_id, first, last, changes in db.execute(
+            select(ProductPriceSpan.product_id,
+                   func.min(ProductPriceSpan.valid_from),
+                   func.max(ProductPriceSpan.checked_at),
+                   func.sum(case((ProductPriceSpan.valid_from > start, 1), else_=0)))
+            .where(or_(ProductPriceSpan.valid_to.is_(None), ProductPriceSpan.valid_to > start),
+                   ProductPriceSpan.valid_from < day)
+            .group_by(ProductPriceSpan.product_id)
+        ).all()
+    ]
+
+
+def load_stats(db: Session, day: date = None, lookback_days: int = None) -> Dict[int, ProductStats]:
+    """所有 products 在 [day - lookback_days, day) 的 ProductStats（依 PRICE_STORAGE_MODE 讀對應的資料表）"""
+    day = day or date.today()
+    start = day - timedelta(days=lookback_days or Config.SCHEDULER_LOOKBACK_DAYS)
+    stats = {pid: ProductStats(pid, category) for pid, category in db.execute(select(Product.id, Product.category))}
+
+    load = _observations_spans if storage_mode() == MODE_CHANGES else _observations_daily
+    for product_id, first, last, changes in load(db, start, day):
+        s = stats.get(product_id)
+        if s is not None:
+            s.first_seen, s.last_fetched, s.changes = first, last, int(changes or 0)
+
+    failures = db.execute(
+        select(ProductFetchTask.product_id, func.count())
+        .where(ProductFetchTask.work_date >= start, ProductFetchTask.work_date < day,
+               ProductFetchTask.status.in_([ProductFetchTask.STATUS_FAILED, ProductFetchTask.STATUS_DEAD]))
+        .group_by(ProductFetchTask.product_id)
+    ).all()
+    for product_id, count in failures:
+        if product_id in stats:
+            stats[product_id].failures = count
+    return stats
+
+
+def priorities(db: Session, day: date = None, scorer: PriorityScorer = None) -> Dict[int, float]:
+    """{product_id: priority}：seed_fetch_queue 寫進 product_fetch_queue.priority"""
+    day = day or date.today()
+    return (scorer or PriorityScorer()).rank(load_stats(db, day).values(), day, Config.FETCH_DAILY_BUDGET or None)
+
+
+# ----------------------------------------------------------------------
+# 回放模擬
+# ----------------------------------------------------------------------
+Policy = Callable[[Dict[int, ProductStats], date, int, random.Random], List[int]]
+
+
+def policy_random(stats: Dict[int, ProductStats], day: date, budget: int, rng: random.Random) -> List[int]:
+    """原本的 get_product_random：每天均勻隨機"""
+    return rng.sample(list(stats), min(budget, len(stats)))
+
+
+def policy_oldest(stats: Dict[int, ProductStats], day: date, budget: int, rng: random.Random) -> List[int]:
+    """round robin：最久沒抓的先抓"""
+    return heapq.nsmallest(budget, stats, key=lambda pid: (stats[pid].last_fetched or date.min, pid))
+
+
+def policy_priority(scorer: PriorityScorer = None) -> Policy:
+    scorer = scorer or PriorityScorer()
+
+    def choose(stats: Dict[int, ProductStats], day: date, budget: int, rng: random.Random) -> List[int]:
+        scores = scorer.rank(stats.values(), day, budget)
+        return heapq.nlargest(budget, scores, key=scores.get)
+
+    return choose
+
+
+POLICIES: Dict[str, Callable[[], Policy]] = {
+    'random': lambda: policy_random,
+    'oldest': lambda: policy_oldest,
+    'priority': policy_priority,
+}
+
+
+@dataclass
+class ReplayResult:
+    policy: str
+    budget: int
+    days: int
+    page_loads: int = 0
+    changes_caught: int = 0
+    fresh_product_days: int = 0
+    product_days: int = 0
+
+    @property
+    def freshness(self) -> float:
+        """每天結束時，已知價格與實際價格相同的 product 比例（平均）"""
+        return self.fresh_product_days / self.product_days if self.product_days else 0.0
+
+    @property
+    def caught_per_1000(self) -> float:
+        return self.changes_caught / self.page_loads * 1000 if self.page_loads else 0.0
+
+
+def replay(truth: Dict[date, Dict[int, Decimal]], categories: Dict[int, str], budget: int,
+           policy: str = 'priority', warmup_days: int = 30, seed: int = 0) -> ReplayResult:
+    """
+    truth：{日期: {product_id: 當天的實際價格}}（例如 get_prices_on 重建的每日價格）。
+    前 warmup_days 天當作每天全抓（產生歷史的那段期間），之後每天只能抓 budget 個：
+    策略只看得到自己抓過的價格，抓到的價格與已知的不同即「抓到一次變動」。
+    """
+    days = sorted(truth)
+    rng = random.Random(seed)
+    choose = POLICIES[policy]()
+    stats: Dict[int, ProductStats] = {}
+    known: Dict[int, Decimal] = {}
+
+    def observe(product_id: int, day: date, price: Decimal) -> bool:
+        s = stats.setdefault(product_id, ProductStats(product_id, categories.get(product_id)))
+        changed = product_id in known and known[product_id] != price
+        if s.first_seen is None:
+            s.first_seen = day
+        s.last_fetched = day
+        s.changes += changed
+        known[product_id] = price
+        return changed
+
+    for day in days[:warmup_days]:
+        for product_id, price in truth[day].items():
+            observe(product_id, day, price)
+
+    result = ReplayResult(policy, budget, len(days) - warmup_days)
+    for day in days[warmup_days:]:
+        prices = truth[day]
+        for product_id in prices.keys() - stats.keys():
+            stats[product_id] = ProductStats(product_id, categories.get(product_id))  # 新 product：還沒抓過
+        for product_id in choose(stats, day, budget, rng):
+            result.page_loads += 1
+            if product_id in prices:
+                result.changes_caught += observe(product_id, day, prices[product_id])
+            else:
+                stats[product_id].failures += 1  # 當天沒有價格：當作抓取失敗
+        result.fresh_product_days += sum(1 for pid, price in prices.items() if known.get(pid) == price)
+        result.product_days += len(prices)
+    return result
+
+
+def load_truth(repo, days: int, end: date = None) -> Dict[date, Dict[int, Decimal]]:
+    """最近 days 天每天的實際價格（repo.get_prices_on，兩種儲存方式皆可）"""
+    end = end or date.today() - timedelta(days=1)
+    return {end - timedelta(days=offset): repo.get_prices_on(end - timedelta(days=offset))
+            for offset in range(days - 1, -1, -1)}
+
+
+def replay_table(truth: Dict[date, Dict[int, Decimal]], categories: Dict[int, str], budgets: List[int],
+                 policies: List[str] = None, warmup_days: int = 30) -> List[ReplayResult]:
+    results = []
+    for budget in budgets:
+        for policy in policies or list(POLICIES):
+            results.append(replay(truth, categories, budget, policy, warmup_days))
+    return results
+
+
+def print_replay(results: List[ReplayResult]) -> None:
+    print(f"{'budget/day':>10}  {'policy':<9}{'page loads':>11}{'freshness':>11}{'changes caught':>16}{'per 1,000 loads':>17}")
+    for r in results:
+        print(f"{r.budget:>10,}  {r.policy:<9}{r.page_loads:>11,}{r.freshness:>10.1%}{r.changes_caught:>16,}"
+              f"{r.caught_per_1000:>17.1f}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Priority scheduling for detail fetches")
+    sub = parser.add_subparsers(dest="command", required=True)
+    top = sub.add_parser("top", help="今天優先順序最高的 products")
+    top.add_argument("--limit", type=int, default=20)
+    rep = sub.add_parser("replay", help="用 DB 的價格歷史回放各策略")
+    rep.add_argument("--days", type=int, default=60, help="回放最近幾天（含 warmup）")
+    rep.add_argument("--warmup", type=int, default=30, help="前幾天當作每天全抓，用來建立歷史")
+    rep.add_argument("--budget", type=int, action="append", help="每天的 page load 數，可指定多次")
+    rep.add_argument("--policy", action="append", choices=list(POLICIES), help="預設全部")
+    args = parser.parse_args(argv)
+    if args.command == "replay" and args.days <= args.warmup:
+        rep.error(f"--days ({args.days}) must be greater than --warmup ({args.warmup})")
+
+    from scraper.db.repository_factory import get_product_repo
+    repo = get_product_repo()
+    if args.command == "top":
+        with repo.get_session() as db:
+            stats = load_stats(db)
+            scores = PriorityScorer().rank(stats.values(), date.today(), Config.FETCH_DAILY_BUDGET or None)
+        for product_id in heapq.nlargest(args.limit, scores, key=scores.get):
+            s = stats[product_id]
+            print(f"{product_id:>8}  {scores[product_id]:6.3f}  {s.category or '-':<20} last={s.last_fetched} "
+                  f"changes={s.changes} over {s.observed_days}d failures={s.failures}")
+        return
+
+    truth = load_truth(repo, args.days)
+    categories = {row.id: row.category for row in repo.iter_products()}
+    catalogue = len(categories)
+    budgets = args.budget or [max(1, catalogue // 20), max(1, catalogue // 10)]
+    print(f"Replaying {args.days - args.warmup} days ({args.warmup} warm-up) over {catalogue:,} products")
+    print_replay(replay_table(truth, categories, budgets, args.policy, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
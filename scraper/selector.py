@@ -10,6 +10,7 @@ class Selector:
     LIST_OF_PRODUCTS: str = 'ul.fp-product-list div.fp-item-content'
     NEXT_PAGE_BTN: str = 'li.fp-pager-item-next a.fp-btn-next'
     NEXT_PAGE_BTN_PARENT: str = 'li.fp-pager-item-next'
+    PAGER_ITEM: str = 'ul.fp-pager li.fp-pager-item'  # 分頁列每一個按鈕（含頁數）
 
 @dataclass(frozen=True)
 class ProductDetailSelector:
@@ -0,0 +1,39 @@
+# tests/conftest.py
+# 共用 fixture：暫存 SQLite 的 repository（沿用 benchmarks._db），明細 pipeline 改用它
+import pytest
+
+from benchmarks._db import make_repo
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'test.sqlite'}"
+
+
+@pytest.fixture
+def repo_engine(sqlite_url):
+    """(repo, engine)：sync repository，*_async 方法退回 thread pool"""
+    repo, engine = make_repo(sqlite_url)
+    yield repo, engine
+    engine.dispose()
+
+
+@pytest.fixture
+def async_repo_engine(sqlite_url):
+    """(repo, engine)：*_async 方法走 aiosqlite"""
+    pytest.importorskip("aiosqlite")
+    repo, engine = make_repo(sqlite_url, async_driver=True)
+    yield repo, engine
+    engine.dispose()
+
+
+@pytest.fixture
+def detail_repo(monkeypatch, repo_engine):
+    """讓 fetch_product_price 的 pipeline 寫進暫存 SQLite，不開 browser context pool"""
+    from scraper import fetch_product_price
+    from scraper.config import Config
+
+    repo, engine = repo_engine
+    monkeypatch.setattr(fetch_product_price, "repo", repo)
+    monkeypatch.setattr(Config, "CONTEXT_POOL", False)
+    return repo, engine
@@ -0,0 +1,127 @@
+# tests/test_adaptive_limiter.py
+# AdaptiveLimiter（AIMD）：規則本身 + stub server 注入延遲與 503 的模擬（沿用 benchmarks.adaptive_concurrency）
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.adaptive_concurrency import ROUTES, _simulate, latency_model
+from benchmarks.stub_server import StubServer
+from scraper.adaptive_limiter import AdaptiveLimiter, is_overload
+from scraper.fetch_product_price import fetch_product_detail
+from scraper.http_fetcher import HttpDetailFetcher, HttpFetchError
+
+
+async def _use(limiter: AdaptiveLimiter, error: Exception = None, seconds: float = 0.0) -> None:
+    try:
+        async with limiter.slot():
+            await asyncio.sleep(seconds)
+            if error is not None:
+                raise error
+    except Exception as e:
+        if e is not error:
+            raise
+
+
+def test_additive_increase_after_a_full_window():
+    async def run():
+        limiter = AdaptiveLimiter(min_limit=1, max_limit=4, initial=2, latency_tolerance=100)
+        for _ in range(2):
+            await _use(limiter)
+        assert limiter.limit == 3
+        for _ in range(3 + 4 + 10):
+            await _use(limiter)
+        return limiter
+    limiter = asyncio.run(run())
+    assert limiter.limit == limiter.max_limit == 4
+    assert limiter.increases == 2
+
+
+def test_overload_halves_once_per_epoch():
+    async def run():
+        limiter = AdaptiveLimiter(min_limit=2, max_limit=16, initial=16)
+        # 同一批（上次減少前就開始的）request 一起失敗只減一次
+        await asyncio.gather(*(_use(limiter, HttpFetchError("HTTP 503", status_code=503), 0.01) for _ in range(8)))
+        assert limiter.limit == 8
+        await _use(limiter, HttpFetchError("HTTP 429", status_code=429))
+        await _use(limiter, asyncio.TimeoutError())
+        await _use(limiter, HttpFetchError("HTTP 503", status_code=503))
+        return limiter
+    limiter = asyncio.run(run())
+    assert limiter.limit == limiter.min_limit == 2
+    assert limiter.overloads == 11
+    assert limiter.decreases == 3  # 16 → 8 → 4 → 2，已經是 min_limit 的那次不算
+
+
+@pytest.mark.parametrize("error", [HttpFetchError("HTTP 404", status_code=404),
+                                   HttpFetchError("price not found in static HTML"), ValueError("bad price")])
+def test_other_errors_keep_the_limit(error):
+    async def run():
+        limiter = AdaptiveLimiter(min_limit=1, max_limit=8, initial=4)
+        await _use(limiter, error)
+        return limiter
+    limiter = asyncio.run(run())
+    assert limiter.limit == 4
+    assert limiter.overloads == limiter.decreases == 0
+
+
+class _NoBrowser:
+    """Playwright fallback 不應該被用到"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"fell back to Playwright (browser.{name})")
+
+
+def test_http_timeout_halves_the_limit_without_playwright_fallback():
+    async def run():
+        limiter = AdaptiveLimiter(min_limit=1, max_limit=8, initial=8)
+        prod = SimpleNamespace(id=1, url=server.url("/shop/product/1"))
+        async with HttpDetailFetcher(max_connections=2, timeout=0.05) as fetcher:
+            with pytest.raises(HttpFetchError) as exc_info:
+                await fetch_product_detail(prod, limiter, _NoBrowser(), http_fetcher=fetcher)
+        return limiter, exc_info.value
+
+    with StubServer(ROUTES, latency=0.5) as server:
+        limiter, error = asyncio.run(run())
+    assert error.timeout and is_overload(error)
+    assert "ReadTimeout" in str(error)
+    assert limiter.limit == 4
+    assert limiter.overloads == limiter.decreases == 1
+
+
+def test_slot_never_exceeds_limit():
+    async def run():
+        limiter = AdaptiveLimiter(min_limit=3, max_limit=3)
+        peak = 0
+
+        async def task():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.005)
+        await asyncio.gather(*(task() for _ in range(30)))
+        return peak, limiter
+    peak, limiter = asyncio.run(run())
+    assert peak == 3
+    assert limiter.in_flight == 0
+
+
+def _simulation(min_limit: int, max_limit: int, initial: int, products: int = 120):
+    with StubServer(ROUTES, latency=latency_model(0.02, 0.005), capacity=6) as server:
+        limiter = AdaptiveLimiter(min_limit=min_limit, max_limit=max_limit, initial=initial)
+        outcome, _ = asyncio.run(_simulate(server, limiter, products, degraded_capacity=3))
+    return limiter, outcome, server
+
+
+def test_aimd_backs_off_when_the_server_degrades():
+    """capacity 6 → 3：AIMD 的 503 遠少於固定 12 個並行，成功數遠多於它"""
+    fixed, fixed_outcome, fixed_server = _simulation(12, 12, 12)
+    aimd, aimd_outcome, aimd_server = _simulation(1, 12, 2)
+
+    assert aimd_outcome["ok"] + aimd_outcome["failed"] == 120
+    assert aimd.decreases >= 1 and aimd.increases >= 1
+    assert aimd.peak_limit < aimd.max_limit
+    assert all(aimd.min_limit <= limit <= aimd.max_limit for _, limit in aimd.history)
+    assert aimd_server.rejected_count * 3 < fixed_server.rejected_count
+    assert aimd_outcome["ok"] > fixed_outcome["ok"]
+    assert fixed.limit == 12
@@ -0,0 +1,107 @@
+# tests/test_async_repository.py
+# *_async repository 路徑：PriceWriteBuffer + claim 的寫入不漏、不重複，DB 等待期間不卡住 event loop
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import seed_products
+from benchmarks.event_loop_lag import _monitor, _pipeline
+from scraper.db import product_repo
+from scraper.db.model import ProductFetchTask, ProductPriceHistory
+from scraper.db.write_buffer import PriceWriteBuffer
+
+PRODUCTS = 300
+SLOW_DB = 0.3
+
+
+def _assert_written_once(engine, products: int) -> None:
+    with sessionmaker(bind=engine)() as session:
+        per_product = Counter(session.scalars(select(ProductPriceHistory.product_id)))
+        statuses = Counter(session.scalars(select(ProductFetchTask.status)))
+    assert len(per_product) == products
+    assert set(per_product.values()) == {1}
+    assert statuses == {ProductFetchTask.STATUS_DONE: products}
+
+
+@pytest.mark.parametrize("mode", ["thread", "async"])
+def test_pipeline_writes_every_product_once(mode, request):
+    repo, engine = request.getfixturevalue("async_repo_engine" if mode == "async" else "repo_engine")
+    seed_products(engine, PRODUCTS)
+    repo.seed_fetch_queue()
+    result = asyncio.run(_pipeline(repo, mode, workers=8, batch=40, page_latency=0.001, flush_size=64))
+    assert result["done"] == result["prices"] == PRODUCTS
+    _assert_written_once(engine, PRODUCTS)
+
+
+def test_concurrent_claims_do_not_overlap(async_repo_engine):
+    repo, engine = async_repo_engine
+    seed_products(engine, PRODUCTS)
+    repo.seed_fetch_queue()
+
+    async def worker(worker_id: str) -> list:
+        claimed = []
+        while products := await repo.claim_products_async(worker_id, 25):
+            claimed.extend(p.id for p in products)
+        return claimed
+
+    async def run():
+        return await asyncio.gather(*(worker(f"w{i}") for i in range(4)))
+
+    claims = asyncio.run(run())
+    ids = [product_id for claimed in claims for product_id in claimed]
+    assert len(ids) == len(set(ids)) == PRODUCTS
+
+
+def _flush_lag(repo, flush) -> float:
+    """flush 一批結果的同時量 event loop lag，回傳最大值"""
+    async def run():
+        buffer = PriceWriteBuffer(repo, flush_size=PRODUCTS * 3, complete_tasks=True)  # 價格 + sku 更新，不自動 flush
+        for prod in await repo.claim_products_async("test", PRODUCTS):
+            await buffer.add_result_async({"prod": prod, "price": 1.23, "sku": "sku", "location": "Aisle 1"})
+        lags, stop = [], asyncio.Event()
+        monitor = asyncio.create_task(_monitor(lags, stop))
+        await asyncio.sleep(0.02)
+        await flush(buffer)
+        await asyncio.sleep(0.02)
+        stop.set()
+        await monitor
+        return max(lags)
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def slow_price_insert(monkeypatch):
+    """價格寫入多花 SLOW_DB 秒（模擬遠端 DB 的等待）"""
+    insert = product_repo._insert_price_histories
+
+    def slow(db, *args):
+        time.sleep(SLOW_DB)
+        return insert(db, *args)
+    monkeypatch.setattr(product_repo, "_insert_price_histories", slow)
+
+
+def test_async_flush_does_not_block_event_loop(repo_engine, slow_price_insert):
+    repo, engine = repo_engine
+    seed_products(engine, PRODUCTS)
+    repo.seed_fetch_queue()
+
+    async def flush_async(buffer):
+        await buffer.flush_async()
+    lag = _flush_lag(repo, flush_async)
+    assert lag < SLOW_DB / 3
+    _assert_written_once(engine, PRODUCTS)
+
+
+def test_sync_flush_blocks_event_loop(repo_engine, slow_price_insert):
+    """對照組：在 event loop 裡直接呼叫 sync flush，lag 至少是 DB 的等待時間"""
+    repo, engine = repo_engine
+    seed_products(engine, PRODUCTS)
+    repo.seed_fetch_queue()
+
+    async def flush_sync(buffer):
+        buffer.flush()
+    assert _flush_lag(repo, flush_sync) >= SLOW_DB * 0.9
@@ -0,0 +1,102 @@
+# tests/test_category_crawler.py
+# async 列表 crawl（PAGINATION_MODE=url）：用假的 browser / 分頁模擬某一頁一直載入失敗
+import asyncio
+
+import pytest
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeout
+
+from scraper import category_crawler
+from scraper.config import Config
+from scraper.rate_limiter import HostRateLimiter
+
+BASE_URL = "https://www.dropit.bm/shop/dairy/d/22886620#!/?limit=96&page=1"
+TOTAL_PAGES = 4
+
+
+class FakeTab:
+    def __init__(self, failures: dict):
+        self.failures = failures
+        self.url = None
+
+    async def goto(self, url, wait_until=None):
+        self.url = url
+        error = self.failures.get(int(url.rsplit("=", 1)[1]))
+        if error is not None:
+            raise error
+
+    async def wait_for_selector(self, selector, timeout=None):
+        return None
+
+    async def content(self):
+        return "<html><body></body></html>"
+
+    async def eval_on_selector_all(self, selector, script):
+        return [str(n) for n in range(1, TOTAL_PAGES + 1)] + ["Next"]
+
+    async def close(self):
+        return None
+
+
+class FakeContext:
+    def __init__(self, failures: dict):
+        self.failures = failures
+
+    async def new_page(self):
+        return FakeTab(self.failures)
+
+    async def close(self):
+        return None
+
+
+class FakeBrowser:
+    def __init__(self, failures: dict):
+        self.failures = failures
+
+    async def new_context(self, **options):
+        return FakeContext(self.failures)
+
+
+@pytest.fixture
+def listing_env(monkeypatch, repo_engine):
+    repo, _ = repo_engine
+    monkeypatch.setattr(category_crawler, "repo", repo)
+    monkeypatch.setattr(Config, "BLOCK_RESOURCES", False)
+    monkeypatch.setattr(Config, "PAGINATION_MODE", "url")
+    return repo
+
+
+def _crawl(failures: dict):
+    return asyncio.run(category_crawler.crawl_category(FakeBrowser(failures), "dairy", BASE_URL,
+                                                       HostRateLimiter(0), run_id="test"))
+
+
+def test_complete_crawl_has_no_error(listing_env):
+    result = _crawl({})
+    assert result.error is None
+    assert result.pages == TOTAL_PAGES
+
+
+def test_missing_page_marks_category_incomplete(listing_env):
+    result = _crawl({3: PlaywrightTimeout("Timeout 30000ms exceeded")})
+    assert result.error == f"incomplete: pages 1-2/{TOTAL_PAGES}"
+    checkpoint = listing_env.get_crawl_checkpoints("test")["dairy"]
+    assert checkpoint.last_page == 2
+
+
+def test_page_error_only_affects_that_page(listing_env):
+    """net::ERR_* 之類的錯誤跟 timeout 一樣只讓該頁失敗，其他頁照常寫入"""
+    collected = []
+
+    async def on_page(page_number, products):
+        collected.append(page_number)
+
+    async def run():
+        result = category_crawler.CategoryCrawlResult(category="dairy")
+        failures = {3: PlaywrightError("net::ERR_CONNECTION_RESET")}
+        return await category_crawler.paginate_by_url(FakeContext(failures), BASE_URL, "dairy", HostRateLimiter(0),
+                                                      result, set(), TOTAL_PAGES, 2, on_page)
+
+    assert asyncio.run(run()) == TOTAL_PAGES
+    assert sorted(collected) == [2, 4]
+    assert _crawl({3: PlaywrightError("Target page, context or browser has been closed")}).error == \
+        f"incomplete: pages 1-2/{TOTAL_PAGES}"
@@ -0,0 +1,48 @@
+# tests/test_detail_cache.py
+# DetailPageCache：多個 process（這裡用多個 instance）共用同一個 cache 檔時，容量上限是合計的大小
+import os
+import sqlite3
+
+from scraper.detail_cache import DetailPageCache
+
+FIELDS = {"price": 4.99, "sku": "0072250011297", "location": "Aisle 7"}
+
+
+def _body(i: int) -> bytes:
+    return os.urandom(2000) + f"<html>{i}</html>".encode()  # 隨機內容：壓縮後大小約 2 KB
+
+
+def _sum_size(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM detail_pages").fetchone()[0]
+
+
+def test_shared_file_stays_under_the_limit(tmp_path):
+    path = str(tmp_path / "detail_pages.sqlite3")
+    limit = 40_000
+    caches = [DetailPageCache(path, max_bytes=limit) for _ in range(3)]
+
+    # 三個 shard 交錯寫入同一個檔案，各自只看得到自己的 put
+    for i in range(60):
+        for n, cache in enumerate(caches):
+            cache.put(f"https://www.dropit.bm/shop/product/{n}-{i}", _body(i), FIELDS)
+    for cache in caches:
+        cache.close()
+
+    reopened = DetailPageCache(path, max_bytes=limit)
+    assert reopened.total_bytes == _sum_size(path)
+    assert limit - 3000 < reopened.total_bytes <= limit
+    assert sum(cache.evictions for cache in caches) > 0
+    reopened.close()
+
+
+def test_replacing_a_page_updates_the_shared_total(tmp_path):
+    path = str(tmp_path / "detail_pages.sqlite3")
+    first, second = DetailPageCache(path), DetailPageCache(path)
+    url = "https://www.dropit.bm/shop/product/1"
+    first.put(url, _body(1), FIELDS)
+    second.put(url, _body(2), FIELDS)
+    second.put("https://www.dropit.bm/shop/product/2", _body(3), FIELDS)
+    assert second.total_bytes == _sum_size(path)
+    first.close()
+    second.close()
@@ -0,0 +1,120 @@
+# tests/test_export_parquet.py
+# Parquet 匯出：daily（product_price_history）與 changes（product_price_span 展開）模式匯出的每日價格要一致
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import make_repo, seed_products
+from scraper.config import Config
+from scraper.db import price_spans
+from scraper.db.model import Product, ProductPriceHistory
+
+pytest.importorskip("pyarrow")
+from scraper.analytics import PriceAnalytics  # noqa: E402
+from scraper.export_parquet import export_price_history  # noqa: E402
+
+TODAY = date.today()
+# 每天的列表價格（None = 那天沒看到）
+OBSERVATIONS = {
+    TODAY - timedelta(days=3): ["1.00", "2.00", "3.00"],
+    TODAY - timedelta(days=2): ["1.00", "2.20", "3.00"],
+    TODAY - timedelta(days=1): ["1.10", "2.20", None],
+    TODAY: ["1.10", "2.00", None],
+}
+
+
+def _record(repo, days=OBSERVATIONS) -> None:
+    for day, prices in days.items():
+        products = [Product(name=f"Item {i}", price=Decimal(price), unit="ea",
+                            url=f"https://www.dropit.bm/shop/product/{i}")
+                    for i, price in enumerate(prices) if price is not None]
+        repo.upsert_listing_products(products, "dairy", day)
+
+
+def _exported(root) -> list:
+    df = PriceAnalytics(root).load(columns=["product_id", "price", "date", "category"])
+    return sorted((row.date.date(), row.product_id, round(row.price, 2), row.category) for row in df.itertuples())
+
+
+@pytest.fixture
+def storage_mode(monkeypatch):
+    def use(mode):
+        monkeypatch.setattr(Config, "PRICE_STORAGE_MODE", mode)
+    yield use
+    price_spans.reset_price_indexes()
+
+
+def test_changes_mode_export_matches_daily(tmp_path, storage_mode):
+    exports = {}
+    for mode in (price_spans.MODE_DAILY, price_spans.MODE_CHANGES):
+        storage_mode(mode)
+        repo, engine = make_repo(f"sqlite:///{tmp_path / mode}.sqlite")
+        _record(repo)
+        root = tmp_path / f"export-{mode}"
+        summary = export_price_history(repo, str(root))
+        exports[mode] = _exported(root)
+        assert summary["rows"] == len(exports[mode])
+        engine.dispose()
+
+    assert len(exports[price_spans.MODE_DAILY]) == 10
+    assert exports[price_spans.MODE_CHANGES] == exports[price_spans.MODE_DAILY]
+
+
+def test_changes_mode_incremental_export(tmp_path, storage_mode):
+    storage_mode(price_spans.MODE_CHANGES)
+    repo, engine = make_repo(f"sqlite:///{tmp_path / 'changes'}.sqlite")
+    root = str(tmp_path / "export")
+    _record(repo, {day: prices for day, prices in OBSERVATIONS.items() if day < TODAY})
+    export_price_history(repo, root)
+    assert max(row[0] for row in _exported(root)) == TODAY - timedelta(days=1)
+
+    # 今天的價格寫入後再匯出：只重新匯出最後一天以後，不會重複
+    _record(repo, {TODAY: OBSERVATIONS[TODAY]})
+    export_price_history(repo, root)
+    rows = _exported(root)
+    assert len(rows) == len(set(rows)) == 10
+    assert [row for row in rows if row[0] == TODAY] == [(TODAY, 1, 1.1, "dairy"), (TODAY, 2, 2.0, "dairy")]
+    engine.dispose()
+
+
+def test_switching_storage_mode_needs_full_export(tmp_path, storage_mode):
+    storage_mode(price_spans.MODE_DAILY)
+    repo, engine = make_repo(f"sqlite:///{tmp_path / 'db'}.sqlite")
+    _record(repo)
+    root = str(tmp_path / "export")
+    export_price_history(repo, root)
+
+    storage_mode(price_spans.MODE_CHANGES)
+    repo.backfill_price_spans()
+    with pytest.raises(RuntimeError, match="--full"):
+        export_price_history(repo, root)
+    export_price_history(repo, root, full=True)
+    assert len(_exported(root)) == 10
+    engine.dispose()
+
+
+def _insert_history(engine, ids) -> None:
+    rows = [{"id": i, "product_id": i, "price": Decimal("1.00") + i, "created_at": TODAY} for i in ids]
+    with sessionmaker(bind=engine)() as session:
+        session.execute(insert(ProductPriceHistory), rows)
+        session.commit()
+
+
+def test_late_committed_lower_ids_are_exported_once(tmp_path, storage_mode):
+    """Postgres 上 id 6、7 的 transaction 比 8-10 晚 commit：下一次匯出要補上，已匯出的不重複"""
+    storage_mode(price_spans.MODE_DAILY)
+    repo, engine = make_repo(f"sqlite:///{tmp_path / 'db'}.sqlite")
+    seed_products(engine, 12)
+    root = str(tmp_path / "export")
+    _insert_history(engine, [1, 2, 3, 4, 5, 8, 9, 10])
+    assert export_price_history(repo, root, chunk_size=3)["rows"] == 8
+
+    _insert_history(engine, [6, 7, 11])
+    assert export_price_history(repo, root, chunk_size=3)["rows"] == 3
+    assert export_price_history(repo, root, chunk_size=3)["rows"] == 0
+    df = PriceAnalytics(root).load(columns=["history_id"])
+    assert sorted(df["history_id"]) == list(range(1, 12))
+    engine.dispose()
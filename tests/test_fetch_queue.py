@@ -0,0 +1,57 @@
+# tests/test_fetch_queue.py
+# claim_products：所有 worker 共用同一個 priority 順序，FETCH_DAILY_BUDGET 在同時領取時也不會超過
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import seed_products
+from scraper.config import Config
+from scraper.db.model import FetchBudget, ProductFetchTask
+
+PRODUCTS = 120
+
+
+def _seeded(repo, engine) -> None:
+    seed_products(engine, PRODUCTS)
+    repo.seed_fetch_queue()
+
+
+def test_workers_claim_in_global_priority_order(repo_engine, monkeypatch):
+    repo, engine = repo_engine
+    monkeypatch.setattr(Config, "FETCH_DAILY_BUDGET", 0)
+    _seeded(repo, engine)
+    with sessionmaker(bind=engine)() as session:
+        # product_id 越大 priority 越高：id 分段領取的話，前幾批一定會混進低 priority 的
+        session.execute(update(ProductFetchTask).values(priority=ProductFetchTask.product_id * 1.0))
+        session.commit()
+
+    claimed = []
+    while batch := repo.claim_products(f"w{len(claimed) % 3}", 7):
+        claimed.append([p.id for p in batch])
+    # 每一批都比前一批的 priority 低（批次內的順序不重要）
+    assert all(min(earlier) > max(later) for earlier, later in zip(claimed, claimed[1:]))
+    flat = [product_id for batch in claimed for product_id in batch]
+    assert len(flat) == len(set(flat)) == PRODUCTS
+
+
+def test_concurrent_claims_never_exceed_the_budget(repo_engine, monkeypatch):
+    repo, engine = repo_engine
+    budget = 50
+    monkeypatch.setattr(Config, "FETCH_DAILY_BUDGET", budget)
+    _seeded(repo, engine)
+
+    def worker(worker_id: str) -> list:
+        claimed = []
+        while products := repo.claim_products(worker_id, 3):
+            claimed.extend(p.id for p in products)
+        return claimed
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        claims = list(pool.map(worker, [f"w{i}" for i in range(6)]))
+    ids = [product_id for claimed in claims for product_id in claimed]
+    assert len(ids) == len(set(ids)) == budget
+    assert repo.get_fetch_budget_left() == 0
+    with sessionmaker(bind=engine)() as session:
+        assert session.scalar(select(FetchBudget.used).where(FetchBudget.work_date == date.today())) == budget
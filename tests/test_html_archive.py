@@ -0,0 +1,36 @@
+# tests/test_html_archive.py
+# HtmlArchive：跨過午夜的 process 換到新日期的資料夾，寫入的頁面都讀得回來
+from datetime import date
+
+from scraper import html_archive
+from scraper.html_archive import HtmlArchive, archive_days, iter_records, read_pages
+
+
+class _Clock(date):
+    """可以撥動的 date.today()"""
+    current = date(2026, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+def test_append_rolls_over_to_a_new_day(tmp_path, monkeypatch):
+    monkeypatch.setattr(html_archive, "date", _Clock)
+    root = str(tmp_path)
+    archive = HtmlArchive(root=root, codec="zlib")
+    archive.append("detail", "https://www.dropit.bm/shop/product/1", "<html>1</html>", product_id=1)
+    first = archive.path
+    monkeypatch.setattr(_Clock, "current", date(2026, 3, 2))
+    archive.append("detail", "https://www.dropit.bm/shop/product/2", "<html>2</html>", product_id=2)
+    archive.append("detail", "https://www.dropit.bm/shop/product/3", "<html>3</html>", product_id=3)
+    archive.close()
+
+    assert archive.path != first
+    assert archive_days(root) == ["2026-03-01", "2026-03-02"]
+    pages = {day: [(r.day, r.meta["product_id"], html) for r, html in read_pages(iter_records(day, root))]
+             for day in archive_days(root)}
+    assert pages == {
+        "2026-03-01": [("2026-03-01", 1, "<html>1</html>")],
+        "2026-03-02": [("2026-03-02", 2, "<html>2</html>"), ("2026-03-02", 3, "<html>3</html>")],
+    }
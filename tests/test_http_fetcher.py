@@ -0,0 +1,113 @@
+# tests/test_http_fetcher.py
+# 純 HTTP 明細抓取：stub server 回放 fixtures/ 的明細頁，fake dropit 跑完整的 DetailFetchPipeline
+import asyncio
+import random
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fake_dropit import FakeDropit
+from benchmarks.http_fetcher import EXPECTED
+from benchmarks.stub_server import StubServer
+from scraper.config import Config
+from scraper.db.model import Product, ProductFetchTask, ProductPriceHistory
+from scraper.db.write_buffer import PriceWriteBuffer
+from scraper.fetch_product_price import DetailFetchPipeline
+from scraper.http_fetcher import HttpDetailFetcher, HttpFetchError
+
+ROUTES = {"/shop/product/": "product_detail.html", "/js-only/": "product_detail_js_only.html"}
+
+
+def _fetch(server: StubServer, path: str):
+    async def run():
+        async with HttpDetailFetcher(max_connections=2) as fetcher:
+            return await fetcher.fetch(SimpleNamespace(id=1, url=server.url(path)))
+    return asyncio.run(run())
+
+
+def test_fetch_parses_server_rendered_page():
+    with StubServer(ROUTES) as server:
+        result = _fetch(server, "/shop/product/1")
+    assert {key: result[key] for key in EXPECTED} == EXPECTED
+
+
+def test_fetch_rejects_js_only_page():
+    with StubServer(ROUTES) as server:
+        with pytest.raises(HttpFetchError) as exc_info:
+            _fetch(server, "/js-only/1")
+    assert exc_info.value.status_code is None
+
+
+def test_fetch_reports_status_code():
+    with StubServer(ROUTES) as server:
+        with pytest.raises(HttpFetchError) as exc_info:
+            _fetch(server, "/missing/1")
+    assert exc_info.value.status_code == 404
+
+
+def test_fetch_reports_overload_status():
+    with StubServer(ROUTES, error_rate=1.0, error_status=503) as server:
+        with pytest.raises(HttpFetchError) as exc_info:
+            _fetch(server, "/shop/product/1")
+    assert exc_info.value.status_code == 503
+
+
+def _seed_site_products(engine, site: FakeDropit) -> dict:
+    rows = [{**row, "created_at": date.today(), "updated_at": date.today()}
+            for row in site.product_rows("dairy", "dairy", 7)]
+    with sessionmaker(bind=engine)() as session:
+        session.execute(insert(Product), rows)
+        session.commit()
+    # url → 明細頁上的價格
+    return {row["url"]: Decimal(row["price"]) for row in rows}
+
+
+def _run_pipeline(repo) -> None:
+    async def run():
+        async with HttpDetailFetcher(max_connections=8) as fetcher:
+            pipeline = DetailFetchPipeline(None, PriceWriteBuffer(repo, flush_size=50, complete_tasks=True),
+                                           http_fetcher=fetcher, worker_id="test")
+            await pipeline.run()
+    asyncio.run(run())
+
+
+def test_pipeline_writes_every_price_once(detail_repo):
+    repo, engine = detail_repo
+    with FakeDropit(pages=2, per_page=40) as site:
+        expected = _seed_site_products(engine, site)
+        _run_pipeline(repo)
+
+    with sessionmaker(bind=engine)() as session:
+        prices = session.execute(
+            select(Product.url, ProductPriceHistory.price).join(ProductPriceHistory)
+        ).all()
+        statuses = Counter(session.scalars(select(ProductFetchTask.status)))
+        missing_sku = session.scalar(select(Product.id).where(Product.sku.is_(None)))
+    assert len(prices) == len(expected)
+    assert dict(prices) == expected
+    assert statuses == {ProductFetchTask.STATUS_DONE: len(expected)}
+    assert missing_sku is None
+
+
+def test_pipeline_retries_server_errors_without_duplicates(detail_repo, monkeypatch):
+    """隨機 503：失敗的 task 排定重試（backoff 設為 0），最後每個 product 剛好一筆價格"""
+    repo, engine = detail_repo
+    monkeypatch.setattr(Config, "FETCH_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(Config, "FETCH_MAX_ATTEMPTS", 20)
+    random.seed(0)
+    with FakeDropit(pages=2, per_page=40, error_rate=0.2) as site:
+        expected = _seed_site_products(engine, site)
+        _run_pipeline(repo)
+        assert site.error_count > 0
+
+    with sessionmaker(bind=engine)() as session:
+        per_product = Counter(session.scalars(select(ProductPriceHistory.product_id)))
+        statuses = Counter(session.scalars(select(ProductFetchTask.status)))
+    assert len(per_product) == len(expected)
+    assert set(per_product.values()) == {1}
+    assert statuses == {ProductFetchTask.STATUS_DONE: len(expected)}
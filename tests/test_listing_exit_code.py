@@ -0,0 +1,96 @@
+# tests/test_listing_exit_code.py
+# 結束狀態：任一類別失敗時 scraper.main / orchestrator listing 以 exit code 1 結束，其他類別照常完成；
+# orchestrator detail 有 shard crash 時也一樣
+import time
+
+import pytest
+
+from benchmarks._db import seed_products
+from scraper import category_crawler, main, orchestrator
+from scraper.category_crawler import CategoryCrawlResult
+from scraper.rate_limiter import HostRateLimiter
+
+CATEGORIES = {"dairy": "https://www.dropit.bm/shop/dairy", "meat": "https://www.dropit.bm/shop/meat",
+              "produce": "https://www.dropit.bm/shop/produce"}
+
+
+@pytest.fixture(autouse=True)
+def categories(monkeypatch):
+    monkeypatch.setattr(main, "CATEGORY_MAP", CATEGORIES)
+
+
+def _fake_crawl(errors: dict):
+    async def crawl_categories(category_map, **kwargs):
+        return [CategoryCrawlResult(category=cat, error=errors.get(cat)) for cat in category_map]
+    return crawl_categories
+
+
+@pytest.mark.parametrize("errors, failed", [({}, False), ({"meat": "Timeout 20000ms exceeded"}, True)])
+def test_parallel_exit_code(monkeypatch, errors, failed):
+    monkeypatch.setattr(category_crawler, "crawl_categories", _fake_crawl(errors))
+    if not failed:
+        main.main(["--parallel"])
+        return
+    with pytest.raises(SystemExit) as exc:
+        main.main(["--parallel"])
+    assert exc.value.code == 1
+
+
+def test_sequential_failure_does_not_stop_other_categories(monkeypatch):
+    crawled = []
+
+    def run_category_scraper(cat, url, **kwargs):
+        crawled.append(cat)
+        if cat == "dairy":
+            raise RuntimeError("page crashed")
+
+    monkeypatch.setattr(main, "resume_plan", lambda repo, run_id, category_map, resume: {c: 1 for c in category_map})
+    monkeypatch.setattr(main, "run_category_scraper", run_category_scraper)
+    with pytest.raises(SystemExit) as exc:
+        main.main([])
+    assert exc.value.code == 1
+    assert crawled == list(CATEGORIES)
+
+
+@pytest.mark.parametrize("failed", [[], ["meat"]])
+def test_orchestrator_listing_exit_code(monkeypatch, failed):
+    def orchestrate_listing(processes, **kwargs):
+        progress = orchestrator.ListingProgress(total=len(CATEGORIES))
+        progress.failed = list(failed)
+        return progress
+
+    monkeypatch.setattr(orchestrator, "orchestrate_listing", orchestrate_listing)
+    if not failed:
+        orchestrator.main(["listing", "--processes", "1"])
+        return
+    with pytest.raises(SystemExit) as exc:
+        orchestrator.main(["listing", "--processes", "1"])
+    assert exc.value.code == 1
+
+
+@pytest.mark.parametrize("results, crashed", [([{"ok": 1}, {"ok": 2}], []), ([None, {"ok": 3}], [0])])
+def test_orchestrator_detail_exit_code(monkeypatch, detail_repo, results, crashed):
+    _, engine = detail_repo
+    seed_products(engine, 5)
+    monkeypatch.setattr(orchestrator, "run_shards", lambda jobs, processes, progress: results)
+    if not crashed:
+        orchestrator.main(["detail", "--processes", "2"])
+        return
+    with pytest.raises(SystemExit) as exc:
+        orchestrator.main(["detail", "--processes", "2"])
+    assert exc.value.code == 1
+
+
+def test_detail_summary_lists_crashed_shards():
+    progress = orchestrator.DetailProgress(2)
+    progress.crashed = [1]
+    assert "shards [1] crashed" in progress.summary()
+
+
+def test_blocking_wait_spaces_requests_per_host():
+    limiter = HostRateLimiter(0.05)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.wait_blocking("https://www.dropit.bm/shop/dairy?page=2")
+    limiter.wait_blocking("https://other.example/")  # 其他 host 不用等
+    assert 0.1 <= time.monotonic() - started < 0.5
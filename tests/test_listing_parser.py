@@ -0,0 +1,63 @@
+# tests/test_listing_parser.py
+# 每個已安裝的列表頁 parser backend 都要跟 golden fixture（bs4 原始實作的結果）完全一致
+import json
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.fake_dropit import FakeCatalog
+from benchmarks.listing_parser import FIXTURE, GOLDEN, _as_rows
+from scraper import listing_parser
+from scraper.listing_parser import PARSER_BACKENDS, extract_product_info
+
+BACKENDS = sorted(PARSER_BACKENDS)
+
+BROKEN_ITEMS = """
+<ul class="fp-product-list">
+  <li class="fp-item"><div class="fp-item-content">
+    <div class="fp-item-name"><span><a href="/shop/product/no-price/p/1">No price</a></span></div>
+  </div></li>
+  <li class="fp-item"><div class="fp-item-content">
+    <div class="fp-item-name"><span>No link</span></div>
+    <div class="fp-item-price"><span class="fp-item-base-price">Sale</span></div>
+  </div></li>
+</ul>
+"""
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_golden_parity(backend):
+    golden = json.loads(GOLDEN.read_text(encoding="utf-8"))
+    rows = _as_rows(PARSER_BACKENDS[backend](FIXTURE.read_text(encoding="utf-8")))
+    assert rows == golden
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_fake_dropit_pages_match_catalog(backend):
+    catalog = FakeCatalog(pages=2, per_page=30, seed=3)
+    html = catalog.listing_fragment("dairy", 7, 2)
+    products = PARSER_BACKENDS[backend](html)
+    expected = [catalog.product(7, index, "dairy") for index in range(30, catalog.items_per_category)]
+    assert [(p.name, p.price, p.unit) for p in products] == [
+        (e["name"], Decimal(e["price"]), e["unit"]) for e in expected
+    ]
+    assert all(p.url.endswith(e["path"]) for p, e in zip(products, expected))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_missing_fields(backend):
+    assert _as_rows(PARSER_BACKENDS[backend](BROKEN_ITEMS)) == _as_rows(PARSER_BACKENDS["bs4"](BROKEN_ITEMS))
+    no_price, no_link = PARSER_BACKENDS[backend](BROKEN_ITEMS)
+    assert no_price.price is None and no_price.unit == 'N/A'
+    assert no_link.price is None and no_link.name == 'N/A'
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_empty_page(backend):
+    assert PARSER_BACKENDS[backend]("") == []
+
+
+def test_unknown_backend_falls_back_to_bs4(monkeypatch):
+    monkeypatch.setattr(listing_parser, "PARSER_BACKENDS", dict(PARSER_BACKENDS))
+    html = FIXTURE.read_text(encoding="utf-8")
+    assert _as_rows(extract_product_info(html, backend="nope")) == _as_rows(PARSER_BACKENDS["bs4"](html))
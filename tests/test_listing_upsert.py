@@ -0,0 +1,70 @@
+# tests/test_listing_upsert.py
+# --incremental 的 upsert_listing_products：價格沒變也記下當天的觀察，明細 fetch 只排還沒價格 / 缺 sku 的 product
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from scraper.config import Config
+from scraper.db import price_spans
+from scraper.db.model import Product, ProductFetchTask, ProductPriceHistory, ProductPriceSpan
+
+DAY1 = date.today() - timedelta(days=1)
+DAY2 = date.today()
+
+
+def _page(prices):
+    return [Product(name=f"Item {i}", price=Decimal(price), unit="ea", url=f"https://www.dropit.bm/shop/product/{i}")
+            for i, price in enumerate(prices)]
+
+
+@pytest.fixture(params=[price_spans.MODE_DAILY, price_spans.MODE_CHANGES])
+def storage_mode(request, monkeypatch):
+    monkeypatch.setattr(Config, "PRICE_STORAGE_MODE", request.param)
+    yield request.param
+    price_spans.reset_price_indexes()
+
+
+def test_unchanged_prices_are_recorded_for_the_day(repo_engine, storage_mode):
+    repo, engine = repo_engine
+    first = repo.upsert_listing_products(_page(["1.00", "2.00", "3.00"]), "dairy", DAY1)
+    second = repo.upsert_listing_products(_page(["1.00", "2.50", "3.00"]), "dairy", DAY2)
+    again = repo.upsert_listing_products(_page(["1.00", "2.50", "3.00"]), "dairy", DAY2)
+
+    assert first["price_changes"] == 3
+    assert second["price_changes"] == 1
+    assert again["price_changes"] == 0
+    with sessionmaker(bind=engine)() as session:
+        if storage_mode == price_spans.MODE_DAILY:
+            observed = session.execute(
+                select(ProductPriceHistory.created_at, ProductPriceHistory.price)
+            ).all()
+            assert sorted(observed) == sorted(
+                [(DAY1, Decimal(p)) for p in ("1.00", "2.00", "3.00")]
+                + [(DAY2, Decimal(p)) for p in ("1.00", "2.50", "3.00")]
+            )
+        else:
+            spans = session.execute(
+                select(ProductPriceSpan.price, ProductPriceSpan.valid_from, ProductPriceSpan.checked_at)
+                .where(ProductPriceSpan.valid_to.is_(None))
+            ).all()
+            assert sorted(spans) == [(Decimal("1.00"), DAY1, DAY2), (Decimal("2.50"), DAY2, DAY2),
+                                     (Decimal("3.00"), DAY1, DAY2)]
+
+
+def test_listing_priced_products_are_not_queued(repo_engine, storage_mode):
+    repo, engine = repo_engine
+    repo.upsert_listing_products(_page(["1.00", "2.00", "3.00"]), "dairy", DAY1)
+    repo.upsert_listing_products(_page(["1.00", "2.00"]), "dairy", DAY2)
+    with sessionmaker(bind=engine)() as session:
+        ids = dict(session.execute(select(Product.url, Product.id)).all())
+    item0, item1, item2 = (ids[f"https://www.dropit.bm/shop/product/{i}"] for i in range(3))
+    # item 0 已經有 sku / location；item 1 列表有價格但還沒抓過明細；item 2 今天列表上沒看到
+    repo.update_products_bulk([{"id": item0, "sku": "0072250011297", "location": "Aisle 7"}])
+
+    assert repo.seed_fetch_queue(DAY2) == 2
+    with sessionmaker(bind=engine)() as session:
+        queued = set(session.scalars(select(ProductFetchTask.product_id).where(ProductFetchTask.work_date == DAY2)))
+    assert queued == {item1, item2}
@@ -0,0 +1,13 @@
+# tests/test_scheduler_cli.py
+# python -m scraper.scheduler replay：--days 必須大於 --warmup（否則沒有任何一天可以回放）
+import pytest
+
+from scraper import scheduler
+
+
+@pytest.mark.parametrize("days, warmup", [(30, 30), (5, 30)])
+def test_replay_rejects_days_not_after_warmup(days, warmup, capsys):
+    with pytest.raises(SystemExit) as exc:
+        scheduler.main(["replay", "--days", str(days), "--warmup", str(warmup)])
+    assert exc.value.code == 2
+    assert "must be greater than --warmup" in capsys.readouterr().err
@@ -0,0 +1,38 @@
+# tests/test_write_buffer.py
+# PriceWriteBuffer：成功的結果寫價格並標記 done，沒有價格的結果與失敗一樣交給 fail_fetch_tasks
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._db import seed_products
+from scraper.db.model import ProductFetchTask, ProductPriceHistory
+from scraper.db.write_buffer import PriceWriteBuffer
+
+
+def _tasks(engine) -> dict:
+    with sessionmaker(bind=engine)() as session:
+        return {task.product_id: (task.status, task.last_error)
+                for task in session.scalars(select(ProductFetchTask))}
+
+
+def test_missing_price_is_recorded_as_failure(repo_engine):
+    repo, engine = repo_engine
+    seed_products(engine, 3)
+    repo.seed_fetch_queue()
+    priced, unparsed, failed = sorted(repo.claim_products("test", 3), key=lambda p: p.id)
+
+    buffer = PriceWriteBuffer(repo, flush_size=100, complete_tasks=True)
+    buffer.add_result({"prod": priced, "price": 4.99, "sku": "0072250011297", "location": "Aisle 7"})
+    buffer.add_result({"prod": unparsed, "price": None, "sku": "0072250011298", "location": "Aisle 8"})
+    buffer.add_failure(failed, "HttpFetchError: HTTP 503")
+    buffer.flush()
+
+    with sessionmaker(bind=engine)() as session:
+        priced_ids = list(session.scalars(select(ProductPriceHistory.product_id)))
+    assert priced_ids == [priced.id]
+    assert buffer.total_prices == 1
+    assert buffer.retry_counts["retry"] == 2
+    assert _tasks(engine) == {
+        priced.id: (ProductFetchTask.STATUS_DONE, None),
+        unparsed.id: (ProductFetchTask.STATUS_FAILED, "price not parsed"),
+        failed.id: (ProductFetchTask.STATUS_FAILED, "HttpFetchError: HTTP 503"),
+    }